@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException, status, Path
+from fastapi import APIRouter, HTTPException, status, Path, Request, Response
 from ..models.prompt_models import PromptRequest, PromptItem
-from ..services.prompt_service import PromptService
+from ..services.prompt_service import get_prompt_service
 from typing import List, Dict
 
 router = APIRouter(
@@ -8,15 +8,13 @@ router = APIRouter(
     tags=["configuration"]
 )
 
-prompt_service = PromptService()
-
 @router.post("/prompts", status_code=status.HTTP_201_CREATED)
 async def create_prompt(prompt_request: PromptRequest):
     """
     Create a new prompt.
     """
     try:
-        result = prompt_service.create_or_update_prompt(
+        result = get_prompt_service().create_or_update_prompt(
             name=prompt_request.name,
             prompt=prompt_request.prompt,
             prompt_id=prompt_request.id
@@ -36,15 +34,24 @@ async def get_prompt(prompt_id: str = Path(..., description="The ID of the promp
     """
     Retrieve a prompt by ID.
     """
-    prompt = prompt_service.get_prompt(prompt_id=prompt_id)
+    prompt = get_prompt_service().get_prompt(prompt_id=prompt_id)
     return prompt.dict()
 
 @router.get("/prompts", status_code=status.HTTP_200_OK)
-async def list_prompts():
+async def list_prompts(request: Request, response: Response):
     """
     List all available prompts.
+    
+    The response carries an ETag; send it back in If-None-Match to get a
+    304 Not Modified while the prompts are unchanged.
     """
-    prompts = prompt_service.list_prompts()
+    version, prompts = get_prompt_service().list_prompts_with_version()
+    etag = f'W/"prompts-{version}"'
+    
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
     
     # Convert to list of dictionaries for JSON response
     result = [prompt.dict() for prompt in prompts]
@@ -57,7 +64,7 @@ async def update_prompt(prompt_request: PromptRequest, prompt_id: str = Path(...
     Update an existing prompt by ID.
     """
     try:
-        result = prompt_service.update_prompt(
+        result = get_prompt_service().update_prompt(
             prompt_id=prompt_id,
             name=prompt_request.name,
             prompt=prompt_request.prompt
@@ -78,7 +85,7 @@ async def delete_prompt(prompt_id: str = Path(..., description="The ID of the pr
     Delete a prompt by ID.
     """
     try:
-        result = prompt_service.delete_prompt(prompt_id=prompt_id)
+        result = get_prompt_service().delete_prompt(prompt_id=prompt_id)
         return result
     except Exception as e:
         # Handle any errors
@@ -1,87 +1,61 @@
 from fastapi import HTTPException, status
-import json
+import sqlite3
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
+from app.core.config import get_settings
 from ..models.prompt_models import PromptItem
+from .prompt_store import PromptStore
 
 class PromptService:
-    def __init__(self):
-        self.prompts_dir = self._ensure_prompts_dir()
+    def __init__(self, prompts_dir: Path = None):
+        self.prompts_dir = self._ensure_prompts_dir(prompts_dir)
+        # Legacy storage; imported into the store the first time it is opened
         self.prompts_file_path = self.prompts_dir / "prompts.json"
+        store_path = get_settings().prompt_store_path if prompts_dir is None else None
+        self.store = PromptStore(
+            Path(store_path) if store_path else self.prompts_dir / "prompts.db",
+            legacy_json_path=self.prompts_file_path
+        )
     
-    def _ensure_prompts_dir(self) -> Path:
+    def _ensure_prompts_dir(self, prompts_dir: Path = None) -> Path:
         """Ensure the prompts directory exists"""
-        prompts_dir = Path(__file__).parent.parent.parent.parent / "data" / "prompts"
+        prompts_dir = prompts_dir or Path(__file__).parent.parent.parent.parent / "data" / "prompts"
         prompts_dir.mkdir(parents=True, exist_ok=True)
         return prompts_dir
+
+    def _store_error(self, action: str, e: Exception) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to {action} prompts store: {str(e)}"
+        )
     
     def load_prompts(self) -> List[PromptItem]:
-        """Load all prompts from the file"""
-        if not self.prompts_file_path.exists():
-            return []
-        
+        """Load all prompts from the store"""
+        return self.list_prompts_with_version()[1]
+
+    def list_prompts_with_version(self) -> Tuple[int, List[PromptItem]]:
+        """Load all prompts together with the store version (used as the list ETag)"""
         try:
-            with open(self.prompts_file_path, "r") as f:
-                data = json.load(f)
-                
-                # Handle existing data format (dict) and convert to list if needed
-                if isinstance(data, dict):
-                    return [PromptItem(name=name, prompt=prompt) for name, prompt in data.items()]
-                elif isinstance(data, list):
-                    return [PromptItem(**item) for item in data]
-                else:
-                    return []
-        except json.JSONDecodeError:
-            # If the file exists but is not valid JSON, return an empty list
-            return []
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to read prompts file: {str(e)}"
-            )
+            return self.store.list_all()
+        except sqlite3.Error as e:
+            raise self._store_error("read", e)
     
     def save_prompts(self, prompts: List[PromptItem]) -> None:
-        """Save all prompts to the file"""
+        """Replace all prompts in the store"""
         try:
-            # Convert to list of dictionaries for JSON serialization
-            prompts_data = [prompt.dict() for prompt in prompts]
-            
-            with open(self.prompts_file_path, "w") as f:
-                json.dump(prompts_data, f, indent=2)
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to save prompts file: {str(e)}"
-            )
+            self.store.replace_all(prompts)
+        except sqlite3.Error as e:
+            raise self._store_error("save", e)
     
     def create_or_update_prompt(self, name: str, prompt: str, prompt_id: str = None) -> Dict[str, str]:
         """Create a new prompt or update an existing one"""
-        prompts = self.load_prompts()
-        
-        # Check if prompt already exists
-        is_update = False
-        for i, p in enumerate(prompts):
-            if prompt_id and p.id == prompt_id:
-                # Update existing prompt by ID
-                prompts[i] = PromptItem(id=p.id, name=name, prompt=prompt)
-                is_update = True
-                break
-            elif not prompt_id and p.name == name:
-                # Update existing prompt by name (legacy support)
-                prompts[i] = PromptItem(id=p.id, name=name, prompt=prompt)
-                is_update = True
-                break
-        
-        # If not an update, add new prompt
-        if not is_update:
-            new_prompt = PromptItem(name=name, prompt=prompt)
-            if prompt_id:
-                new_prompt.id = prompt_id
-            prompts.append(new_prompt)
-        
-        # Save all prompts back to the file
-        self.save_prompts(prompts)
+        try:
+            # Updates by ID, or by name when no ID is given (legacy support)
+            is_update = self.store.upsert(name=name, prompt=prompt, prompt_id=prompt_id)
+        except sqlite3.Error as e:
+            raise self._store_error("save", e)
         
         # Return appropriate response
         if is_update:
@@ -91,14 +65,19 @@ class PromptService:
     
     def get_prompt(self, name: str = None, prompt_id: str = None) -> PromptItem:
         """Retrieve a prompt by name or ID"""
-        prompts = self.load_prompts()
-        
-        # Find prompt by ID (preferred) or name
-        for prompt in prompts:
-            if prompt_id and prompt.id == prompt_id:
-                return prompt
-            elif name and prompt.name == name and not prompt_id:
-                return prompt
+        try:
+            # Find prompt by ID (preferred) or name
+            if prompt_id:
+                prompt = self.store.get_by_id(prompt_id)
+            elif name:
+                prompt = self.store.get_by_name(name)
+            else:
+                prompt = None
+        except sqlite3.Error as e:
+            raise self._store_error("read", e)
+
+        if prompt is not None:
+            return prompt
         
         # If not found, return 404
         error_detail = f"Prompt not found"
@@ -118,15 +97,13 @@ class PromptService:
         
     def update_prompt(self, prompt_id: str, name: str, prompt: str) -> Dict[str, str]:
         """Update an existing prompt by ID"""
-        prompts = self.load_prompts()
-        
-        # Find prompt by ID
-        for i, p in enumerate(prompts):
-            if p.id == prompt_id:
-                # Update existing prompt
-                prompts[i] = PromptItem(id=prompt_id, name=name, prompt=prompt)
-                self.save_prompts(prompts)
-                return {"status": "success", "message": f"Prompt '{name}' updated successfully"}
+        try:
+            updated = self.store.update(prompt_id=prompt_id, name=name, prompt=prompt)
+        except sqlite3.Error as e:
+            raise self._store_error("save", e)
+
+        if updated:
+            return {"status": "success", "message": f"Prompt '{name}' updated successfully"}
         
         # If not found, return 404
         raise HTTPException(
@@ -136,20 +113,22 @@ class PromptService:
     
     def delete_prompt(self, prompt_id: str) -> Dict[str, str]:
         """Delete a prompt by ID"""
-        prompts = self.load_prompts()
-        
-        # Find prompt by ID
-        for i, p in enumerate(prompts):
-            if p.id == prompt_id:
-                # Get the name for the response message
-                name = p.name
-                # Remove the prompt
-                prompts.pop(i)
-                self.save_prompts(prompts)
-                return {"status": "success", "message": f"Prompt '{name}' deleted successfully"}
+        try:
+            name = self.store.delete(prompt_id)
+        except sqlite3.Error as e:
+            raise self._store_error("save", e)
+
+        if name is not None:
+            return {"status": "success", "message": f"Prompt '{name}' deleted successfully"}
         
         # If not found, return 404
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Prompt with ID '{prompt_id}' not found"
         )
+
+
+@lru_cache()
+def get_prompt_service() -> PromptService:
+    """Shared PromptService backed by the default store"""
+    return PromptService()
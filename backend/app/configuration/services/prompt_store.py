@@ -0,0 +1,202 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.file_lock import file_lock, lock_path_for
+from ..models.prompt_models import PromptItem
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    prompt TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS prompts_name ON prompts (name);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0');
+"""
+
+
+class _Snapshot:
+    """Immutable in-memory view of the store at one version"""
+    __slots__ = ("version", "items", "by_id", "by_name")
+
+    def __init__(self, version: int, items: List[PromptItem]):
+        self.version = version
+        self.items = items
+        self.by_id: Dict[str, PromptItem] = {item.id: item for item in items}
+        self.by_name: Dict[str, PromptItem] = {}
+        for item in items:
+            # Keep the first prompt for a name, matching the old linear scan
+            self.by_name.setdefault(item.name, item)
+
+
+class PromptStore:
+    """
+    SQLite-backed prompt storage.
+
+    Every write runs in its own IMMEDIATE transaction and bumps a version counter,
+    so writes from several processes are serialised and never lost. Reads are
+    served from an in-memory snapshot that is rebuilt only when the version
+    changes, which makes lookups by id or name dictionary hits. The version also
+    serves as the ETag of the prompt list.
+    """
+
+    def __init__(self, db_path: Path, legacy_json_path: Optional[Path] = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._snapshot: Optional[_Snapshot] = None
+
+        # Workers starting together create the schema and import the legacy file one at a time
+        with file_lock(lock_path_for(self.db_path)):
+            self._connection().executescript(SCHEMA)
+            if legacy_json_path is not None:
+                self._migrate_json(legacy_json_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements):
+        """Run `statements(conn)` inside a write transaction and bump the version"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(conn)
+            conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'")
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_json(self, json_path: Path) -> None:
+        """Import prompts from the legacy JSON file once, when the store is empty"""
+        conn = self._connection()
+        migrated = conn.execute("SELECT value FROM meta WHERE key = 'legacy_json_migrated'").fetchone()
+        if migrated or not json_path.exists():
+            return
+
+        try:
+            data = json.loads(json_path.read_text())
+        except json.JSONDecodeError:
+            data = []
+        if isinstance(data, dict):
+            items = [PromptItem(name=name, prompt=prompt) for name, prompt in data.items()]
+        elif isinstance(data, list):
+            items = [PromptItem(**item) for item in data]
+        else:
+            items = []
+
+        def statements(conn: sqlite3.Connection) -> None:
+            # Re-check inside the transaction in case another process migrated first
+            if conn.execute("SELECT value FROM meta WHERE key = 'legacy_json_migrated'").fetchone():
+                return
+            if conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0] == 0:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO prompts (id, name, prompt) VALUES (?, ?, ?)",
+                    [(item.id, item.name, item.prompt) for item in items]
+                )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_migrated', ?)", (str(json_path),))
+
+        self._write(statements)
+
+    def version(self) -> int:
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0])
+
+    def snapshot(self) -> _Snapshot:
+        """Return the current snapshot, reloading it if any process changed the store"""
+        version = self.version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            version = int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+            rows = conn.execute("SELECT id, name, prompt FROM prompts ORDER BY seq").fetchall()
+        finally:
+            conn.execute("COMMIT")
+
+        snapshot = _Snapshot(version, [PromptItem(id=id, name=name, prompt=prompt) for id, name, prompt in rows])
+        self._snapshot = snapshot
+        return snapshot
+
+    def list_all(self) -> Tuple[int, List[PromptItem]]:
+        snapshot = self.snapshot()
+        return snapshot.version, list(snapshot.items)
+
+    def get_by_id(self, prompt_id: str) -> Optional[PromptItem]:
+        return self.snapshot().by_id.get(prompt_id)
+
+    def get_by_name(self, name: str) -> Optional[PromptItem]:
+        return self.snapshot().by_name.get(name)
+
+    def upsert(self, name: str, prompt: str, prompt_id: Optional[str] = None) -> bool:
+        """
+        Update the prompt with `prompt_id` (or, without an id, the first prompt named
+        `name`) or insert a new one. Returns True when an existing prompt was updated.
+        """
+        def statements(conn: sqlite3.Connection) -> bool:
+            if prompt_id:
+                cursor = conn.execute("UPDATE prompts SET name = ?, prompt = ? WHERE id = ?", (name, prompt, prompt_id))
+            else:
+                cursor = conn.execute(
+                    "UPDATE prompts SET prompt = ? WHERE seq = (SELECT MIN(seq) FROM prompts WHERE name = ?)",
+                    (prompt, name)
+                )
+            if cursor.rowcount:
+                return True
+
+            new_item = PromptItem(name=name, prompt=prompt)
+            conn.execute(
+                "INSERT INTO prompts (id, name, prompt) VALUES (?, ?, ?)",
+                (prompt_id or new_item.id, name, prompt)
+            )
+            return False
+
+        return self._write(statements)
+
+    def update(self, prompt_id: str, name: str, prompt: str) -> bool:
+        """Update an existing prompt; returns False if no prompt has that id"""
+        def statements(conn: sqlite3.Connection) -> bool:
+            cursor = conn.execute("UPDATE prompts SET name = ?, prompt = ? WHERE id = ?", (name, prompt, prompt_id))
+            return cursor.rowcount > 0
+
+        return self._write(statements)
+
+    def delete(self, prompt_id: str) -> Optional[str]:
+        """Delete a prompt; returns its name, or None if no prompt has that id"""
+        def statements(conn: sqlite3.Connection) -> Optional[str]:
+            row = conn.execute("SELECT name FROM prompts WHERE id = ?", (prompt_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM prompts WHERE id = ?", (prompt_id,))
+            return row[0]
+
+        return self._write(statements)
+
+    def replace_all(self, items: List[PromptItem]) -> None:
+        """Replace the whole collection atomically"""
+        def statements(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM prompts")
+            conn.executemany(
+                "INSERT INTO prompts (id, name, prompt) VALUES (?, ?, ?)",
+                [(item.id, item.name, item.prompt) for item in items]
+            )
+
+        self._write(statements)
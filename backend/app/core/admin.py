@@ -0,0 +1,30 @@
+"""
+Guard for admin-only endpoints.
+
+Admin endpoints expect the `ADMIN_TOKEN` setting in the `X-Admin-Token`
+header. While no token is configured they are refused for everyone.
+"""
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.core.config import get_settings
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def token_matches(given: Optional[str], expected: Optional[str]) -> bool:
+    """Compare a presented token with the configured one in constant time"""
+    if not given or not expected:
+        return False
+    return hmac.compare_digest(given.encode(), expected.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None, alias=ADMIN_TOKEN_HEADER)) -> None:
+    """Dependency refusing requests without the admin token"""
+    expected = get_settings().admin_token
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not token_matches(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
@@ -0,0 +1,247 @@
+"""
+Admission control for the expensive route classes.
+
+PDF parsing, LLM calls and YouTube requests each get a concurrency limit and
+a short FIFO wait queue, per worker process. A request that finds all slots
+busy waits in the queue for up to `admission_queue_timeout_seconds`. When the
+queue is full it is rejected at once with 429. When it times out in the queue
+it gets 503. Both responses carry a Retry-After estimated from recent request
+durations, so a burst is shed early instead of slowing every request down.
+
+Request bodies are capped per class. A Content-Length over the cap is refused
+with 413 before anything is read. Bodies without one are counted as they
+stream in and fail with 413 as soon as they pass the cap. Admission happens
+before the body is read, so queued uploads do not hold memory.
+"""
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.metrics import REGISTRY
+
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    "admission_in_flight", "Admitted requests currently running, by route class", ("route_class",)
+)
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    "admission_queue_depth", "Requests waiting for a slot, by route class", ("route_class",)
+)
+ADMISSION_REJECTIONS_TOTAL = REGISTRY.counter(
+    "admission_rejections_total", "Requests turned away by admission control",
+    ("route_class", "reason")
+)
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "admission_wait_seconds", "Time admitted requests spent in the wait queue", ("route_class",)
+)
+
+# Route classes by path prefix; everything else is admitted without limits
+ROUTE_CLASSES: Tuple[Tuple[str, str], ...] = (
+    ("/pdf/", "pdf"),
+    ("/api/v1/summary", "llm"),
+    ("/api/v1/chat", "llm"),
+    ("/api/v1/test-openai", "llm"),
+    ("/api/v1/validate-key", "llm"),
+    ("/api/youtube/", "youtube"),
+)
+
+# Cheap reads under a limited prefix that are admitted without limits
+UNLIMITED_PREFIXES: Tuple[str, ...] = ("/pdf/images/",)
+
+# Weight of the newest request in the running average duration used for Retry-After
+DURATION_SMOOTHING = 0.2
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: Optional[int] = None):
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """FIFO concurrency limiter with a bounded wait queue for one route class"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float, max_body_bytes: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self.max_body_bytes = max_body_bytes
+        self.active = 0
+        self.avg_duration = 1.0
+        self.rejected: Dict[str, int] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._in_flight = ADMISSION_IN_FLIGHT.labels(name)
+        self._queue_depth = ADMISSION_QUEUE_DEPTH.labels(name)
+        self._wait_seconds = ADMISSION_WAIT_SECONDS.labels(name)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free for a request arriving now"""
+        return max(1, math.ceil(self.avg_duration * (self.queued + 1) / self.concurrency))
+
+    def count_rejection(self, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTIONS_TOTAL.labels(self.name, reason).inc()
+
+    def reject(self, status_code: int, reason: str, detail: str, with_retry_after: bool = True) -> Rejected:
+        self.count_rejection(reason)
+        return Rejected(status_code, reason, detail, self.retry_after() if with_retry_after else None)
+
+    async def acquire(self) -> None:
+        if self.active < self.concurrency and not self._waiters:
+            self._admit()
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise self.reject(429, "queue_full", f"Too many concurrent {self.name} requests")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queue_depth.set(len(self._waiters))
+        started = time.perf_counter()
+        try:
+            # release() hands the slot over by resolving the future, so `active` already counts it
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self.reject(503, "queue_timeout", f"Timed out waiting for a {self.name} slot")
+        except BaseException:
+            # Cancelled (client went away) after the slot was handed over: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._queue_depth.set(len(self._waiters))
+        self._wait_seconds.observe(time.perf_counter() - started)
+
+    def _admit(self) -> None:
+        self.active += 1
+        self._in_flight.set(self.active)
+        self._wait_seconds.observe(0.0)
+
+    def release(self, duration: Optional[float] = None) -> None:
+        if duration is not None:
+            self.avg_duration += DURATION_SMOOTHING * (duration - self.avg_duration)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._queue_depth.set(len(self._waiters))
+                return
+        self.active -= 1
+        self._in_flight.set(self.active)
+
+    def status(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.active,
+            "concurrency": self.concurrency,
+            "queued": self.queued,
+            "queue_size": self.queue_size,
+            "rejected": sum(self.rejected.values()),
+        }
+
+
+def create_limiters() -> Dict[str, AdmissionLimiter]:
+    settings = get_settings()
+    timeout = settings.admission_queue_timeout_seconds
+    body_cap = int(settings.admission_max_body_kb * 1024)
+    return {
+        "pdf": AdmissionLimiter("pdf", settings.admission_pdf_concurrency, settings.admission_pdf_queue, timeout,
+                                int(settings.admission_pdf_max_upload_mb * 1024 * 1024)),
+        "llm": AdmissionLimiter("llm", settings.admission_llm_concurrency, settings.admission_llm_queue, timeout,
+                                body_cap),
+        "youtube": AdmissionLimiter("youtube", settings.admission_youtube_concurrency,
+                                    settings.admission_youtube_queue, timeout, body_cap),
+    }
+
+
+limiters: Dict[str, AdmissionLimiter] = create_limiters()
+
+
+def route_class(path: str) -> Optional[str]:
+    if path.startswith(UNLIMITED_PREFIXES):
+        return None
+    for prefix, name in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return None
+
+
+def admission_status() -> Dict[str, Dict[str, int]]:
+    return {name: limiter.status() for name, limiter in limiters.items()}
+
+
+def _content_length(scope) -> Optional[int]:
+    for key, value in scope.get("headers", ()):
+        if key == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def send_rejection(send, rejected: Rejected) -> None:
+    headers: List[Tuple[bytes, bytes]] = [(b"content-type", b"application/json")]
+    if rejected.retry_after is not None:
+        headers.append((b"retry-after", str(rejected.retry_after).encode()))
+    body = json.dumps({"detail": rejected.detail}).encode()
+    headers.append((b"content-length", str(len(body)).encode()))
+    await send({"type": "http.response.start", "status": rejected.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying the per-class limits before the request body is read"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        name = route_class(scope["path"]) if scope["type"] == "http" else None
+        limiter = limiters.get(name) if name else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        max_body = limiter.max_body_bytes
+        length = _content_length(scope)
+        if length is not None and length > max_body:
+            rejected = limiter.reject(413, "too_large", f"Request body exceeds {max_body} bytes",
+                                      with_retry_after=False)
+            await send_rejection(send, rejected)
+            return
+
+        try:
+            await limiter.acquire()
+        except Rejected as rejected:
+            await send_rejection(send, rejected)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    limiter.count_rejection("too_large")
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {max_body} bytes")
+            return message
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, limited_receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
@@ -1,13 +1,174 @@
+from pydantic import BaseModel, Field, model_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List
+
+class ModelRoute(BaseModel):
+    """
+    One model routing rule. A rule matches a request when every condition it
+    sets holds; the first matching rule in `Settings.model_routes` wins.
+    """
+    name: str
+    # Request path prefixes, e.g. "/api/v1/chat"
+    paths: List[str] | None = None
+    tiers: List[str] | None = None
+    min_input_tokens: int | None = None
+    max_input_tokens: int | None = None
+    # None means `default_model`
+    model: str | None = None
+    # Output budget; None means `max_tokens`
+    max_tokens: int | None = None
+    timeout_seconds: float | None = None
+    # Tried in order when a model times out or the prompt overflows its context window
+    fallbacks: List[str] = []
+
+def _default_model_routes() -> List[ModelRoute]:
+    return [
+        ModelRoute(name="probe", paths=["/api/v1/test-openai"], model="gpt-4o-mini", max_tokens=32),
+        ModelRoute(name="fast", tiers=["fast"], model="gpt-4o-mini", max_tokens=1024, fallbacks=["gpt-4o"]),
+        ModelRoute(name="short-chat", paths=["/api/v1/chat"], tiers=["standard"], max_input_tokens=2000,
+                   model="gpt-4o-mini", max_tokens=1024, timeout_seconds=30, fallbacks=["gpt-4o"]),
+        ModelRoute(name="default", fallbacks=["gpt-4.1"]),
+    ]
 
 class Settings(BaseSettings):
     app_name: str = "PersonalLM API"
     openai_api_key: str
+    # OpenAI-compatible endpoint, e.g. the local fake provider in benchmarks/fakes/openai_mock.py
+    openai_base_url: str | None = None
     default_model: str = "gpt-4o"  # Fixed typo in model name
     max_tokens: int = 4096
     temperature: float = 0.1
+    # Model and output budget chosen per call from estimated input tokens, request path and quality
+    # tier (see ModelRoute); a JSON list in the environment replaces the default rules. Models whose
+    # context window cannot hold the prompt plus output budget are skipped
+    model_routing_enabled: bool = True
+    model_routes: List[ModelRoute] = Field(default_factory=_default_model_routes)
+    model_context_tokens: Dict[str, int] = {
+        "gpt-4o": 128000, "gpt-4o-mini": 128000, "gpt-4.1": 1047576, "gpt-4.1-mini": 1047576,
+        "gpt-3.5-turbo": 16385,
+    }
     frontend_url: str = "http://localhost:3000"
+    metrics_enabled: bool = True
+    # Log records are queued and written by a background thread, as JSON lines or plain text
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_queue_size: int = 10000
+    # One record per finished request, with its status and duration
+    access_log_enabled: bool = True
+    # Per-page extraction records are logged for every Nth page only
+    log_page_sample_every: int = 100
+    # Import PyMuPDF and the OpenAI SDK and build shared clients before serving, instead of on first use
+    prewarm_on_startup: bool = False
+    # Multi-process server (python -m app.server); workers default to the available CPU cores
+    server_host: str = "127.0.0.1"
+    server_port: int = 8000
+    server_workers: int | None = None
+    server_graceful_timeout_seconds: float = 30.0
+    # SQLite file holding caches shared by all workers; app.server sets it when running several
+    shared_cache_path: str | None = None
+    # Admission control per worker: concurrent requests and wait queue per route class, body size caps
+    admission_enabled: bool = True
+    admission_queue_timeout_seconds: float = 10.0
+    admission_pdf_concurrency: int = 4
+    admission_pdf_queue: int = 16
+    admission_pdf_max_upload_mb: float = 50.0
+    admission_llm_concurrency: int = 8
+    admission_llm_queue: int = 32
+    admission_youtube_concurrency: int = 16
+    admission_youtube_queue: int = 64
+    # Body cap for the LLM and YouTube classes
+    admission_max_body_kb: float = 1024.0
+    # Per-request profiling, triggered with the X-Profile header or ?profile=<token>; the token is
+    # required when profiling is enabled
+    profiling_enabled: bool = False
+    profiling_token: str | None = None
+    profiling_dir: str = "profiles"
+    profiling_interval_ms: float = 5.0
+    # Memory instrumentation; tracing adds allocation overhead so it is opt-in
+    memory_tracing_enabled: bool = False
+    memory_trace_frames: int = 10
+    memory_debug_enabled: bool = False
+    # Health checks; upstream results are cached so probes never hammer paid APIs
+    health_upstream_ttl_seconds: float = 60.0
+    health_check_timeout_seconds: float = 5.0
+    health_require_upstream: bool = False
+    health_min_free_disk_mb: int = 100
+    # SQLite prompt store; defaults to data/prompts/prompts.db
+    prompt_store_path: str | None = None
+    # Token usage ledger of every LLM call; defaults to data/usage/usage.db. A background thread
+    # writes records in batches every usage_flush_seconds, or once usage_flush_batch are waiting
+    usage_ledger_enabled: bool = True
+    usage_ledger_path: str | None = None
+    usage_flush_seconds: float = 1.0
+    usage_flush_batch: int = 200
+    # Token budgets (prompt + completion) per X-Client-Key over a rolling window, checked before
+    # LLM routes are admitted; budgets are a JSON object in the environment, e.g. {"batch": 2000000}
+    usage_client_budgets: Dict[str, int] = {}
+    usage_default_budget_tokens: int | None = None
+    usage_budget_window_hours: float = 24.0
+    # Token for admin endpoints (usage reports, document deletion), sent in the X-Admin-Token header; refused while unset
+    admin_token: str | None = None
+    # Hedged OpenAI calls for the listed tiers: a call with no first token after the hedge delay
+    # is sent again and the first to finish wins. The delay is openai_hedge_delay_ms, or that
+    # percentile of recent time to first token if higher (0 keeps the fixed delay). Each call earns
+    # openai_hedge_max_ratio of a hedge, starting from none, so hedges stay under that share of calls
+    openai_hedge_enabled: bool = False
+    openai_hedge_tiers: List[str] = ["fast", "standard"]
+    openai_hedge_delay_ms: float = 1000.0
+    openai_hedge_percentile: float = 95.0
+    openai_hedge_min_samples: int = 20
+    openai_hedge_max_ratio: float = 0.05
+    # Server-side chat conversations; store defaults to data/conversations/conversations.db. Past
+    # chat_history_max_tokens (estimated), older turns are folded into a running summary until about
+    # chat_history_keep_tokens of recent messages remain
+    conversation_store_path: str | None = None
+    chat_history_max_tokens: int = 3000
+    chat_history_keep_tokens: int = 1000
+    chat_summary_max_tokens: int = 500
+    # Uploaded PDFs addressed by content hash; defaults to data/documents. Past the disk cap the
+    # least recently used documents are deleted, as are documents idle for longer than
+    # documents_max_idle_days (0 turns either limit off)
+    documents_dir: str | None = None
+    documents_max_disk_mb: float = 2048.0
+    documents_max_idle_days: float = 0.0
+    # Plain-text extraction in reading order rather than content stream order; changing it
+    # invalidates every cached page text
+    pdf_text_sort: bool = False
+    # Images extracted by layout mode, stored once by content hash; defaults to data/images
+    images_dir: str | None = None
+    # Chapter text extracted in the background after structure analysis, while no PDF
+    # request is being served; stops at the memory (per job) or disk (all documents) budget
+    pdf_prefetch_enabled: bool = True
+    pdf_prefetch_max_memory_mb: int = 64
+    pdf_prefetch_max_disk_mb: int = 1024
+    # Summaries of document pages keyed by page fingerprints; defaults to data/summaries/summaries.db
+    summary_cache_enabled: bool = True
+    summary_cache_path: str | None = None
+    # YouTube Data API client; statistics change far more often than snippets
+    youtube_api_base_url: str = "https://www.googleapis.com/youtube/v3"
+    youtube_timeout_seconds: float = 10.0
+    youtube_max_connections: int = 20
+    youtube_snippet_ttl_seconds: float = 3600.0
+    youtube_statistics_ttl_seconds: float = 60.0
+    youtube_cache_max_entries: int = 10000
+    # Concurrent 50-id videos.list calls per batch request
+    youtube_batch_concurrency: int = 4
+    # Channel and playlist crawler; store defaults to data/youtube/youtube.db
+    youtube_store_path: str | None = None
+    youtube_stats_stale_seconds: float = 6 * 3600
+    youtube_sync_quota_limit: int = 1000
+    youtube_daily_quota: int = 10000
+    # Comment ingestion; store defaults to data/youtube/comments.db
+    youtube_comments_path: str | None = None
+    youtube_comment_concurrency: int = 4
+    youtube_comment_max_pages: int = 200
+
+    @model_validator(mode="after")
+    def _check_profiling_token(self) -> "Settings":
+        if self.profiling_enabled and not self.profiling_token:
+            raise ValueError("PROFILING_TOKEN must be set when PROFILING_ENABLED is true")
+        return self
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,50 @@
+"""
+Advisory file locks for coordinating worker processes.
+
+Several workers (see app.server) open the same stores at startup and may write
+the same files concurrently. `file_lock` serialises such sections across
+processes with flock(2). The lock is tied to the open file description, so it
+is released when the block exits or the process dies. Where fcntl is missing
+(Windows) the lock degrades to a no-op, which is fine for a single process.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# flock does not exclude threads of the same process that open the file separately
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: Path) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(str(path), threading.Lock())
+
+
+def lock_path_for(path: Path) -> Path:
+    """Sidecar lock file for `path`"""
+    path = Path(path)
+    return path.with_name(path.name + ".lock")
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on `path` (created if missing) for the duration of the block"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _thread_lock(path):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # Closing the descriptor releases the flock
+            os.close(fd)
@@ -0,0 +1,73 @@
+"""
+Deferred imports for heavy optional-at-startup dependencies.
+
+PyMuPDF, the OpenAI SDK and httpx together account for most of the time it
+takes to import `app.main`. Modules that only need them inside request handlers
+bind them with `lazy_import`, which returns a stand-in module immediately and
+imports the real one on first attribute access. Annotations that mention these
+modules must be strings so that defining a function does not trigger the import.
+
+The first access imports under a lock, so a thread that arrives while another
+is still importing waits for it rather than seeing a half-initialised module.
+`importlib.util.LazyLoader` is not used for this reason: before Python 3.12
+it can expose such a module to a second thread.
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+from typing import Dict
+
+_lock = threading.Lock()
+_proxies: Dict[str, "_LazyModuleProxy"] = {}
+
+
+class _LazyModuleProxy(ModuleType):
+    """Module stand-in forwarding attribute access to the real module, imported on first use"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        object.__setattr__(self, "_lazy_module", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _load(self) -> ModuleType:
+        module = self._lazy_module
+        if module is None:
+            with self._lazy_lock:
+                module = self._lazy_module
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    object.__setattr__(self, "_lazy_module", module)
+        return module
+
+    def __getattr__(self, attr: str):
+        # Only reached for attributes the stand-in itself lacks, i.e. those of the real module
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value) -> None:
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return module `name`, loading it the first time one of its attributes is used"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    with _lock:
+        proxy = _proxies.get(name)
+        if proxy is None:
+            if importlib.util.find_spec(name) is None:
+                raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+            proxy = _proxies[name] = _LazyModuleProxy(name)
+    return proxy
+
+
+def is_loaded(name: str) -> bool:
+    """Whether module `name` has actually been executed, not just registered lazily"""
+    # Stand-ins are never put in sys.modules; the real module is, once its import starts
+    return name in sys.modules
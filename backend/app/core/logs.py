@@ -0,0 +1,192 @@
+"""
+Structured, non-blocking logging.
+
+`configure_logging` gives the root logger a single `QueueHandler`. Calling
+`logger.info(...)` on the request path only attaches the request id and the
+time since the request started, merges the message with its arguments and
+puts the record on a queue. A `QueueListener` thread formats it, as a JSON
+line or as plain text, and writes it to stderr. A full queue drops the record
+and counts it in `log_records_dropped_total`, so a slow terminal or log
+collector never blocks a request.
+
+Extra fields passed with `extra={...}` become keys of the JSON record.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import LOG_RECORDS_DROPPED
+from app.core.request_context import get_request_id, get_request_started
+
+TEXT_FORMAT = "%(asctime)s [%(process)d] %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+# Attributes every LogRecord has; anything else on a record came from `extra`.
+# uvicorn adds an ANSI-coloured copy of some messages as `color_message`
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName", "color_message"}
+_CONTEXT_ATTRIBUTES = frozenset({"request_id", "elapsed_ms"})
+
+# Loggers that uvicorn's default log config gives handlers of their own
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Longest wait at shutdown for room in a full queue
+STOP_TIMEOUT_SECONDS = 5.0
+
+_lock = threading.Lock()
+_handler: Optional["NonBlockingQueueHandler"] = None
+_listener: Optional["_Listener"] = None
+_output: List[logging.Handler] = []
+_hooks_registered = False
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request id and milliseconds since the request started"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = get_request_id() or "-"
+        started = get_request_started()
+        record.elapsed_ms = round((time.perf_counter() - started) * 1000, 1) if started is not None else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "request_id": getattr(record, "request_id", None),
+        }
+        elapsed_ms = getattr(record, "elapsed_ms", None)
+        if elapsed_ms is not None:
+            entry["elapsed_ms"] = elapsed_ms
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRIBUTES and name not in _CONTEXT_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Arguments may be mutated after the call returns, so the message is merged now.
+        # Tracebacks are rendered here too, as frames cannot cross to the listener thread.
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # The listener keeps draining the queue, so waiting for room is safe at shutdown
+        self.queue.put(self._sentinel, timeout=STOP_TIMEOUT_SECONDS)
+
+
+def _build_output(settings: Settings) -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    if settings.log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def _start_listener() -> None:
+    global _listener
+    _listener = _Listener(_handler.queue, *_output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive fork(); records queued before it belong to the parent
+    if _listener is not None:
+        _handler.queue = queue.Queue(maxsize=_handler.queue.maxsize)
+        _start_listener()
+
+
+def configure_logging(settings: Settings = None, level: Optional[str] = None) -> None:
+    """
+    Route the root logger through the log queue. Handlers configured before,
+    such as those of `logging.basicConfig`, are replaced. uvicorn's loggers
+    lose the handlers its default config gave them and propagate to the root
+    logger, so `uvicorn app.main:app` logs go through the queue as well.
+    Repeated calls only change the level, and only when `level` is given.
+    """
+    global _handler, _hooks_registered
+    settings = settings or get_settings()
+    root = logging.getLogger()
+    with _lock:
+        if _handler is not None:
+            if level is not None:
+                root.setLevel(level.upper())
+            return
+        root.setLevel((level or settings.log_level).upper())
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        _output[:] = [_build_output(settings)]
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+        _handler.addFilter(RequestContextFilter())
+        root.addHandler(_handler)
+        for name in UVICORN_LOGGERS:
+            uvicorn_logger = logging.getLogger(name)
+            for existing in list(uvicorn_logger.handlers):
+                uvicorn_logger.removeHandler(existing)
+            uvicorn_logger.propagate = True
+        _start_listener()
+        if not _hooks_registered:
+            os.register_at_fork(after_in_child=_restart_after_fork)
+            atexit.register(stop_logging)
+            _hooks_registered = True
+
+
+def stop_logging() -> None:
+    """
+    Write out queued records and stop the listener thread. Records logged
+    afterwards are written synchronously.
+    """
+    global _handler, _listener
+    with _lock:
+        if _handler is None:
+            return
+        if _listener is not None:
+            try:
+                _listener.stop()
+            except queue.Full:
+                pass
+            _listener = None
+        root = logging.getLogger()
+        root.removeHandler(_handler)
+        for output in _output:
+            output.addFilter(RequestContextFilter())
+            root.addHandler(output)
+        _handler = None
@@ -0,0 +1,116 @@
+"""
+Memory instrumentation for request handlers.
+
+`track_memory` records the RSS delta of a block of work and, when
+`memory_tracing_enabled` is set, the peak of Python allocations traced by
+tracemalloc. tracemalloc keeps a single process-wide peak, so overlapping
+requests are attributed each other's allocations; the numbers are exact for
+requests that run alone and an upper bound otherwise. Tracing slows allocations
+down noticeably, which is why it is opt-in while the RSS delta is always taken.
+"""
+import logging
+import os
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import get_settings
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BUCKETS = tuple(float(2 ** n * 1024 * 1024) for n in range(0, 12))  # 1 MiB .. 2 GiB
+
+PDF_PEAK_TRACED_BYTES = REGISTRY.histogram(
+    "pdf_request_peak_traced_bytes", "Peak traced Python allocations per PDF request", ("operation",), MEMORY_BUCKETS
+)
+PDF_RSS_DELTA_BYTES = REGISTRY.histogram(
+    "pdf_request_rss_delta_bytes", "Resident set size growth per PDF request", ("operation",), MEMORY_BUCKETS
+)
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (Linux), 0 when unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def ensure_tracing() -> bool:
+    """Start tracemalloc if tracing is enabled in the settings; return whether it is tracing"""
+    settings = get_settings()
+    if settings.memory_tracing_enabled and not tracemalloc.is_tracing():
+        tracemalloc.start(settings.memory_trace_frames)
+    return tracemalloc.is_tracing()
+
+
+class MemoryProbe:
+    """Measurements for one tracked block; handlers fill in document details"""
+
+    def __init__(self, operation: str, document_bytes: Optional[int] = None):
+        self.operation = operation
+        self.document_bytes = document_bytes
+        self.page_count: Optional[int] = None
+        self.peak_traced_bytes: Optional[int] = None
+        self.rss_delta_bytes: Optional[int] = None
+
+
+@contextmanager
+def track_memory(operation: str, document_bytes: Optional[int] = None) -> Iterator[MemoryProbe]:
+    """Measure the memory used by the enclosed block and log it with the document details"""
+    probe = MemoryProbe(operation, document_bytes)
+    tracing = ensure_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        traced_before, _ = tracemalloc.get_traced_memory()
+    rss_before = current_rss_bytes()
+
+    try:
+        yield probe
+    finally:
+        if tracing and tracemalloc.is_tracing():
+            _, traced_peak = tracemalloc.get_traced_memory()
+            probe.peak_traced_bytes = max(0, traced_peak - traced_before)
+            PDF_PEAK_TRACED_BYTES.labels(operation).observe(probe.peak_traced_bytes)
+        if rss_before:
+            probe.rss_delta_bytes = current_rss_bytes() - rss_before
+            PDF_RSS_DELTA_BYTES.labels(operation).observe(max(0, probe.rss_delta_bytes))
+
+        logger.info(
+            "Memory for %s: document_bytes=%s pages=%s peak_traced_bytes=%s rss_delta_bytes=%s",
+            operation, probe.document_bytes, probe.page_count, probe.peak_traced_bytes, probe.rss_delta_bytes,
+            extra={"operation": operation, "document_bytes": probe.document_bytes, "pages": probe.page_count,
+                   "peak_traced_bytes": probe.peak_traced_bytes, "rss_delta_bytes": probe.rss_delta_bytes}
+        )
+
+
+def top_allocations(limit: int = 20, group_by: str = "lineno") -> Dict[str, Any]:
+    """Summarise the current tracemalloc snapshot by allocation site"""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "allocations": []}
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+
+    allocations: List[Dict[str, Any]] = []
+    for stat in snapshot.statistics(group_by)[:limit]:
+        allocations.append({
+            "size_bytes": stat.size,
+            "count": stat.count,
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        })
+
+    return {
+        "tracing": True,
+        "traced_current_bytes": current,
+        "traced_peak_bytes": peak,
+        "rss_bytes": current_rss_bytes(),
+        "group_by": group_by,
+        "allocations": allocations,
+    }
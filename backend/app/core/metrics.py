@@ -0,0 +1,369 @@
+"""
+Lightweight Prometheus-style metrics.
+
+Metric children are created once per label set and cached, so recording a value
+is a dictionary lookup plus an integer/float update with no locks. Updates rely
+on the GIL; a concurrent update may very rarely be lost, which is acceptable for
+monitoring data. Values are rendered in the Prometheus text exposition format.
+"""
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.request_context import route_template
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+PAGE_LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0
+)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, labelvalues):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Timer:
+    """Context manager that observes the elapsed time on exit"""
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self) -> "_Timer":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # One slot per bucket plus the +Inf bucket; counts are not cumulative
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    metric_type = "untyped"
+    child_class = _CounterChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *labelvalues: str):
+        """
+        Return the child for a label set, creating it on first use.
+
+        Callers on hot paths should keep the returned child instead of calling
+        this per event.
+        """
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(labelvalues, self._new_child())
+        return child
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.metric_type}"
+        for labelvalues, child in list(self._children.items()):
+            yield from self._render_child(labelvalues, child)
+
+    def _render_child(self, labelvalues: Tuple[str, ...], child) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(child.value)}"
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+    child_class = _CounterChild
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+    child_class = _GaugeChild
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def get(self) -> float:
+        return self._default.value
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def _render_child(self, labelvalues: Tuple[str, ...], child: _HistogramChild) -> Iterable[str]:
+        counts = list(child.counts)
+        cumulative = 0
+        for upper_bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames + ("le",), labelvalues + (_format_value(float(upper_bound)),))
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, labelvalues)
+        yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# HTTP
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+HTTP_REQUESTS_TOTAL = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+)
+
+# PDF processing stages
+PDF_STAGE_SECONDS = REGISTRY.histogram(
+    "pdf_stage_duration_seconds", "Time spent in PyMuPDF stages", ("stage",), PAGE_LATENCY_BUCKETS + (2.5, 5.0, 10.0)
+)
+PDF_OPEN_SECONDS = PDF_STAGE_SECONDS.labels("open")
+PDF_GET_TEXT_SECONDS = PDF_STAGE_SECONDS.labels("get_text")
+PDF_GET_TEXT_DICT_SECONDS = PDF_STAGE_SECONDS.labels("get_text_dict")
+PDF_TOC_SECONDS = PDF_STAGE_SECONDS.labels("toc")
+PDF_PAGES_PROCESSED = REGISTRY.counter(
+    "pdf_pages_processed_total", "Pages run through text extraction"
+)
+PDF_PREFETCH_PAGES = REGISTRY.counter(
+    "pdf_prefetch_pages_total", "Pages extracted ahead of time by the chapter prefetcher"
+)
+DOCUMENTS_EVICTED = REGISTRY.counter(
+    "documents_evicted_total", "Stored documents deleted by the retention limits", ("reason",)
+)
+PDF_PREFETCH_JOBS = REGISTRY.counter(
+    "pdf_prefetch_jobs_total", "Chapter prefetch jobs by outcome", ("outcome",)
+)
+
+# OpenAI
+OPENAI_REQUEST_SECONDS = REGISTRY.histogram(
+    "openai_request_duration_seconds",
+    "OpenAI chat completion latency, split by whether part of the prompt was served from the provider cache",
+    ("model", "cache")
+)
+OPENAI_TTFT_SECONDS = REGISTRY.histogram(
+    "openai_time_to_first_token_seconds",
+    "Time until the first token is available to the caller (the full response for non-streamed calls)",
+    ("model",)
+)
+OPENAI_TOKENS_TOTAL = REGISTRY.counter(
+    "openai_tokens_total", "Tokens reported by OpenAI usage", ("model", "type")
+)
+OPENAI_ERRORS_TOTAL = REGISTRY.counter(
+    "openai_request_errors_total", "Failed OpenAI requests", ("model",)
+)
+OPENAI_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "openai_requests_in_flight", "OpenAI requests currently waiting for a response"
+)
+OPENAI_ROUTE_DECISIONS_TOTAL = REGISTRY.counter(
+    "openai_route_decisions_total", "OpenAI calls by the routing rule that chose the model", ("rule", "model")
+)
+OPENAI_FALLBACKS_TOTAL = REGISTRY.counter(
+    "openai_fallbacks_total", "OpenAI calls retried on the next model, by the model that failed and why",
+    ("model", "reason")
+)
+OPENAI_HEDGES_TOTAL = REGISTRY.counter(
+    "openai_hedges_total", "Hedged OpenAI calls by outcome (throttled: the hedge budget was used up)",
+    ("model", "outcome")
+)
+OPENAI_HEDGE_DELAY_SECONDS = REGISTRY.gauge(
+    "openai_hedge_delay_seconds", "Time without a first token after which a call is hedged", ("model",)
+)
+CHAT_COMPACTIONS = REGISTRY.counter(
+    "chat_compactions_total", "Conversation histories folded into their running summary, by outcome", ("outcome",)
+)
+
+# YouTube
+YOUTUBE_REQUEST_SECONDS = REGISTRY.histogram(
+    "youtube_request_duration_seconds", "YouTube Data API latency", ("endpoint",)
+)
+YOUTUBE_ERRORS_TOTAL = REGISTRY.counter(
+    "youtube_request_errors_total", "Failed YouTube Data API requests", ("endpoint",)
+)
+YOUTUBE_QUOTA_UNITS_TOTAL = REGISTRY.counter(
+    "youtube_quota_units_total", "YouTube Data API quota units spent", ("endpoint",)
+)
+YOUTUBE_CACHE_TOTAL = REGISTRY.counter(
+    "youtube_cache_lookups_total",
+    "YouTube resource part lookups by outcome (hit, revalidated, miss)",
+    ("part", "result")
+)
+
+# Logging
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    "log_records_dropped_total", "Log records discarded because the log queue was full"
+)
+
+
+class _RouteMetrics:
+    """Pre-bound children for one route so requests never build label tuples"""
+    __slots__ = ("method", "route_path", "latency", "status_counters")
+
+    def __init__(self, method: str, route_path: str):
+        self.method = method
+        self.route_path = route_path
+        self.latency = HTTP_REQUEST_SECONDS.labels(method, route_path)
+        self.status_counters: Dict[int, _CounterChild] = {}
+
+    def status_counter(self, status_code: int) -> _CounterChild:
+        counter = self.status_counters.get(status_code)
+        if counter is None:
+            counter = HTTP_REQUESTS_TOTAL.labels(self.method, self.route_path, str(status_code))
+            self.status_counters[status_code] = counter
+        return counter
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status codes and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[str, Dict[str, _RouteMetrics]] = {}
+
+    def _route_metrics(self, route_path: Optional[str], method: str) -> _RouteMetrics:
+        # Label by the route template, never the raw path, to keep cardinality bounded
+        route_path = route_path or "<unmatched>"
+        by_method = self._routes.get(route_path)
+        if by_method is None:
+            by_method = self._routes.setdefault(route_path, {})
+        metrics = by_method.get(method)
+        if metrics is None:
+            metrics = by_method.setdefault(method, _RouteMetrics(method, route_path))
+        return metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            metrics = self._route_metrics(route_template(scope), scope["method"])
+            metrics.latency.observe(elapsed)
+            metrics.status_counter(status_code).inc()
@@ -0,0 +1,159 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+When profiling is enabled in the settings, a request carrying the profiling token in
+the `X-Profile` header (or the `profile` query parameter) is profiled by a
+background sampler thread. The sampler walks the stacks of every thread, so work
+the request hands to worker threads (sync endpoints, `run_in_threadpool`) is
+captured along with the event loop. Idle threads are skipped. Samples are written
+in the collapsed-stack format understood by flamegraph.pl, inferno and speedscope.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.admin import token_matches
+from app.core.config import get_settings
+from app.core.request_context import get_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+# Innermost functions of threads that are only waiting for work
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("selectors.py", "poll"),
+}
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Periodically records the stacks of all busy threads in the process"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, f"thread-{ident}"))
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def write_collapsed(self, path: Path) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests that ask for it.
+
+    Only one request is profiled at a time; concurrent requests asking for a
+    profile are served normally and told so through the `X-Profile` response
+    header. Other requests handled while a profile is running show up in it too.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.settings = get_settings()
+        self.output_dir = Path(self.settings.profiling_dir)
+        self._busy = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        token = None
+        for key, value in scope.get("headers", ()):
+            if key == PROFILE_HEADER:
+                token = value.decode("latin-1")
+                break
+        if token is None and PROFILE_QUERY_PARAM.encode() in scope.get("query_string", b""):
+            values = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY_PARAM)
+            token = values[0] if values else None
+        return token_matches(token, self.settings.profiling_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, self._with_header(send, b"busy"))
+            return
+
+        request_id = get_request_id() or f"{time.time_ns()}"
+        sampler = StackSampler(self.settings.profiling_interval_ms / 1000)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, self._with_header(send, request_id.encode()))
+        finally:
+            sampler.stop()
+            self._busy.release()
+            await run_in_threadpool(self._save, request_id, scope, sampler, time.perf_counter() - started)
+
+    @staticmethod
+    def _with_header(send, value: bytes):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_HEADER, value)]
+            await send(message)
+        return send_wrapper
+
+    def _save(self, request_id: str, scope, sampler: StackSampler, duration: float) -> None:
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            sampler.write_collapsed(self.output_dir / f"{request_id}.folded")
+            metadata: Dict[str, object] = {
+                "request_id": request_id,
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "duration_seconds": duration,
+                "interval_seconds": sampler.interval,
+                "sample_rounds": sampler.sample_count,
+                "format": "collapsed stacks (flamegraph.pl / speedscope)",
+            }
+            (self.output_dir / f"{request_id}.json").write_text(json.dumps(metadata, indent=2))
+            logger.info("Saved request profile %s (%d samples) to %s", request_id, sampler.sample_count, self.output_dir)
+        except OSError as e:
+            logger.error("Failed to save request profile %s: %s", request_id, e)
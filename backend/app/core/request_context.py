@@ -0,0 +1,105 @@
+import logging
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.config import get_settings
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Accept caller-supplied ids only if they are safe to use in file names and logs
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+# time.perf_counter() when the request arrived
+request_started_var: ContextVar[Optional[float]] = ContextVar("request_started", default=None)
+
+access_logger = logging.getLogger("app.access")
+
+
+def get_request_id() -> Optional[str]:
+    """Return the id of the request being handled, if any"""
+    return request_id_var.get()
+
+
+def get_request_started() -> Optional[float]:
+    """Return the `time.perf_counter()` value at which the current request arrived, if any"""
+    return request_started_var.get()
+
+
+def route_template(scope) -> Optional[str]:
+    """
+    Template of the route that matched the request, including the prefixes of
+    the routers it was included through and the mount point, e.g.
+    `/api/v1/chat/conversations/{conversation_id}`; None before routing or when
+    nothing matched
+    """
+    # Included routers keep their own route objects, whose path lacks the include prefix;
+    # FastAPI records the effective, fully prefixed route alongside
+    route = scope.get("fastapi", {}).get("effective_route_context") or scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if path is None:
+        return None
+    return scope.get("root_path", "") + path
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware assigning every HTTP request an id.
+
+    A valid `X-Request-ID` header from the caller is reused, otherwise a new id is
+    generated. The id is stored in a context variable (which is copied into worker
+    threads started through Starlette) and echoed back in the response headers.
+    With `access_log_enabled`, a record with the status and duration is logged
+    when the request finishes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.access_log = get_settings().access_log_enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = _header(scope, REQUEST_ID_HEADER.encode())
+        if not request_id or not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        scope.setdefault("state", {})["request_id"] = request_id
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode())
+                ]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        started_token = request_started_var.set(started)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if self.access_log and access_logger.isEnabledFor(logging.INFO):
+                duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                access_logger.info(
+                    "%s %s %d %.1fms", scope["method"], scope["path"], status_code, duration_ms,
+                    extra={"method": scope["method"], "path": scope["path"], "status": status_code,
+                           "duration_ms": duration_ms}
+                )
+            request_started_var.reset(started_token)
+            request_id_var.reset(token)
@@ -0,0 +1,144 @@
+"""
+Cache shared by all worker processes on a host.
+
+With several workers (see app.server) an in-memory cache is duplicated per
+process: each worker pays for its own misses and holds its own copy. When
+`shared_cache_path` is set, caches that opt in keep their entries in one SQLite
+file instead, so a response fetched by one worker is a hit for every other.
+Local SQLite reads take tens of microseconds, cheap next to the upstream calls
+being saved, so lookups are made inline.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+from app.core.config import get_settings
+from app.core.file_lock import file_lock, lock_path_for
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    etag TEXT,
+    fetched_as TEXT NOT NULL DEFAULT '',
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (namespace, expires_at);
+"""
+
+# Entries beyond the limit are evicted every this many writes, soonest-expiring first
+EVICT_EVERY = 100
+
+
+class SharedEntry:
+    """Same shape as an in-memory cache entry, with expiry in wall-clock time"""
+    __slots__ = ("value", "etag", "fetched_as", "expires_at")
+
+    def __init__(self, value: Any, etag: Optional[str], fetched_as: str, expires_at: float):
+        self.value = value
+        self.etag = etag
+        self.fetched_as = fetched_as
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class SharedCache:
+    """
+    SQLite-backed cache for JSON-serialisable values, partitioned by namespace.
+
+    Offers the get/set/touch/clear interface of the in-memory response cache.
+    Expired entries are kept until evicted so their ETag can still be used to
+    revalidate them.
+    """
+
+    def __init__(self, db_path: Path, namespace: str, max_entries: int = 10000):
+        self.db_path = Path(db_path)
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Created at import time in a preforking server, so no connection is kept open for the children
+        with file_lock(lock_path_for(self.db_path)):
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+            finally:
+                conn.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def get(self, key: Hashable) -> Optional[SharedEntry]:
+        row = self._connection().execute(
+            "SELECT value, etag, fetched_as, expires_at FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, self._key(key))
+        ).fetchone()
+        if row is None:
+            return None
+        return SharedEntry(json.loads(row[0]), row[1], row[2], row[3])
+
+    def set(self, key: Hashable, value: Any, ttl: float, etag: Optional[str] = None, fetched_as: str = "") -> None:
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO entries (namespace, key, value, etag, fetched_as, expires_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, etag = excluded.etag, "
+            "fetched_as = excluded.fetched_as, expires_at = excluded.expires_at",
+            (self.namespace, self._key(key), json.dumps(value, separators=(",", ":")), etag, fetched_as,
+             time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key IN "
+                "(SELECT key FROM entries WHERE namespace = ? ORDER BY expires_at LIMIT ?)",
+                (self.namespace, self.namespace, excess)
+            )
+
+    def touch(self, key: Hashable, ttl: float) -> None:
+        """Extend an entry's lifetime after the upstream confirmed it is unchanged"""
+        self._connection().execute(
+            "UPDATE entries SET expires_at = ? WHERE namespace = ? AND key = ?",
+            (time.time() + ttl, self.namespace, self._key(key))
+        )
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+
+def shared_cache_enabled() -> bool:
+    return bool(get_settings().shared_cache_path)
+
+
+def get_shared_cache(namespace: str, max_entries: int = 10000) -> SharedCache:
+    """A namespace of the cache file at `shared_cache_path`; only call when it is configured"""
+    return SharedCache(Path(get_settings().shared_cache_path), namespace, max_entries)
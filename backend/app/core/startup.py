@@ -0,0 +1,80 @@
+"""
+Application lifespan: optional prewarm on startup; on shutdown, background
+prefetching is stopped, buffered usage records are written and clients are
+closed.
+
+Heavy dependencies are imported lazily (see app.core.lazy) and shared clients
+are built on first use, so importing `app.main` stays fast and processes that
+only serve cheap routes never pay for PyMuPDF or the OpenAI SDK. With
+`prewarm_on_startup` enabled the same work is done before the server accepts
+connections, trading a slower start for a fast first request.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict
+
+from fastapi import FastAPI
+
+from app.configuration.services.prompt_service import get_prompt_service
+from app.core.config import get_settings
+from app.core.usage import close_usage_ledger
+from app.pdf_processor.services import pdf_info_service
+from app.pdf_processor.services.document_store import get_document_store
+from app.pdf_processor.services.prefetch import stop_prefetcher
+from app.services import openai_service
+from app.youtubeAPI import client
+
+logger = logging.getLogger(__name__)
+
+
+def _timed(steps: Dict[str, Callable[[], Any]]) -> Dict[str, float]:
+    timings = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def preload_modules() -> Dict[str, float]:
+    """
+    Execute the lazily imported modules without creating clients, connections
+    or threads. This is safe before forking, so a preforking server can load
+    them once and share the pages with its workers.
+    """
+    return _timed({
+        # Touching an attribute executes a lazily imported module
+        "pymupdf": lambda: pdf_info_service.fitz.open,
+        "openai": lambda: openai_service.openai.OpenAI,
+        "httpx": lambda: client.httpx.AsyncClient,
+    })
+
+
+def prewarm() -> Dict[str, float]:
+    """Import heavy modules and build shared services; returns seconds spent per step"""
+    timings = preload_modules()
+    timings.update(_timed({
+        "openai_service": openai_service.get_openai_service,
+        "prompt_service": get_prompt_service,
+        "document_store": get_document_store,
+    }))
+    return timings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if get_settings().prewarm_on_startup:
+        started = time.perf_counter()
+        timings = await asyncio.to_thread(prewarm)
+        logger.info(
+            "Prewarmed in %.2fs (%s)", time.perf_counter() - started,
+            ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items())
+        )
+    yield
+    await stop_prefetcher()
+    # Write usage records still buffered in memory
+    await asyncio.to_thread(close_usage_ledger)
+    # Close pooled upstream connections
+    await client.close_youtube_client()
@@ -0,0 +1,332 @@
+"""
+Ledger of LLM token usage, with optional per-client token budgets.
+
+Every OpenAI call is recorded with its prompt, completion and cached tokens and
+its latency. Each record also carries the route template, the stored prompt id
+(when the request used one) and the client key from the `X-Client-Key` header.
+Only keys listed in `usage_client_budgets` are kept; any other key is recorded
+as `anonymous` and shares the default budget.
+`UsageMiddleware` puts that request context in a context variable. The variable
+is visible in the threadpool threads that run the OpenAI client.
+
+Recording only appends to an in-memory batch. A background thread writes
+batches to SQLite every `usage_flush_seconds`, or sooner once
+`usage_flush_batch` records are waiting, so the request path never waits for
+the database.
+
+Budgets count prompt plus completion tokens over a rolling window of
+`usage_budget_window_hours`. They are checked before an LLM route is admitted,
+so a client whose budget is used up gets 429 without anything being spent. A
+request that starts under the budget may still finish over it. Records not
+written yet are included in the check, and with several workers sharing the
+ledger the other workers' unwritten batches are missed.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.admission import Rejected, route_class, send_rejection
+from app.core.config import get_settings
+from app.core.file_lock import file_lock, lock_path_for
+from app.core.metrics import REGISTRY
+from app.core.request_context import get_request_id, route_template
+
+logger = logging.getLogger(__name__)
+
+USAGE_BUDGET_REJECTIONS = REGISTRY.counter(
+    "usage_budget_rejections_total", "LLM requests refused because the client's token budget is used up"
+)
+
+CLIENT_KEY_HEADER = "x-client-key"
+ANONYMOUS_CLIENT = "anonymous"
+# Records kept in memory while the database cannot be written; older ones are dropped beyond this
+MAX_PENDING_RECORDS = 100_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    client_key TEXT NOT NULL,
+    route TEXT NOT NULL,
+    prompt_id TEXT,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    latency_ms REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    request_id TEXT
+);
+CREATE INDEX IF NOT EXISTS llm_usage_client_ts ON llm_usage (client_key, ts);
+CREATE INDEX IF NOT EXISTS llm_usage_ts ON llm_usage (ts);
+"""
+
+COLUMNS = ("ts", "client_key", "route", "prompt_id", "model", "prompt_tokens", "completion_tokens",
+           "cached_tokens", "latency_ms", "ok", "request_id")
+
+# Dimensions the aggregate query can group by
+GROUP_COLUMNS = {
+    "route": "route",
+    "prompt_id": "prompt_id",
+    "client_key": "client_key",
+    "model": "model",
+    "day": "date(ts, 'unixepoch')",
+}
+
+
+@dataclass
+class UsageContext:
+    """Who an LLM call is made for; one per HTTP request"""
+    client_key: str
+    scope: Dict[str, Any] = field(default_factory=dict)
+    prompt_id: Optional[str] = None
+
+    @property
+    def route(self) -> str:
+        # The route template, known once the router has matched the request
+        return route_template(self.scope) or self.scope.get("path") or "<none>"
+
+
+usage_context_var: ContextVar[Optional[UsageContext]] = ContextVar("usage_context", default=None)
+
+
+def set_usage_prompt_id(prompt_id: Optional[str]) -> None:
+    """Attribute the LLM calls of the current request to a stored prompt"""
+    context = usage_context_var.get()
+    if context is not None:
+        context.prompt_id = prompt_id
+
+
+@dataclass
+class UsageRecord:
+    ts: float
+    client_key: str
+    route: str
+    prompt_id: Optional[str]
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    latency_ms: float
+    ok: bool
+    request_id: Optional[str]
+
+    def row(self) -> Tuple:
+        return (self.ts, self.client_key, self.route, self.prompt_id, self.model, self.prompt_tokens,
+                self.completion_tokens, self.cached_tokens, self.latency_ms, int(self.ok), self.request_id)
+
+
+class UsageLedger:
+    """SQLite ledger of LLM calls, written in batches by a background thread"""
+
+    def __init__(self, db_path: Path, flush_seconds: float = 1.0, flush_batch: int = 200):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_seconds = flush_seconds
+        self.flush_batch = max(1, flush_batch)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending: List[UsageRecord] = []
+        # Batches being written are still counted by `spent` until they are committed
+        self._writing: List[UsageRecord] = []
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        with file_lock(lock_path_for(self.db_path)):
+            self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, record: UsageRecord) -> None:
+        with self._lock:
+            self._pending.append(record)
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="usage-ledger", daemon=True)
+                self._thread.start()
+            full = len(self._pending) >= self.flush_batch
+        if full:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write the records waiting in memory; returns how many were written"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._writing.extend(batch)
+        if not batch:
+            return 0
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    f"INSERT INTO llm_usage ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [record.row() for record in batch]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception:
+            logger.exception("Writing %d usage records failed; keeping them for the next flush", len(batch))
+            with self._lock:
+                self._pending = (batch + self._pending)[-MAX_PENDING_RECORDS:]
+            return 0
+        finally:
+            with self._lock:
+                written = {id(record) for record in batch}
+                self._writing = [record for record in self._writing if id(record) not in written]
+        return len(batch)
+
+    def close(self) -> None:
+        """Stop the writer thread and write what is left"""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        self._wake.set()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def spent(self, client_key: str, since: float) -> Tuple[int, Optional[float]]:
+        """Prompt plus completion tokens of a client since `since`, and the time of its oldest call in that window"""
+        total, oldest = self._connection().execute(
+            "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0), MIN(ts) "
+            "FROM llm_usage WHERE client_key = ? AND ts >= ?",
+            (client_key, since)
+        ).fetchone()
+        with self._lock:
+            unwritten = [r for r in self._pending + self._writing if r.client_key == client_key and r.ts >= since]
+        total += sum(r.prompt_tokens + r.completion_tokens for r in unwritten)
+        if unwritten:
+            oldest = min([r.ts for r in unwritten] + ([oldest] if oldest is not None else []))
+        return total, oldest
+
+    def aggregate(self, group_by: Sequence[str], since: Optional[float] = None, until: Optional[float] = None,
+                  client_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Totals per combination of the `group_by` dimensions (keys of GROUP_COLUMNS), largest first"""
+        self.flush()
+        selected = [f"{GROUP_COLUMNS[name]} AS {name}" for name in group_by]
+        conditions, parameters = [], []
+        for condition, value in (("ts >= ?", since), ("ts < ?", until), ("client_key = ?", client_key)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        query = (
+            f"SELECT {', '.join(selected + [''])}"
+            "COUNT(*) AS calls, SUM(1 - ok) AS failed, SUM(prompt_tokens) AS prompt_tokens, "
+            "SUM(completion_tokens) AS completion_tokens, SUM(cached_tokens) AS cached_tokens, "
+            "SUM(prompt_tokens + completion_tokens) AS total_tokens, "
+            "AVG(latency_ms) AS avg_latency_ms, MAX(latency_ms) AS max_latency_ms FROM llm_usage"
+            + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+            + (f" GROUP BY {', '.join(group_by)}" if group_by else "")
+            + " ORDER BY total_tokens DESC"
+        )
+        cursor = self._connection().execute(query, parameters)
+        names = [column[0] for column in cursor.description]
+        rows = [dict(zip(names, row)) for row in cursor]
+        # Without grouping, an empty ledger still yields one row of NULL sums
+        return [row for row in rows if row["calls"]]
+
+
+@lru_cache()
+def get_usage_ledger() -> UsageLedger:
+    """Shared UsageLedger at the configured path, data/usage/usage.db by default"""
+    settings = get_settings()
+    path = settings.usage_ledger_path
+    db_path = Path(path) if path else Path(__file__).parent.parent.parent / "data" / "usage" / "usage.db"
+    return UsageLedger(db_path, settings.usage_flush_seconds, settings.usage_flush_batch)
+
+
+def close_usage_ledger() -> None:
+    """Write buffered records on shutdown; a no-op if nothing was recorded"""
+    if get_usage_ledger.cache_info().currsize:
+        get_usage_ledger().close()
+        get_usage_ledger.cache_clear()
+
+
+def record_llm_call(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int,
+                    latency_seconds: float, ok: bool = True) -> None:
+    """Add an LLM call to the ledger, attributed to the current request's client, route and prompt"""
+    if not get_settings().usage_ledger_enabled:
+        return
+    context = usage_context_var.get() or UsageContext(ANONYMOUS_CLIENT)
+    get_usage_ledger().record(UsageRecord(
+        ts=time.time(), client_key=context.client_key, route=context.route, prompt_id=context.prompt_id,
+        model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+        cached_tokens=cached_tokens, latency_ms=latency_seconds * 1000, ok=ok, request_id=get_request_id(),
+    ))
+
+
+def budget_for(client_key: str) -> Optional[int]:
+    settings = get_settings()
+    return settings.usage_client_budgets.get(client_key, settings.usage_default_budget_tokens)
+
+
+def budget_window_start() -> float:
+    return time.time() - get_settings().usage_budget_window_hours * 3600
+
+
+def _client_key(scope) -> str:
+    for key, value in scope.get("headers", ()):
+        if key == CLIENT_KEY_HEADER.encode():
+            # Only configured keys are tracked on their own; made-up keys would get a fresh
+            # default budget each and fill the ledger, so they count as anonymous
+            client_key = value.decode("latin-1")
+            return client_key if client_key in get_settings().usage_client_budgets else ANONYMOUS_CLIENT
+    return ANONYMOUS_CLIENT
+
+
+class UsageMiddleware:
+    """ASGI middleware setting the usage context and refusing LLM requests of clients over budget"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = UsageContext(_client_key(scope), scope)
+        budget = budget_for(context.client_key)
+        if budget is not None and route_class(scope["path"]) == "llm":
+            window_hours = get_settings().usage_budget_window_hours
+            spent, oldest = await run_in_threadpool(
+                get_usage_ledger().spent, context.client_key, budget_window_start()
+            )
+            if spent >= budget:
+                USAGE_BUDGET_REJECTIONS.inc()
+                # The window frees up tokens once its oldest call falls out of it
+                retry_after = max(1, int(oldest + window_hours * 3600 - time.time()) + 1) if oldest else None
+                await send_rejection(send, Rejected(
+                    429, "budget", f"Token budget of {budget} tokens per {window_hours:g}h is used up",
+                    retry_after
+                ))
+                return
+
+        token = usage_context_var.set(context)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            usage_context_var.reset(token)
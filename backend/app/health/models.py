@@ -0,0 +1,20 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+
+class CheckResult(BaseModel):
+    """Result of a single health check."""
+    name: str = Field(..., description="Check name")
+    status: str = Field(..., description="ok, degraded or fail")
+    critical: bool = Field(..., description="Whether a failure makes the service not ready")
+    cached: bool = Field(False, description="Whether the result was served from the check cache")
+    latency_ms: float = Field(0.0, description="Time the check took when it last ran")
+    checked_at: float = Field(..., description="Unix time the check last ran")
+    details: Dict[str, Any] = Field(default_factory=dict, description="Check specific details")
+    error: Optional[str] = Field(None, description="Error message for failed checks")
+
+
+class HealthResponse(BaseModel):
+    """Response model for health endpoints."""
+    status: str = Field(..., description="ok, degraded or fail")
+    checks: List[CheckResult] = Field(default_factory=list, description="Individual check results")
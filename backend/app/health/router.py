@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Response, status
+
+from app.health.models import HealthResponse
+from app.health.service import health_service
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"]
+)
+
+
+@router.get(
+    "/live",
+    response_model=HealthResponse,
+    summary="Liveness probe",
+    description="Reports that the process is up and its event loop is responsive. Never calls upstream services."
+)
+async def liveness() -> HealthResponse:
+    return HealthResponse(status="ok")
+
+
+@router.get(
+    "/ready",
+    response_model=HealthResponse,
+    summary="Readiness probe",
+    description="Checks local dependencies on every call and upstream services through a TTL cache. "
+                "Returns 503 when a critical check fails."
+)
+async def readiness(response: Response) -> HealthResponse:
+    result = await health_service.readiness()
+    if result.status == "fail":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return result
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import anyio.to_thread
+
+from app.core.admission import admission_status
+from app.core.config import get_settings
+from app.core.metrics import HTTP_REQUESTS_IN_FLIGHT
+from app.core.shared_cache import SharedCache, get_shared_cache, shared_cache_enabled
+from app.health.models import CheckResult, HealthResponse
+
+# A check returns its status ("ok" or "degraded") and details, or raises on failure
+CheckFunction = Callable[[], Awaitable[Tuple[str, Dict[str, Any]]]]
+
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+
+
+class HealthCheck:
+    """
+    A named check whose result can be cached for `ttl` seconds. With a shared
+    cache the result is also reused by the other worker processes, so an
+    upstream is probed once per TTL per host rather than once per worker.
+    """
+
+    def __init__(self, name: str, func: CheckFunction, critical: bool = True,
+                 ttl: float = 0.0, timeout: float = 5.0, shared: Optional[SharedCache] = None):
+        self.name = name
+        self.func = func
+        self.critical = critical
+        self.ttl = ttl
+        self.timeout = timeout
+        self.shared = shared if ttl > 0 else None
+        self._result: Optional[CheckResult] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _cached(self) -> Optional[CheckResult]:
+        if self._result is not None and time.monotonic() < self._expires_at:
+            return self._result.model_copy(update={"cached": True})
+        if self.shared is not None:
+            entry = self.shared.get(self.name)
+            if entry is not None and entry.fresh:
+                self._result = CheckResult.model_validate(entry.value)
+                self._expires_at = time.monotonic() + (entry.expires_at - time.time())
+                return self._result.model_copy(update={"cached": True})
+        return None
+
+    async def run(self) -> CheckResult:
+        cached = self._cached()
+        if cached is not None:
+            return cached
+
+        # Single flight: concurrent probes wait for one upstream call instead of each making one
+        async with self._lock:
+            cached = self._cached()
+            if cached is not None:
+                return cached
+
+            started = time.perf_counter()
+            try:
+                status, details = await asyncio.wait_for(self.func(), timeout=self.timeout)
+                error = None
+            except asyncio.TimeoutError:
+                status, details, error = "fail", {}, f"Check timed out after {self.timeout}s"
+            except Exception as e:
+                status, details, error = "fail", {}, str(e)
+
+            self._result = CheckResult(
+                name=self.name,
+                status=status,
+                critical=self.critical,
+                latency_ms=(time.perf_counter() - started) * 1000,
+                checked_at=time.time(),
+                details=details,
+                error=error,
+            )
+            self._expires_at = time.monotonic() + self.ttl
+            if self.shared is not None:
+                self.shared.set(self.name, self._result.model_dump(mode="json"), self.ttl)
+            return self._result
+
+
+class HealthService:
+    """Registry of readiness checks; subsystems register their own checks"""
+
+    def __init__(self, shared: Optional[SharedCache] = None):
+        self._checks: Dict[str, HealthCheck] = {}
+        self.shared = shared
+
+    def register(self, name: str, func: CheckFunction, critical: bool = True,
+                 ttl: float = 0.0, timeout: float = 5.0) -> None:
+        self._checks[name] = HealthCheck(name, func, critical=critical, ttl=ttl, timeout=timeout,
+                                         shared=self.shared)
+
+    async def readiness(self) -> HealthResponse:
+        results: List[CheckResult] = await asyncio.gather(*(check.run() for check in self._checks.values()))
+
+        status = "ok"
+        for result in results:
+            if result.status == "fail" and result.critical:
+                status = "fail"
+                break
+            if result.status != "ok":
+                status = "degraded"
+        return HealthResponse(status=status, checks=results)
+
+
+async def check_storage() -> Tuple[str, Dict[str, Any]]:
+    """Data and working directories are writable and have free space"""
+    settings = get_settings()
+    details: Dict[str, Any] = {}
+    status = "ok"
+
+    for name, path in (("data", DATA_DIR), ("workdir", Path.cwd())):
+        if not path.exists() or not os.access(path, os.W_OK):
+            raise RuntimeError(f"{name} directory {path} is not writable")
+        free = shutil.disk_usage(path).free
+        details[f"{name}_free_bytes"] = free
+        if free < settings.health_min_free_disk_mb * 1024 * 1024:
+            status = "degraded"
+    return status, details
+
+
+async def check_worker_pool() -> Tuple[str, Dict[str, Any]]:
+    """Capacity of the thread pool used for sync endpoints and blocking calls"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    details = {"total": limiter.total_tokens, "busy": limiter.borrowed_tokens}
+    return ("degraded" if limiter.borrowed_tokens >= limiter.total_tokens else "ok"), details
+
+
+async def check_requests() -> Tuple[str, Dict[str, Any]]:
+    """Requests currently being served by this process"""
+    return "ok", {"in_flight": int(HTTP_REQUESTS_IN_FLIGHT.get())}
+
+
+async def check_admission() -> Tuple[str, Dict[str, Any]]:
+    """Slots, queue depth and rejections per admission-controlled route class"""
+    details = admission_status()
+    busy = any(route_class["queued"] for route_class in details.values())
+    return ("degraded" if busy else "ok"), details
+
+
+async def check_openai() -> Tuple[str, Dict[str, Any]]:
+    """OpenAI is reachable and the key is accepted, using the free models listing"""
+    from app.services.openai_service import get_openai_service
+
+    model_count = await asyncio.to_thread(get_openai_service().check_connectivity)
+    return "ok", {"models": model_count}
+
+
+async def check_youtube() -> Tuple[str, Dict[str, Any]]:
+    """YouTube Data API is reachable, when a key is configured"""
+    from app.youtubeAPI.service import YouTubeAPIService
+
+    if not os.environ.get("YOUTUBE_API_KEY"):
+        return "ok", {"configured": False}
+    languages = await YouTubeAPIService.check_connectivity()
+    return "ok", {"configured": True, "languages": languages}
+
+
+def create_health_service() -> HealthService:
+    settings = get_settings()
+    service = HealthService(shared=get_shared_cache("health") if shared_cache_enabled() else None)
+    service.register("storage", check_storage)
+    service.register("worker_pool", check_worker_pool, critical=False)
+    service.register("requests", check_requests, critical=False)
+    service.register("admission", check_admission, critical=False)
+    service.register(
+        "openai", check_openai,
+        critical=settings.health_require_upstream,
+        ttl=settings.health_upstream_ttl_seconds,
+        timeout=settings.health_check_timeout_seconds,
+    )
+    service.register(
+        "youtube", check_youtube,
+        critical=False,
+        ttl=settings.health_upstream_ttl_seconds,
+        timeout=settings.health_check_timeout_seconds,
+    )
+    return service
+
+
+health_service = create_health_service()
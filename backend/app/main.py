@@ -2,16 +2,26 @@ from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.staticfiles import StaticFiles
-from app.routers import chat
+from app.routers import chat, debug, metrics, usage
 from app.pdf_processor.routers import pdf_router
 from app.configuration.routers import config_router
 from app.summary.routers.summary_router import router as summary_router
 from app.youtubeAPI.router import router as youtube_router
+from app.health.router import router as health_router
+from app.core.admission import AdmissionMiddleware
 from app.core.config import get_settings
+from app.core.logs import configure_logging
+from app.core.memory import ensure_tracing
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.startup import lifespan
+from app.core.request_context import RequestIdMiddleware
+from app.core.usage import UsageMiddleware
 from app.models.responses import ErrorResponse
 from fastapi.openapi.docs import get_swagger_ui_html
 
 settings = get_settings()
+configure_logging(settings)
 
 # Custom dark mode HTML template
 SWAGGER_UI_DARK_TEMPLATE = '''
@@ -103,9 +113,17 @@ SWAGGER_UI_DARK_TEMPLATE = '''
 app = FastAPI(
     title=settings.app_name,
     description="API for interacting with OpenAI's GPT models",
-    docs_url=None  # Disable default docs to use custom route
+    docs_url=None,  # Disable default docs to use custom route
+    lifespan=lifespan
 )
 
+if settings.admission_enabled:
+    # Inside CORS so rejections still carry CORS headers
+    app.add_middleware(AdmissionMiddleware)
+
+# Outside admission control, so requests of clients over their token budget never take a slot
+app.add_middleware(UsageMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -115,6 +133,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# Added last so it wraps every other middleware and the request id is always set
+app.add_middleware(RequestIdMiddleware)
+
 # Custom docs endpoint with dark mode
 @app.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
@@ -131,6 +158,18 @@ app.include_router(pdf_router.router)
 app.include_router(config_router.router)
 app.include_router(summary_router)
 app.include_router(youtube_router)
+app.include_router(health_router)
+app.include_router(usage.router)
+
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
+
+if settings.memory_tracing_enabled:
+    # Start tracing early so snapshots include allocations made before the first PDF request
+    ensure_tracing()
+
+if settings.memory_debug_enabled:
+    app.include_router(debug.router)
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -1,12 +1,28 @@
-from pydantic import BaseModel, Field
-from typing import List
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal
 
 class Message(BaseModel):
     role: str = Field(..., pattern="^(system|user|assistant)$")
     content: str
 
 class ChatRequest(BaseModel):
+    """
+    Stateless by default: `messages` is the whole conversation. To keep the
+    history on the server instead, set `store` on the first turn and send the
+    returned `conversation_id` with only the new messages afterwards.
+    """
     messages: List[Message]
-    model: str = Field(default="gpt-3.5-turbo")
+    # Unset model and max_tokens are chosen by the server's routing rules from the tier,
+    # the request path and the prompt size
+    model: str | None = None
+    tier: Literal["fast", "standard", "quality"] = "standard"
     temperature: float = Field(default=0.7, ge=0, le=2)
     max_tokens: int | None = Field(default=None, ge=1, le=4096)
+    conversation_id: str | None = None
+    store: bool = False
+
+    @model_validator(mode="after")
+    def check_conversation(self) -> "ChatRequest":
+        if (self.store or self.conversation_id is not None) and not self.messages:
+            raise ValueError("'messages' must contain the new message of the conversation")
+        return self
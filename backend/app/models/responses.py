@@ -1,12 +1,56 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 
+from app.models.requests import Message
+
 class BaseResponse(BaseModel):
     status: str
     message: str
 
+class TokenUsage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Prompt tokens served from the provider's prompt cache
+    cached_tokens: int = 0
+
 class ChatResponse(BaseResponse):
     conversation_id: str | None = None
     content: str
+    usage: TokenUsage | None = None
+
+class ConversationResponse(BaseResponse):
+    conversation_id: str
+    # Running summary of the turns no longer kept verbatim
+    summary: str
+    messages: List[Message]
+
+class UsageRow(BaseModel):
+    # Set for the dimensions the report is grouped by
+    route: Optional[str] = None
+    prompt_id: Optional[str] = None
+    client_key: Optional[str] = None
+    model: Optional[str] = None
+    day: Optional[str] = None
+    calls: int
+    failed: int
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    total_tokens: int
+    avg_latency_ms: float
+    max_latency_ms: float
+
+class UsageReport(BaseResponse):
+    rows: List[UsageRow]
+
+class ClientBudgetResponse(BaseResponse):
+    client_key: str
+    window_hours: float
+    # Prompt plus completion tokens within the window
+    spent_tokens: int
+    budget_tokens: Optional[int] = None
+    remaining_tokens: Optional[int] = None
 
 class ErrorResponse(BaseResponse):
     error_code: str | None = None
@@ -1,7 +1,9 @@
 from typing import Optional
-import fitz
 import os
 from fastapi import UploadFile
+from app.core.lazy import lazy_import
+
+fitz = lazy_import("fitz")
 
 class BasePDFProcessor:
     def __init__(self, temp_dir: str = "temp"):
@@ -26,7 +28,7 @@ class BasePDFProcessor:
         if os.path.exists(file_path):
             os.remove(file_path)
 
-    async def process_pdf(self, file: UploadFile) -> Optional[fitz.Document]:
+    async def process_pdf(self, file: UploadFile) -> "Optional[fitz.Document]":
         """Process PDF file and return fitz Document object"""
         temp_file_path = None
         try:
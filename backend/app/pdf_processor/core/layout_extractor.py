@@ -0,0 +1,145 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.lazy import lazy_import
+from app.core.metrics import PDF_GET_TEXT_DICT_SECONDS, PDF_PAGES_PROCESSED
+from ..models.pdf_models import ImageBlock, PDFPageContent, TextBlock, TextLine, TextSpan
+from ..services.image_store import ImageStore, MEDIA_TYPES
+
+fitz = lazy_import("fitz")
+
+logger = logging.getLogger(__name__)
+
+IMAGE_URL_PREFIX = "/pdf/images/"
+# Inline images have no xref to extract, so their area of the page is rendered instead
+INLINE_IMAGE_DPI = 150
+# Span flag bits reported by get_text("dict")
+SPAN_ITALIC = 2
+SPAN_BOLD = 16
+
+
+def _bbox(rect: Sequence[float]) -> List[float]:
+    return [round(value, 2) for value in rect]
+
+
+class PDFLayoutExtractor:
+    """
+    Extract positioned text blocks and image references from the pages of an
+    open document.
+
+    Text comes from get_text("dict") without image data, so image-heavy pages
+    cost no more to parse than text-only ones. Images are found through their
+    placements on the page and written to the ImageStore. Each xref is
+    extracted once per document: `xref_images` maps xrefs to stored images and
+    is meant to be persisted between requests. The store itself deduplicates
+    identical images across documents by content hash.
+    """
+
+    def __init__(self, doc: "fitz.Document", image_store: ImageStore,
+                 xref_images: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.doc = doc
+        self.image_store = image_store
+        self.xref_images = xref_images if xref_images is not None else {}
+        self.changed = False
+
+    def extract_page(self, page_num: int) -> PDFPageContent:
+        """Layout of one page (0-based), blocks sorted top to bottom, then left to right"""
+        page = self.doc[page_num]
+        started = time.perf_counter()
+        data = page.get_text("dict", flags=fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES, sort=True)
+        PDF_GET_TEXT_DICT_SECONDS.observe(time.perf_counter() - started)
+        PDF_PAGES_PROCESSED.inc()
+
+        blocks: List[Any] = []
+        block_texts = []
+        for block in data["blocks"]:
+            if block.get("type") != 0:
+                continue
+            lines = []
+            line_texts = []
+            for line in block["lines"]:
+                spans = [
+                    TextSpan(
+                        text=span["text"],
+                        bbox=_bbox(span["bbox"]),
+                        font=span["font"],
+                        size=round(span["size"], 2),
+                        color=f"#{span['color']:06x}",
+                        bold=bool(span["flags"] & SPAN_BOLD),
+                        italic=bool(span["flags"] & SPAN_ITALIC),
+                    )
+                    for span in line["spans"] if span["text"]
+                ]
+                if spans:
+                    lines.append(TextLine(bbox=_bbox(line["bbox"]), spans=spans))
+                    line_texts.append("".join(span.text for span in spans))
+            if lines:
+                blocks.append(TextBlock(bbox=_bbox(block["bbox"]), lines=lines))
+                block_texts.append("\n".join(line_texts))
+
+        blocks.extend(self._image_blocks(page))
+        blocks.sort(key=lambda block: (block.bbox[1], block.bbox[0]))
+        return PDFPageContent(
+            page_number=page_num + 1,
+            text="\n".join(block_texts),
+            width=round(page.rect.width, 2),
+            height=round(page.rect.height, 2),
+            blocks=blocks,
+        )
+
+    def _image_blocks(self, page: "fitz.Page") -> List[ImageBlock]:
+        blocks = []
+        for placement in page.get_image_info(xrefs=True):
+            bbox = fitz.Rect(placement["bbox"]) & page.rect
+            if bbox.is_empty:
+                continue
+            xref = placement["xref"]
+            image = self._image_for_xref(xref) if xref else self._render_region(page, bbox)
+            if image is None:
+                continue
+            blocks.append(ImageBlock(
+                bbox=_bbox(bbox),
+                image_id=image["image_id"],
+                url=IMAGE_URL_PREFIX + image["image_id"],
+                width=image["width"],
+                height=image["height"],
+            ))
+        return blocks
+
+    def _image_for_xref(self, xref: int) -> Optional[Dict[str, Any]]:
+        key = str(xref)
+        image = self.xref_images.get(key)
+        if image is not None and self.image_store.exists(image["image_id"]):
+            return image
+        try:
+            data, ext, width, height = self._encode_xref(xref)
+        except Exception as e:
+            # Broken or unsupported images should not fail the whole page
+            logger.warning("Skipping image xref %d: %s", xref, e)
+            return None
+        image = {"image_id": self.image_store.save(data, ext), "width": width, "height": height}
+        self.xref_images[key] = image
+        self.changed = True
+        return image
+
+    def _encode_xref(self, xref: int):
+        """Encoded bytes, format, width and height of an image, converted to PNG if browsers cannot show it as-is"""
+        info = self.doc.extract_image(xref)
+        if not info:
+            raise ValueError("not an image")
+        ext = "jpeg" if info["ext"] in ("jpg", "jpeg") else info["ext"]
+        # A soft mask is stored separately and CMYK JPEGs render wrongly, so both are re-encoded
+        if ext in MEDIA_TYPES and not info.get("smask") and info.get("colorspace", 3) <= 3:
+            return info["image"], ext, info["width"], info["height"]
+
+        pix = fitz.Pixmap(self.doc, xref)
+        if pix.colorspace is not None and pix.colorspace.n > 3:
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        if info.get("smask") and not pix.alpha:
+            pix = fitz.Pixmap(pix, fitz.Pixmap(self.doc, info["smask"]))
+        return pix.tobytes("png"), "png", pix.width, pix.height
+
+    def _render_region(self, page: "fitz.Page", bbox: "fitz.Rect") -> Dict[str, Any]:
+        pix = page.get_pixmap(clip=bbox, dpi=INLINE_IMAGE_DPI)
+        return {"image_id": self.image_store.save(pix.tobytes("png"), "png"), "width": pix.width, "height": pix.height}
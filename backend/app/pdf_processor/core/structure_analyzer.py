@@ -1,7 +1,11 @@
 from typing import List, Tuple
 import re
-import fitz
+import time
 from ..models.pdf_models import Chapter, Section, PDFStructure
+from app.core.metrics import PDF_GET_TEXT_DICT_SECONDS, PDF_PAGES_PROCESSED
+from app.core.lazy import lazy_import
+
+fitz = lazy_import("fitz")
 
 class PDFStructureAnalyzer:
     # Common patterns for chapter and section detection
@@ -17,7 +21,7 @@ class PDFStructureAnalyzer:
     ]
 
     @staticmethod
-    def analyze_from_toc(doc: fitz.Document, filename: str, toc: List[Tuple[int, str, int]]) -> PDFStructure:
+    def analyze_from_toc(doc: "fitz.Document", filename: str, toc: List[Tuple[int, str, int]]) -> PDFStructure:
         """Extract structure from PDF's table of contents"""
         chapters = []
         current_chapter = None
@@ -45,7 +49,7 @@ class PDFStructureAnalyzer:
         return PDFStructure(filename=pdf_title, total_pages=len(doc), chapters=chapters)
 
     @staticmethod
-    def analyze_from_content(doc: fitz.Document, filename: str) -> PDFStructure:
+    def analyze_from_content(doc: "fitz.Document", filename: str) -> PDFStructure:
         """Extract structure by analyzing PDF content"""
         chapters = []
         current_chapter = None
@@ -53,7 +57,10 @@ class PDFStructureAnalyzer:
         
         for page_num in range(len(doc)):
             page = doc[page_num]
+            started = time.perf_counter()
             blocks = page.get_text("dict")["blocks"]
+            PDF_GET_TEXT_DICT_SECONDS.observe(time.perf_counter() - started)
+            PDF_PAGES_PROCESSED.inc()
             
             for block in blocks:
                 if "lines" not in block:
@@ -93,7 +100,7 @@ class PDFStructureAnalyzer:
         return PDFStructure(filename=pdf_title, total_pages=len(doc), chapters=chapters)
 
     @staticmethod
-    def _finalize_chapters(doc: fitz.Document, chapters: List[Chapter]) -> None:
+    def _finalize_chapters(doc: "fitz.Document", chapters: List[Chapter]) -> None:
         """Finalize chapter information and handle edge cases"""
         if not chapters:
             # Create default chapter for PDFs without clear structure
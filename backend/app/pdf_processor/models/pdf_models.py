@@ -1,11 +1,24 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Union
+
+class PageChangeReport(BaseModel):
+    """How a document differs, page by page, from the earlier revision it was compared with"""
+    previous_document_id: str
+    unchanged_pages: List[int] = []
+    changed_pages: List[int] = []
+    added_pages: List[int] = []
+    # Page numbers in the previous revision
+    removed_pages: List[int] = []
+    # Pages whose extracted text was carried over instead of being extracted again
+    reused_pages: int = 0
 
 class PDFInfo(BaseModel):
     filename: str
     total_pages: int
     title: str | None = None
     author: str | None = None
+    document_id: str | None = None
+    changes: PageChangeReport | None = None
 
 class Section(BaseModel):
     title: str
@@ -22,10 +35,47 @@ class PDFStructure(BaseModel):
     filename: str
     total_pages: int
     chapters: List[Chapter]
+    document_id: str | None = None
+    changes: PageChangeReport | None = None
+
+# Bounding boxes are [x0, y0, x1, y1] in PDF points, origin at the top left of the page
+BBox = List[float]
+
+class TextSpan(BaseModel):
+    text: str
+    bbox: BBox
+    font: str
+    size: float
+    color: str
+    bold: bool = False
+    italic: bool = False
+
+class TextLine(BaseModel):
+    bbox: BBox
+    spans: List[TextSpan]
+
+class TextBlock(BaseModel):
+    type: Literal["text"] = "text"
+    bbox: BBox
+    lines: List[TextLine]
+
+class ImageBlock(BaseModel):
+    type: Literal["image"] = "image"
+    bbox: BBox
+    image_id: str
+    url: str
+    width: int
+    height: int
+
+LayoutBlock = Annotated[Union[TextBlock, ImageBlock], Field(discriminator="type")]
 
 class PDFPageContent(BaseModel):
     page_number: int
     text: str
+    width: float | None = None
+    height: float | None = None
+    # Only in layout mode: text and image blocks in reading order
+    blocks: List[LayoutBlock] | None = None
 
 class PDFContent(BaseModel):
     filename: str
@@ -33,6 +83,8 @@ class PDFContent(BaseModel):
     end_page: int
     total_pages: int
     pages: List[PDFPageContent]
+    mode: Literal["text", "layout"] = "text"
+    document_id: str | None = None
 
 class PDFRawContent(BaseModel):
     filename: str
@@ -1,17 +1,34 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from ..services.pdf_info_service import PDFInfoService
 from ..services.pdf_structure_service import PDFStructureService
 from ..services.pdf_content_service import PDFContentService
+from ..services.document_store import get_document_store
+from ..services.image_store import get_image_store
 from ..models.pdf_models import PDFInfo, PDFStructure, PDFContent, PDFRawContent
+from app.core.admin import require_admin
+from app.core.memory import track_memory
 
 router = APIRouter(
     prefix="/pdf",
     tags=["pdf"]
 )
 
+# Image ids are content hashes, so a stored image never changes
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+PREVIOUS_DOCUMENT_DESCRIPTION = "Document id of the earlier revision of this PDF"
+LINK_PREVIOUS_DESCRIPTION = (
+    "Without previous_document_id, treat the latest earlier upload with the same filename as the previous revision"
+)
+
 @router.post("/analyze", response_model=PDFInfo)
 async def analyze_pdf(
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    previous_document_id: Optional[str] = Query(None, description=PREVIOUS_DOCUMENT_DESCRIPTION),
+    link_previous: bool = Query(False, description=LINK_PREVIOUS_DESCRIPTION)
 ) -> PDFInfo:
     """
     Upload and analyze a PDF file to get basic information:
@@ -19,22 +36,30 @@ async def analyze_pdf(
     - total pages
     - title (if available)
     - author (if available)
+    - changes: when the upload revises an earlier document, which pages are
+      unchanged, changed, added or removed; text already extracted for
+      unchanged pages is reused
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
     pdf_service = PDFInfoService()
-    info = await pdf_service.get_pdf_info(file)
+    with track_memory("info", file.size) as probe:
+        info = await pdf_service.get_pdf_info(file, previous_document_id, link_previous)
+        probe.page_count = info.total_pages
     return info
 
 @router.post("/analyze/structure", response_model=PDFStructure)
 async def analyze_pdf_structure(
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    previous_document_id: Optional[str] = Query(None, description=PREVIOUS_DOCUMENT_DESCRIPTION),
+    link_previous: bool = Query(False, description=LINK_PREVIOUS_DESCRIPTION)
 ) -> PDFStructure:
     """
     Analyze PDF structure to extract:
     - Chapters (with page ranges and lengths)
     - Sections within each chapter
+    - The page-level change report against an earlier revision, as for /pdf/analyze
     
     The analysis is done using two methods:
     1. First tries to extract from PDF's table of contents (most accurate)
@@ -44,23 +69,28 @@ async def analyze_pdf_structure(
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
     pdf_service = PDFStructureService()
-    structure = await pdf_service.analyze_structure(file)
+    with track_memory("structure", file.size) as probe:
+        structure = await pdf_service.analyze_structure(file, previous_document_id, link_previous)
+        probe.page_count = structure.total_pages
     return structure
 
 @router.post("/content", response_model=PDFContent)
 async def get_pdf_content(
     file: UploadFile = File(...),
     start_page: int = Query(..., gt=0, description="Start page number (1-based)"),
-    end_page: int = Query(..., gt=0, description="End page number (1-based)")
+    end_page: int = Query(..., gt=0, description="End page number (1-based)"),
+    mode: Literal["text", "layout"] = Query("text", description="`text` for plain text per page, `layout` for positioned blocks and images")
 ) -> PDFContent:
     """
-    Extract content (text and images) from the specified page range of a PDF file.
-    The content maintains formatting and layout information for proper display.
-    
-    Returns:
-    - Text blocks with formatting (font, size, color, etc.)
-    - Images as base64 with position and dimensions
-    - All content blocks sorted in reading order
+    Extract content from the specified page range of a PDF file.
+
+    In `text` mode each page carries its plain text. In `layout` mode each page
+    also carries its size and, in reading order:
+    - Text blocks with their lines and spans, each with position, font, size,
+      colour, bold and italic
+    - Image blocks with position, pixel dimensions and a `url` under
+      `/pdf/images/` to fetch the image from; images are not inlined
+    Layout mode stores the upload like `/pdf/analyze` and returns its `document_id`.
     """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
@@ -69,7 +99,9 @@ async def get_pdf_content(
         raise HTTPException(status_code=400, detail="End page must be greater than or equal to start page")
     
     pdf_service = PDFContentService()
-    content = await pdf_service.extract_content(file, start_page, end_page)
+    with track_memory("content", file.size) as probe:
+        content = await pdf_service.extract_content(file, start_page, end_page, mode)
+        probe.page_count = content.end_page - content.start_page + 1
     return content
 
 @router.post("/content-raw", response_model=PDFRawContent)
@@ -97,5 +129,34 @@ async def get_pdf_raw_content(
         end_page = start_page
     
     pdf_service = PDFContentService()
-    content = await pdf_service.extract_raw_content(file, start_page, end_page)
+    with track_memory("content-raw", file.size) as probe:
+        content = await pdf_service.extract_raw_content(file, start_page, end_page)
+        probe.page_count = content.end_page - content.start_page + 1
     return content
+
+@router.get("/images/{image_id}")
+async def get_pdf_image(image_id: str, request: Request) -> Response:
+    """
+    Serve an image referenced by a layout-mode content response.
+
+    Ids are content hashes, so responses may be cached indefinitely; a matching
+    If-None-Match gets 304 Not Modified.
+    """
+    store = get_image_store()
+    path = store.require(image_id)
+    headers = {"ETag": f'"{image_id}"', "Cache-Control": IMAGE_CACHE_CONTROL}
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(path, media_type=store.media_type(image_id), headers=headers)
+
+@router.delete("/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT,
+               dependencies=[Depends(require_admin)])
+async def delete_document(document_id: str) -> Response:
+    """
+    Delete a stored document with its cached page text and layout data.
+    Images extracted from it stay, as other documents may use them.
+    Requires the admin token.
+    """
+    if not await run_in_threadpool(get_document_store().delete, document_id):
+        raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,5 +1,13 @@
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 import os
+import shutil
+from pathlib import Path
+from typing import Optional, Tuple
+
+from ..models.pdf_models import PageChangeReport
+from .document_store import get_document_store
+from .page_cache import prepare_revision
 
 class BasePDFService:
     @staticmethod
@@ -8,11 +16,16 @@ class BasePDFService:
         Save uploaded file temporarily and return the path
         """
         temp_file_path = f"temp_{file.filename}"
-        content = await file.read()
-        with open(temp_file_path, "wb") as temp_file:
-            temp_file.write(content)
+        await file.seek(0)
+        await run_in_threadpool(BasePDFService._copy_to_path, file, temp_file_path)
         return temp_file_path
 
+    @staticmethod
+    def _copy_to_path(file: UploadFile, path: str) -> None:
+        # The upload is spooled to disk once it grows, so copy it in chunks rather than reading it whole
+        with open(path, "wb") as temp_file:
+            shutil.copyfileobj(file.file, temp_file, 1024 * 1024)
+
     @staticmethod
     async def cleanup_temp_file(temp_file_path: str) -> None:
         """
@@ -20,3 +33,26 @@ class BasePDFService:
         """
         if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
+
+    @staticmethod
+    async def save_document(file: UploadFile) -> Tuple[str, Path]:
+        """
+        Store the uploaded file in the document store and return its document id
+        and path. Later requests can refer to the document by id instead of
+        uploading it again.
+        """
+        await file.seek(0)
+        return await run_in_threadpool(get_document_store().save_file, file.file, file.filename)
+
+    @staticmethod
+    async def compare_with_previous(document_id: str, path: Path, filename: str,
+                                    previous_document_id: Optional[str] = None,
+                                    link_previous: bool = False) -> Optional[PageChangeReport]:
+        """
+        Fingerprint the pages of a stored upload and, if it is a revision of an
+        earlier document, reuse the text of its unchanged pages and report the
+        page-level changes
+        """
+        return await run_in_threadpool(
+            prepare_revision, get_document_store(), document_id, path, filename, previous_document_id, link_previous
+        )
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, BinaryIO, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.file_lock import file_lock, lock_path_for
+from app.core.lazy import lazy_import
+from app.core.metrics import DOCUMENTS_EVICTED
+
+fitz = lazy_import("fitz")
+
+DOCUMENT_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+SOURCE_FILENAME = "source.pdf"
+META_FILENAME = "meta.json"
+# Index of stored documents by filename, next to the document directories
+INDEX_FILENAME = "index.db"
+COPY_CHUNK_BYTES = 1024 * 1024
+# A document's last access is recorded at most this often
+TOUCH_INTERVAL_SECONDS = 60.0
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL DEFAULT 0,
+    -- The document's directory: source PDF plus derived artifacts
+    disk_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS documents_by_filename ON documents (filename, created_at);
+"""
+# Columns added after the index was first released
+INDEX_COLUMNS = {
+    "accessed_at": "ALTER TABLE documents ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0",
+    "disk_bytes": "ALTER TABLE documents ADD COLUMN disk_bytes INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def _directory_bytes(path: Path) -> int:
+    total = 0
+    for child in path.iterdir():
+        try:
+            total += child.stat().st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+
+class DocumentStore:
+    """
+    Content-addressed storage for uploaded PDFs.
+
+    A document's id is the SHA-256 of its bytes, so uploading the same file twice
+    stores it once and every later request can refer to it by id instead of
+    uploading it again. Each document lives in its own directory, which also holds
+    anything derived from it. A SQLite index lists the stored documents with
+    their filenames, sizes and last access, so finding earlier uploads does not
+    scan the directories.
+
+    Uploads that PyMuPDF cannot open are rejected before they are stored. Once
+    the stored documents take more than `max_disk_bytes`, the least recently
+    used ones are deleted with everything derived from them, and documents not
+    used for `max_idle_seconds` are deleted as well.
+    """
+
+    def __init__(self, root: Path, max_disk_bytes: Optional[int] = None,
+                 max_idle_seconds: Optional[float] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_idle_seconds = max_idle_seconds
+        self.index_path = self.root / INDEX_FILENAME
+        self._local = threading.local()
+        with file_lock(lock_path_for(self.index_path)):
+            conn = self._connection()
+            conn.executescript(INDEX_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+            for column, statement in INDEX_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            conn.execute("UPDATE documents SET accessed_at = created_at WHERE accessed_at = 0")
+            conn.execute("UPDATE documents SET disk_bytes = size_bytes WHERE disk_bytes = 0")
+            if conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 0:
+                self._import_legacy_meta(conn)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy_meta(self, conn: sqlite3.Connection) -> None:
+        # Documents stored before the index existed only have their meta.json
+        rows = []
+        for meta_path in self.root.glob(f"*/{META_FILENAME}"):
+            document_id = meta_path.parent.name
+            if not DOCUMENT_ID_PATTERN.match(document_id):
+                continue
+            try:
+                meta = json.loads(meta_path.read_text())
+            except (OSError, ValueError):
+                continue
+            created_at = meta.get("created_at", 0.0)
+            rows.append((document_id, meta.get("filename", ""), meta.get("size_bytes", 0), created_at, created_at,
+                         _directory_bytes(meta_path.parent)))
+        conn.executemany(
+            "INSERT OR IGNORE INTO documents (document_id, filename, size_bytes, created_at, accessed_at, disk_bytes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def _write_meta(self, document_id: str, filename: str, size: int) -> None:
+        created_at = time.time()
+        self._atomic_write(self.document_dir(document_id) / META_FILENAME, json.dumps({
+            "filename": filename,
+            "size_bytes": size,
+            "created_at": created_at,
+        }).encode())
+        self._connection().execute(
+            "INSERT OR REPLACE INTO documents (document_id, filename, size_bytes, created_at, accessed_at, disk_bytes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (document_id, filename, size, created_at, created_at, _directory_bytes(self.document_dir(document_id)))
+        )
+
+    @staticmethod
+    def _validate_pdf(path: Path) -> None:
+        """Raise 400 unless PyMuPDF can open the upload as a PDF with at least one page"""
+        try:
+            with fitz.open(path, filetype="pdf") as doc:
+                valid = doc.is_pdf and len(doc) > 0
+        except Exception:
+            valid = False
+        if not valid:
+            raise HTTPException(status_code=400, detail="The file is not a readable PDF")
+
+    def document_dir(self, document_id: str) -> Path:
+        if not DOCUMENT_ID_PATTERN.match(document_id):
+            raise HTTPException(status_code=400, detail="Invalid document id")
+        return self.root / document_id
+
+    def source_path(self, document_id: str) -> Path:
+        return self.document_dir(document_id) / SOURCE_FILENAME
+
+    def save_file(self, source: BinaryIO, filename: str) -> Tuple[str, Path]:
+        """
+        Store an uploaded PDF if not already present; return the document id and its
+        path. The upload is copied in chunks while hashing, so it is never held in
+        memory as a whole
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while chunk := source.read(COPY_CHUNK_BYTES):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+
+            document_id = digest.hexdigest()
+            document_dir = self.document_dir(document_id)
+            source_path = document_dir / SOURCE_FILENAME
+            if source_path.exists():
+                self.touch(document_id)
+                return document_id, source_path
+
+            self._validate_pdf(Path(tmp_path))
+            document_dir.mkdir(parents=True, exist_ok=True)
+            with file_lock(document_dir / ".lock"):
+                if not source_path.exists():
+                    os.replace(tmp_path, source_path)
+                    self._write_meta(document_id, filename, size)
+            self.enforce_limits(keep=document_id)
+            return document_id, source_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def latest_with_filename(self, filename: str, exclude: Optional[str] = None) -> Optional[str]:
+        """Id of the most recently stored document uploaded under `filename`, other than `exclude`"""
+        row = self._connection().execute(
+            "SELECT document_id FROM documents WHERE filename = ? AND document_id != ? "
+            "ORDER BY created_at DESC LIMIT 1",
+            (filename, exclude or "")
+        ).fetchone()
+        return row[0] if row else None
+
+    def require_source(self, document_id: str) -> Path:
+        """Return the stored PDF path or raise 404"""
+        source_path = self.source_path(document_id)
+        if not source_path.exists():
+            raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+        self.touch(document_id)
+        return source_path
+
+    def touch(self, document_id: str) -> None:
+        """Record a use of the document, which keeps it from being evicted"""
+        now = time.time()
+        self._connection().execute(
+            "UPDATE documents SET accessed_at = ? WHERE document_id = ? AND accessed_at < ?",
+            (now, document_id, now - TOUCH_INTERVAL_SECONDS)
+        )
+
+    def delete(self, document_id: str) -> bool:
+        """Delete a document and everything derived from it; False if it was not stored"""
+        document_dir = self.document_dir(document_id)
+        existed = document_dir.exists()
+        if existed:
+            with file_lock(document_dir / ".lock"):
+                shutil.rmtree(document_dir, ignore_errors=True)
+        deleted = self._connection().execute(
+            "DELETE FROM documents WHERE document_id = ?", (document_id,)
+        ).rowcount
+        return existed or deleted > 0
+
+    def enforce_limits(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Delete idle documents, then least recently used ones until the store fits
+        `max_disk_bytes`; `keep` is never deleted. Returns the deleted ids.
+        """
+        conn = self._connection()
+        evicted = []
+        if self.max_idle_seconds is not None:
+            rows = conn.execute(
+                "SELECT document_id FROM documents WHERE accessed_at < ? AND document_id != ?",
+                (time.time() - self.max_idle_seconds, keep or "")
+            ).fetchall()
+            for (document_id,) in rows:
+                self.delete(document_id)
+                DOCUMENTS_EVICTED.labels("idle").inc()
+                evicted.append(document_id)
+
+        if self.max_disk_bytes is not None:
+            total = conn.execute("SELECT COALESCE(SUM(disk_bytes), 0) FROM documents").fetchone()[0]
+            if total > self.max_disk_bytes:
+                rows = conn.execute(
+                    "SELECT document_id, disk_bytes FROM documents WHERE document_id != ? ORDER BY accessed_at",
+                    (keep or "",)
+                ).fetchall()
+                for document_id, disk_bytes in rows:
+                    if total <= self.max_disk_bytes:
+                        break
+                    self.delete(document_id)
+                    DOCUMENTS_EVICTED.labels("size").inc()
+                    evicted.append(document_id)
+                    total -= disk_bytes
+        return evicted
+
+    def load_artifact(self, document_id: str, name: str) -> Optional[Any]:
+        """Read a JSON artifact derived from the document, or None if it was never saved"""
+        path = self.document_dir(document_id) / name
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+
+    def save_artifact(self, document_id: str, name: str, value: Any) -> None:
+        """Store a JSON artifact derived from the document next to its source"""
+        self.write_artifact(document_id, name, json.dumps(value).encode())
+
+    def artifact_path(self, document_id: str, name: str) -> Path:
+        return self.document_dir(document_id) / name
+
+    def write_artifact(self, document_id: str, name: str, data: bytes) -> None:
+        """Atomically replace a binary artifact of the document"""
+        self._atomic_write(self.artifact_path(document_id, name), data)
+        self._connection().execute(
+            "UPDATE documents SET disk_bytes = ? WHERE document_id = ?",
+            (_directory_bytes(self.document_dir(document_id)), document_id)
+        )
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes) -> None:
+        # Write to a sibling temp file and rename so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+@lru_cache()
+def get_document_store() -> DocumentStore:
+    """Shared DocumentStore rooted at the configured documents directory"""
+    settings = get_settings()
+    documents_dir: Optional[str] = settings.documents_dir
+    root = Path(documents_dir) if documents_dir else Path(__file__).parent.parent.parent.parent / "data" / "documents"
+    max_idle_days = settings.documents_max_idle_days
+    return DocumentStore(
+        root,
+        max_disk_bytes=int(settings.documents_max_disk_mb * 1024 * 1024) if settings.documents_max_disk_mb else None,
+        max_idle_seconds=max_idle_days * 86400 if max_idle_days else None,
+    )
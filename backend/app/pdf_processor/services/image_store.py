@@ -0,0 +1,89 @@
+import hashlib
+import os
+import re
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+
+# Formats browsers display natively; anything else is converted to PNG before storing
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+}
+IMAGE_ID_PATTERN = re.compile(r"^([0-9a-f]{64})\.(png|jpeg|gif|webp|bmp)$")
+
+
+class ImageStore:
+    """
+    Content-addressed storage for images extracted from PDFs.
+
+    An image's id is the SHA-256 of its encoded bytes plus its format
+    extension, so an image used by many pages or many documents is stored
+    once. Files are never modified after they are written, which lets them be
+    served with immutable cache headers.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def compute_id(data: bytes, ext: str) -> str:
+        return f"{hashlib.sha256(data).hexdigest()}.{ext}"
+
+    def path_for(self, image_id: str) -> Path:
+        match = IMAGE_ID_PATTERN.match(image_id)
+        if not match:
+            raise HTTPException(status_code=400, detail="Invalid image id")
+        # Two-character fan-out keeps directories small for large libraries
+        return self.root / match.group(1)[:2] / image_id
+
+    def save(self, data: bytes, ext: str) -> str:
+        """Store encoded image bytes if not already present and return the image id"""
+        if ext not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported image format: {ext}")
+        image_id = self.compute_id(data, ext)
+        path = self.path_for(image_id)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Identical content from concurrent writers is harmless; the rename is atomic
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{image_id}.")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return image_id
+
+    def exists(self, image_id: str) -> bool:
+        return self.path_for(image_id).exists()
+
+    def require(self, image_id: str) -> Path:
+        """Return the stored image path or raise 404"""
+        path = self.path_for(image_id)
+        if not path.exists():
+            raise HTTPException(status_code=404, detail=f"Image {image_id} not found")
+        return path
+
+    @staticmethod
+    def media_type(image_id: str) -> str:
+        return MEDIA_TYPES[image_id.rsplit(".", 1)[1]]
+
+
+@lru_cache()
+def get_image_store() -> ImageStore:
+    """Shared ImageStore rooted at the configured images directory"""
+    images_dir: Optional[str] = get_settings().images_dir
+    root = Path(images_dir) if images_dir else Path(__file__).parent.parent.parent.parent / "data" / "images"
+    return ImageStore(root)
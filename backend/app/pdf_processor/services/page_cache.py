@@ -0,0 +1,322 @@
+import difflib
+import hashlib
+import importlib.metadata
+import json
+import logging
+import mmap
+import struct
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.file_lock import file_lock
+from app.core.lazy import lazy_import
+from app.core.metrics import PDF_OPEN_SECONDS
+from ..models.pdf_models import PageChangeReport
+from .document_store import DocumentStore
+
+fitz = lazy_import("fitz")
+
+logger = logging.getLogger(__name__)
+
+PAGE_TEXT_FILENAME = "pages.bin"
+# JSON page-text cache written by earlier versions; removed when a document's store is rewritten
+LEGACY_PAGE_TEXT_ARTIFACT = "pages.json"
+# Bump whenever text extraction or page fingerprints change so cached text is rebuilt
+EXTRACTION_VERSION = 3
+
+MAGIC = b"PLMTXT01"
+# Magic, extraction settings key, index offset, index length
+HEADER = struct.Struct("<8s16sQI")
+COUNT = struct.Struct("<I")
+# Fingerprint, blob offset, blob length
+ENTRY = struct.Struct("<16sQI")
+FINGERPRINT_BYTES = 16
+COMPRESSION_LEVEL = 6
+
+
+@lru_cache()
+def _pymupdf_version() -> str:
+    # Read from the package metadata so checking the key does not import PyMuPDF
+    try:
+        return importlib.metadata.version("pymupdf")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def extraction_settings_key() -> bytes:
+    """Identifies everything that affects extracted text; stored text made under another key is stale"""
+    payload = json.dumps({
+        "extraction": EXTRACTION_VERSION,
+        "sort": get_settings().pdf_text_sort,
+        "pymupdf": _pymupdf_version(),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).digest()[:FINGERPRINT_BYTES]
+
+
+def page_fingerprint(page: "fitz.Page") -> str:
+    """
+    Hash of what determines a page's text: its content stream, the streams of
+    the Form XObjects it draws (nested ones included), its images, the fonts it
+    refers to and its geometry. Pages placed with `show_pdf_page` or by
+    imposition tools consist of a single `/fzFrm0 Do`, so without the form
+    streams they would all look alike. Object numbers are left out, and font
+    subset prefixes ("ABCDEF+") are dropped, because both change on every
+    export of an otherwise identical page.
+    """
+    doc = page.parent
+    digest = hashlib.sha256(page.read_contents())
+    for xref, *_ in page.get_xobjects():
+        digest.update(hashlib.sha256(doc.xref_stream(xref) or b"").digest())
+    for xref, *_ in page.get_images(full=True):
+        digest.update(hashlib.sha256(doc.xref_stream_raw(xref) or b"").digest())
+    fonts = sorted(
+        (name, basefont.split("+", 1)[-1], font_type, encoding)
+        for _, _, font_type, basefont, name, encoding, *_ in page.get_fonts()
+    )
+    digest.update(repr((fonts, tuple(page.rect), page.rotation)).encode())
+    return digest.hexdigest()[:32]
+
+
+class PageTextCache:
+    """
+    Extracted text of a stored document's pages in one compact file.
+
+    `pages.bin` holds a header, the zlib-compressed text of each distinct page,
+    and an index at the end. The index lists the fingerprint of every page, then
+    the offset and length of the blob for each fingerprint. The file is
+    memory-mapped and only the blobs of requested pages are decompressed, so a
+    page range is served without opening the PDF or reading the rest of the
+    file. Identical pages share a blob. Blobs of unchanged pages are copied from
+    an earlier revision without being decompressed.
+
+    The header carries a key of the extraction settings. A file written under
+    other settings is treated as empty and replaced on the next save, so stale
+    text is rebuilt automatically. A save writes a complete new file and renames
+    it into place, so readers that mapped the old one are not affected.
+    """
+
+    def __init__(self, store: DocumentStore, document_id: str):
+        self.store = store
+        self.document_id = document_id
+        self.path = store.document_dir(document_id) / PAGE_TEXT_FILENAME
+        self.settings_key = extraction_settings_key()
+        self.fingerprints: List[str] = []
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._map: Optional[mmap.mmap] = None
+        # Compressed text of pages extracted since the last save
+        self._pending: Dict[str, bytes] = {}
+        self._pending_bytes = 0
+        self.dirty = False
+        self._open()
+
+    def _open(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: an empty file cannot be mapped
+            return
+        parsed = self._parse(mapped)
+        if parsed is None:
+            mapped.close()
+            return
+        self._map = mapped
+        self.fingerprints, self._index = parsed
+
+    def _parse(self, mapped: mmap.mmap) -> Optional[Tuple[List[str], Dict[str, Tuple[int, int]]]]:
+        if len(mapped) < HEADER.size:
+            return None
+        magic, settings_key, index_offset, index_length = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or settings_key != self.settings_key or index_offset + index_length > len(mapped):
+            return None
+        (page_count,) = COUNT.unpack_from(mapped, index_offset)
+        position = index_offset + COUNT.size
+        packed = mapped[position:position + page_count * FINGERPRINT_BYTES]
+        fingerprints = [packed[i:i + FINGERPRINT_BYTES].hex() for i in range(0, len(packed), FINGERPRINT_BYTES)]
+        position += len(packed)
+        (entry_count,) = COUNT.unpack_from(mapped, position)
+        position += COUNT.size
+        index = {
+            fingerprint.hex(): (offset, length)
+            for fingerprint, offset, length in ENTRY.iter_unpack(mapped[position:position + entry_count * ENTRY.size])
+        }
+        return fingerprints, index
+
+    def ensure_fingerprints(self, doc: "fitz.Document") -> List[str]:
+        if len(self.fingerprints) != len(doc):
+            self.fingerprints = [page_fingerprint(page) for page in doc]
+            self.dirty = True
+        return self.fingerprints
+
+    def _blob(self, fingerprint: str) -> Optional[bytes]:
+        blob = self._pending.get(fingerprint)
+        if blob is not None:
+            return blob
+        location = self._index.get(fingerprint)
+        if location is None:
+            return None
+        offset, length = location
+        return self._map[offset:offset + length]
+
+    def has(self, page_index: int) -> bool:
+        if page_index >= len(self.fingerprints):
+            return False
+        fingerprint = self.fingerprints[page_index]
+        return fingerprint in self._pending or fingerprint in self._index
+
+    def get(self, page_index: int) -> Optional[str]:
+        if page_index >= len(self.fingerprints):
+            return None
+        blob = self._blob(self.fingerprints[page_index])
+        return None if blob is None else zlib.decompress(blob).decode()
+
+    def put(self, page_index: int, text: str) -> None:
+        fingerprint = self.fingerprints[page_index]
+        if fingerprint in self._pending or fingerprint in self._index:
+            return
+        self._pending[fingerprint] = zlib.compress(text.encode(), COMPRESSION_LEVEL)
+        self._pending_bytes += len(text)
+        self.dirty = True
+
+    def adopt(self, previous: "PageTextCache") -> int:
+        """Copy the text of pages that also appear in `previous`; return how many pages it covers"""
+        reused = 0
+        for fingerprint in self.fingerprints:
+            blob = previous._blob(fingerprint)
+            if blob is None:
+                continue
+            reused += 1
+            if fingerprint not in self._pending and fingerprint not in self._index:
+                self._pending[fingerprint] = bytes(blob)
+                self.dirty = True
+        return reused
+
+    def text_bytes(self) -> int:
+        """Uncompressed size of the text extracted since the last save, which is held in memory"""
+        return self._pending_bytes
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        with file_lock(self.store.document_dir(self.document_id) / ".lock"):
+            # Another request may have saved other pages of the same document meanwhile
+            current = PageTextCache(self.store, self.document_id)
+            data = bytearray(HEADER.size)
+            entries = []
+            # Blobs in page order, so a page range maps to one contiguous region
+            for fingerprint in dict.fromkeys(self.fingerprints):
+                blob = self._blob(fingerprint)
+                if blob is None:
+                    blob = current._blob(fingerprint)
+                if blob is None:
+                    continue
+                entries.append(ENTRY.pack(bytes.fromhex(fingerprint), len(data), len(blob)))
+                data += blob
+            index_offset = len(data)
+            data += COUNT.pack(len(self.fingerprints))
+            data += b"".join(bytes.fromhex(fingerprint) for fingerprint in self.fingerprints)
+            data += COUNT.pack(len(entries))
+            data += b"".join(entries)
+            HEADER.pack_into(data, 0, MAGIC, self.settings_key, index_offset, len(data) - index_offset)
+            current.close()
+            self.store.write_artifact(self.document_id, PAGE_TEXT_FILENAME, bytes(data))
+            self.store.artifact_path(self.document_id, LEGACY_PAGE_TEXT_ARTIFACT).unlink(missing_ok=True)
+
+        self.close()
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._open()
+        self.dirty = False
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._index = {}
+
+
+def page_text_disk_bytes(store: DocumentStore) -> int:
+    """Disk space taken by the page-text caches of all stored documents"""
+    total = 0
+    for path in store.root.glob(f"*/{PAGE_TEXT_FILENAME}"):
+        try:
+            total += path.stat().st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+
+def compare_revisions(previous_document_id: str, previous: List[str], current: List[str]) -> PageChangeReport:
+    """Align two revisions' page fingerprints and classify every page of the new one"""
+    report = PageChangeReport(previous_document_id=previous_document_id)
+    matcher = difflib.SequenceMatcher(a=previous, b=current, autojunk=False)
+    for tag, a_start, a_end, b_start, b_end in matcher.get_opcodes():
+        new_pages = list(range(b_start + 1, b_end + 1))
+        old_pages = list(range(a_start + 1, a_end + 1))
+        if tag == "equal":
+            report.unchanged_pages.extend(new_pages)
+        elif tag == "replace":
+            # Pages pair up as changed; a longer or shorter replaced run also adds or removes pages
+            paired = min(len(old_pages), len(new_pages))
+            report.changed_pages.extend(new_pages[:paired])
+            report.added_pages.extend(new_pages[paired:])
+            report.removed_pages.extend(old_pages[paired:])
+        elif tag == "insert":
+            report.added_pages.extend(new_pages)
+        elif tag == "delete":
+            report.removed_pages.extend(old_pages)
+    return report
+
+
+def prepare_revision(store: DocumentStore, document_id: str, path: Path, filename: str,
+                     previous_document_id: Optional[str] = None,
+                     link_previous: bool = False) -> Optional[PageChangeReport]:
+    """
+    Fingerprint a newly stored document and, when it revises an earlier one,
+    carry over the extracted text of unchanged pages (blocking).
+
+    The earlier revision is `previous_document_id` (404 if unknown) or, with
+    `link_previous`, the most recently stored document uploaded under the same
+    filename. Returns the page-level change report, or None without an earlier
+    revision.
+    """
+    cache = PageTextCache(store, document_id)
+    if previous_document_id is not None:
+        store.require_source(previous_document_id)
+    elif link_previous:
+        previous_document_id = store.latest_with_filename(filename, exclude=document_id)
+    if previous_document_id == document_id:
+        previous_document_id = None
+    if cache.fingerprints and previous_document_id is None:
+        return None
+
+    if not cache.fingerprints:
+        with PDF_OPEN_SECONDS.time():
+            doc = fitz.open(path)
+        with doc:
+            started = time.perf_counter()
+            cache.ensure_fingerprints(doc)
+            logger.info("Fingerprinted %d pages of %s in %.3fs", len(doc), document_id, time.perf_counter() - started)
+    fingerprints = cache.fingerprints
+
+    report = None
+    if previous_document_id is not None:
+        previous = PageTextCache(store, previous_document_id)
+        if not previous.fingerprints:
+            previous_path = store.require_source(previous_document_id)
+            with fitz.open(previous_path) as previous_doc:
+                previous.ensure_fingerprints(previous_doc)
+            previous.save()
+        report = compare_revisions(previous_document_id, previous.fingerprints, fingerprints)
+        report.reused_pages = cache.adopt(previous)
+        logger.info(
+            "Revision of %s: %d unchanged, %d changed, %d added, %d removed pages",
+            previous_document_id, len(report.unchanged_pages), len(report.changed_pages),
+            len(report.added_pages), len(report.removed_pages)
+        )
+    cache.save()
+    return report
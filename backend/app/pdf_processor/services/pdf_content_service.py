@@ -1,75 +1,231 @@
-import fitz
 from fastapi import UploadFile, HTTPException
-from typing import List
+from fastapi.concurrency import run_in_threadpool
+from pathlib import Path
+from typing import List, Optional, Tuple
+from ..core.layout_extractor import PDFLayoutExtractor
 from ..models.pdf_models import PDFContent, PDFPageContent, PDFRawContent
 from .base_pdf_service import BasePDFService
+from .document_store import get_document_store
+from .image_store import get_image_store
+from .page_cache import PageTextCache
+from app.core.config import get_settings
+from app.core.metrics import PDF_OPEN_SECONDS, PDF_GET_TEXT_SECONDS, PDF_PAGES_PROCESSED
 import logging
+import time
+from app.core.lazy import lazy_import
+
+fitz = lazy_import("fitz")
 
 logger = logging.getLogger(__name__)
 
+# Per-document map of image xrefs to stored images, kept next to the source PDF
+XREF_IMAGES_ARTIFACT = "images.json"
+
+def clean_text(text: str) -> str:
+    """Collapse runs of spaces, newlines and carriage returns into single spaces"""
+    return ' '.join(text.split())
+
 class PDFContentService(BasePDFService):
     @staticmethod
-    async def extract_content(file: UploadFile, start_page: int, end_page: int) -> PDFContent:
+    def validate_page_range(start_page: int, end_page: int, total_pages: int) -> None:
+        if start_page < 1 or start_page > total_pages:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Start page must be between 1 and {total_pages}"
+            )
+        if end_page < start_page or end_page > total_pages:
+            raise HTTPException(
+                status_code=400,
+                detail=f"End page must be between {start_page} and {total_pages}"
+            )
+
+    @staticmethod
+    def extract_page_texts(doc: "fitz.Document", start_page: int, end_page: int,
+                           cache: Optional[PageTextCache] = None) -> List[str]:
+        """
+        Raw text of each page in a range of an open document, taken from `cache`
+        where available; pages that had to be extracted are added to it
+        """
+        PDFContentService.validate_page_range(start_page, end_page, len(doc))
+        if cache is not None:
+            cache.ensure_fingerprints(doc)
+
+        settings = get_settings()
+        sort = settings.pdf_text_sort
+        # Only every Nth extracted page is logged, so logging does not grow with the range
+        sample_every = settings.log_page_sample_every
+        log_pages = sample_every > 0 and logger.isEnabledFor(logging.INFO)
+        texts = []
+        extracted = extracted_chars = 0
+        range_started = time.perf_counter()
+        for page_num in range(start_page - 1, end_page):
+            page_text = cache.get(page_num) if cache is not None else None
+            if page_text is None:
+                page = doc[page_num]
+                started = time.perf_counter()
+                page_text = page.get_text(sort=sort)
+                elapsed = time.perf_counter() - started
+                PDF_GET_TEXT_SECONDS.observe(elapsed)
+                PDF_PAGES_PROCESSED.inc()
+                if log_pages and extracted % sample_every == 0:
+                    logger.info(
+                        "Extracted %d characters from page %d in %.1fms", len(page_text), page_num + 1,
+                        elapsed * 1000,
+                        extra={"page": page_num + 1, "characters": len(page_text),
+                               "duration_ms": round(elapsed * 1000, 1)}
+                    )
+                extracted += 1
+                extracted_chars += len(page_text)
+                if cache is not None:
+                    cache.put(page_num, page_text)
+            texts.append(page_text)
+
+        if extracted:
+            duration_ms = round((time.perf_counter() - range_started) * 1000, 1)
+            logger.info(
+                "Extracted %d of %d pages (%d characters) in %.1fms", extracted, end_page - start_page + 1,
+                extracted_chars, duration_ms,
+                extra={"pages_extracted": extracted, "pages_requested": end_page - start_page + 1,
+                       "characters": extracted_chars, "duration_ms": duration_ms}
+            )
+        return texts
+
+    @staticmethod
+    def extract_clean_text(doc: "fitz.Document", start_page: int, end_page: int,
+                           cache: Optional[PageTextCache] = None) -> str:
         """
-        Extract text from the specified page range of the PDF
+        Extract the cleaned text of a page range from an open document,
+        joining pages with a single space
+        """
+        texts = PDFContentService.extract_page_texts(doc, start_page, end_page, cache)
+        return ' '.join(clean_text(text) for text in texts)
+
+    @staticmethod
+    def read_document_pages(document_id: str, start_page: int, end_page: int) -> Tuple[List[str], int]:
+        """
+        Raw text of a page range of a stored document and its page count (blocking).
+        Pages already in the document's page-text cache, including pages carried
+        over from an earlier revision, are not extracted again; when all of them
+        are cached the PDF is not opened at all.
+        """
+        store = get_document_store()
+        path = store.require_source(document_id)
+        cache = PageTextCache(store, document_id)
+        total_pages = len(cache.fingerprints)
+        if total_pages:
+            PDFContentService.validate_page_range(start_page, end_page, total_pages)
+            texts = [cache.get(page_num) for page_num in range(start_page - 1, end_page)]
+            if None not in texts:
+                return texts, total_pages
+
+        with PDF_OPEN_SECONDS.time():
+            doc = fitz.open(path)
+        with doc:
+            texts = PDFContentService.extract_page_texts(doc, start_page, end_page, cache)
+            total_pages = len(doc)
+        cache.save()
+        return texts, total_pages
+
+    @staticmethod
+    def document_fingerprints(document_id: str, start_page: int, end_page: int) -> List[str]:
+        """Fingerprints of a page range of a stored document, computed on first use (blocking)"""
+        store = get_document_store()
+        cache = PageTextCache(store, document_id)
+        if not cache.fingerprints:
+            with PDF_OPEN_SECONDS.time():
+                doc = fitz.open(store.require_source(document_id))
+            with doc:
+                cache.ensure_fingerprints(doc)
+            cache.save()
+        PDFContentService.validate_page_range(start_page, end_page, len(cache.fingerprints))
+        return cache.fingerprints[start_page - 1:end_page]
+
+    @staticmethod
+    def extract_document_text(document_id: str, start_page: int, end_page: int) -> str:
+        """Cleaned text of a page range of a stored document (blocking)"""
+        texts, _ = PDFContentService.read_document_pages(document_id, start_page, end_page)
+        return ' '.join(clean_text(text) for text in texts)
+
+    @staticmethod
+    def extract_document_layout(document_id: str, path: Path, filename: str,
+                                start_page: int, end_page: int) -> PDFContent:
+        """
+        Open a stored PDF and extract positioned text blocks and image references
+        for a page range (blocking). Images are written to the image store once
+        and the document's xref map is saved so later requests skip extraction.
+        """
+        store = get_document_store()
+        with PDF_OPEN_SECONDS.time():
+            doc = fitz.open(path)
+        with doc:
+            PDFContentService.validate_page_range(start_page, end_page, len(doc))
+            extractor = PDFLayoutExtractor(
+                doc, get_image_store(), store.load_artifact(document_id, XREF_IMAGES_ARTIFACT)
+            )
+            pages = [extractor.extract_page(page_num) for page_num in range(start_page - 1, end_page)]
+            if extractor.changed:
+                store.save_artifact(document_id, XREF_IMAGES_ARTIFACT, extractor.xref_images)
+            return PDFContent(
+                filename=filename,
+                start_page=start_page,
+                end_page=end_page,
+                total_pages=len(doc),
+                pages=pages,
+                mode="layout",
+                document_id=document_id
+            )
+
+    @staticmethod
+    async def extract_content(file: UploadFile, start_page: int, end_page: int, mode: str = "text") -> PDFContent:
+        """
+        Extract the specified page range of the PDF: plain text per page, or in
+        layout mode positioned text blocks with font, size and colour plus
+        images by reference
         """
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
 
-        temp_file_path = None
-        try:
-            logger.info(f"Processing PDF {file.filename} pages {start_page} to {end_page}")
-            temp_file_path = await BasePDFService.save_temp_file(file)
-            doc = fitz.open(temp_file_path)
-            total_pages = len(doc)
-            
-            # Validate page range
-            if start_page < 1 or start_page > total_pages:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Start page must be between 1 and {total_pages}"
-                )
-            if end_page < start_page or end_page > total_pages:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"End page must be between {start_page} and {total_pages}"
+        if mode == "layout":
+            logger.info("Extracting layout of PDF %s pages %d to %d", file.filename, start_page, end_page)
+            document_id, document_path = await BasePDFService.save_document(file)
+            try:
+                return await run_in_threadpool(
+                    PDFContentService.extract_document_layout,
+                    document_id, document_path, file.filename, start_page, end_page
                 )
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error("Error extracting PDF layout: %s", e)
+                raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
-            pages = []
-            # Process each page in the range
-            for page_num in range(start_page - 1, end_page):
-                logger.info(f"Extracting text from page {page_num + 1}")
-                page = doc[page_num]
-                text_content = page.get_text()
-                logger.info(f"Extracted {len(text_content)} characters from page {page_num + 1}")
-                
-                pages.append(PDFPageContent(
-                    page_number=page_num + 1,
-                    text=text_content
-                ))
-
-            content = PDFContent(
+        try:
+            logger.info("Processing PDF %s pages %d to %d", file.filename, start_page, end_page)
+            document_id, _ = await BasePDFService.save_document(file)
+            texts, total_pages = await run_in_threadpool(
+                PDFContentService.read_document_pages, document_id, start_page, end_page
+            )
+            logger.info("Successfully processed PDF %s", file.filename)
+            return PDFContent(
                 filename=file.filename,
                 start_page=start_page,
                 end_page=end_page,
                 total_pages=total_pages,
-                pages=pages
+                pages=[
+                    PDFPageContent(page_number=page_number, text=text)
+                    for page_number, text in zip(range(start_page, end_page + 1), texts)
+                ],
+                document_id=document_id
             )
-            
-            doc.close()
-            logger.info(f"Successfully processed PDF {file.filename}")
-            return content
 
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error processing PDF: {str(e)}")
+            logger.error("Error processing PDF: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error processing PDF: {str(e)}"
             )
-        finally:
-            if temp_file_path:
-                # Clean up the temporary file
-                await BasePDFService.cleanup_temp_file(temp_file_path)
 
     @staticmethod
     async def extract_raw_content(file: UploadFile, start_page: int, end_page: int) -> PDFRawContent:
@@ -79,53 +235,23 @@ class PDFContentService(BasePDFService):
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
 
-        temp_file_path = None
         try:
-            logger.info(f"Processing PDF {file.filename} pages {start_page} to {end_page}")
-            temp_file_path = await BasePDFService.save_temp_file(file)
-            doc = fitz.open(temp_file_path)
-            total_pages = len(doc)
-            
-            # Validate page range
-            if start_page < 1 or start_page > total_pages:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Start page must be between 1 and {total_pages}"
-                )
-            if end_page < start_page or end_page > total_pages:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"End page must be between {start_page} and {total_pages}"
-                )
-
-            # Extract text from all pages in range and combine
-            text_content = []
-            for page_num in range(start_page - 1, end_page):
-                logger.info(f"Extracting text from page {page_num + 1}")
-                page = doc[page_num]
-                page_text = page.get_text()
-                # Clean up the text:
-                # 1. Replace multiple spaces with single space
-                # 2. Replace newlines and carriage returns with space
-                # 3. Strip whitespace
-                cleaned_text = ' '.join(page_text.split())
-                text_content.append(cleaned_text)
-                logger.info(f"Extracted {len(cleaned_text)} characters from page {page_num + 1}")
-
-            # Join all pages with a single space
-            final_text = ' '.join(text_content)
+            logger.info("Processing PDF %s pages %d to %d", file.filename, start_page, end_page)
+            document_id, _ = await BasePDFService.save_document(file)
+            texts, total_pages = await run_in_threadpool(
+                PDFContentService.read_document_pages, document_id, start_page, end_page
+            )
 
             return PDFRawContent(
                 filename=file.filename,
                 start_page=start_page,
                 end_page=end_page,
                 total_pages=total_pages,
-                text=final_text
+                text=' '.join(clean_text(text) for text in texts)
             )
 
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error processing PDF: {str(e)}")
+            logger.error("Error processing PDF: %s", e)
             raise HTTPException(status_code=500, detail=str(e))
-        finally:
-            if temp_file_path:
-                BasePDFService.cleanup_temp_file(temp_file_path)
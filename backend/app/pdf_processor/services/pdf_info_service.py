@@ -1,24 +1,33 @@
-import fitz  # PyMuPDF's fitz module
 from fastapi import UploadFile
+from typing import Optional
 from ..models.pdf_models import PDFInfo
 from .base_pdf_service import BasePDFService
+from app.core.metrics import PDF_OPEN_SECONDS
+from app.core.lazy import lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF, imported on first use
 
 class PDFInfoService(BasePDFService):
     @staticmethod
-    async def get_pdf_info(file: UploadFile) -> PDFInfo:
+    async def get_pdf_info(file: UploadFile, previous_document_id: Optional[str] = None,
+                           link_previous: bool = False) -> PDFInfo:
         """
         Get basic information about the PDF file
         """
-        temp_file_path = await BasePDFService.save_temp_file(file)
-        try:
-            # Open and analyze PDF
-            with fitz.open(temp_file_path) as doc:
-                metadata = doc.metadata
-                return PDFInfo(
-                    filename=file.filename,
-                    total_pages=len(doc),
-                    title=metadata.get('title'),
-                    author=metadata.get('author')
-                )
-        finally:
-            BasePDFService.cleanup_temp_file(temp_file_path)
+        document_id, document_path = await BasePDFService.save_document(file)
+        changes = await BasePDFService.compare_with_previous(
+            document_id, document_path, file.filename, previous_document_id, link_previous
+        )
+        # Open and analyze PDF
+        with PDF_OPEN_SECONDS.time():
+            doc = fitz.open(document_path)
+        with doc:
+            metadata = doc.metadata
+            return PDFInfo(
+                filename=file.filename,
+                total_pages=len(doc),
+                title=metadata.get('title'),
+                author=metadata.get('author'),
+                document_id=document_id,
+                changes=changes
+            )
@@ -1,30 +1,40 @@
-import fitz
 from fastapi import UploadFile, HTTPException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from ..models.pdf_models import PDFStructure, Chapter, Section
 from .base_pdf_service import BasePDFService
+from .prefetch import get_prefetcher
+from app.core.config import get_settings
+from app.core.metrics import PDF_OPEN_SECONDS, PDF_TOC_SECONDS
 import logging
+from app.core.lazy import lazy_import
+
+fitz = lazy_import("fitz")
 
 logger = logging.getLogger(__name__)
 
 class PDFStructureService(BasePDFService):
     @staticmethod
-    async def analyze_structure(file: UploadFile) -> PDFStructure:
+    async def analyze_structure(file: UploadFile, previous_document_id: Optional[str] = None,
+                                link_previous: bool = False) -> PDFStructure:
         """
         Analyze PDF structure to extract chapters and sections
         """
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="File must be a PDF")
 
-        temp_file_path = None
         try:
-            logger.info(f"Analyzing structure of PDF {file.filename}")
-            temp_file_path = await BasePDFService.save_temp_file(file)
-            doc = fitz.open(temp_file_path)
+            logger.info("Analyzing structure of PDF %s", file.filename)
+            document_id, document_path = await BasePDFService.save_document(file)
+            changes = await BasePDFService.compare_with_previous(
+                document_id, document_path, file.filename, previous_document_id, link_previous
+            )
+            with PDF_OPEN_SECONDS.time():
+                doc = fitz.open(document_path)
             total_pages = len(doc)
             
             # Try to get TOC (table of contents)
-            toc = doc.get_toc()
+            with PDF_TOC_SECONDS.time():
+                toc = doc.get_toc()
             chapters: List[Chapter] = []
             
             if toc:
@@ -79,20 +89,25 @@ class PDFStructureService(BasePDFService):
             structure = PDFStructure(
                 filename=file.filename,
                 total_pages=total_pages,
-                chapters=chapters
+                chapters=chapters,
+                document_id=document_id,
+                changes=changes
             )
             
             doc.close()
-            logger.info(f"Successfully analyzed PDF structure for {file.filename}")
+            logger.info("Successfully analyzed PDF structure for %s", file.filename)
+            if get_settings().pdf_prefetch_enabled and chapters:
+                # The client usually asks for one of these chapters next
+                get_prefetcher().schedule(
+                    document_id, [(chapter.start_page, chapter.end_page) for chapter in chapters]
+                )
             return structure
 
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error analyzing PDF structure: {str(e)}")
+            logger.error("Error analyzing PDF structure: %s", e)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error analyzing PDF structure: {str(e)}"
             )
-        finally:
-            if temp_file_path:
-                # Clean up the temporary file
-                await BasePDFService.cleanup_temp_file(temp_file_path)
@@ -0,0 +1,200 @@
+"""
+Background extraction of chapter text after structure analysis.
+
+Clients nearly always follow /pdf/analyze/structure with /pdf/content-raw for
+one of the chapters it returned. The prefetcher extracts those chapters into the
+document's page-text cache in the meantime, so that request finds its pages
+ready.
+
+Prefetching must never slow interactive requests down. It runs one page at a
+time on a single thread with the lowest CPU priority (where the OS allows it).
+Before each page it waits until no PDF request is running or queued, as seen
+by admission control. A job stops once the text it holds in memory passes
+`pdf_prefetch_max_memory_mb`, or once the page-text caches of all documents
+pass `pdf_prefetch_max_disk_mb` on disk. Pages extracted so far are kept.
+"""
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Set, Tuple
+
+from app.core.admission import limiters
+from app.core.config import get_settings
+from app.core.lazy import lazy_import
+from app.core.metrics import PDF_PREFETCH_JOBS, PDF_PREFETCH_PAGES
+from .document_store import DocumentStore, get_document_store
+from .page_cache import PageTextCache, page_text_disk_bytes
+from .pdf_content_service import PDFContentService
+
+fitz = lazy_import("fitz")
+
+logger = logging.getLogger(__name__)
+
+# Documents waiting beyond this are not prefetched
+MAX_PENDING_JOBS = 8
+# How often a waiting job checks whether PDF requests are still being served
+IDLE_POLL_SECONDS = 0.05
+# Extracted text is written to the page-text cache every this many pages
+SAVE_EVERY_PAGES = 50
+
+
+def _lower_thread_priority() -> None:
+    # On Linux a thread's nice value can be set through its native id
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+def _pdf_requests_busy() -> bool:
+    limiter = limiters.get("pdf")
+    return limiter is not None and (limiter.active > 0 or limiter.queued > 0)
+
+
+class PrefetchJob:
+    """One document being prefetched; all methods block and run on the prefetch thread"""
+
+    def __init__(self, store: DocumentStore, document_id: str):
+        self.cache = PageTextCache(store, document_id)
+        self.doc = fitz.open(store.require_source(document_id))
+        self.cache.ensure_fingerprints(self.doc)
+        self.extracted_bytes = 0
+        self.unsaved_pages = 0
+
+    def missing_pages(self, ranges: Sequence[Tuple[int, int]]) -> List[int]:
+        """0-based indexes of the pages in `ranges` (1-based, inclusive) that are not cached yet"""
+        pages = set()
+        for start_page, end_page in ranges:
+            start = max(start_page, 1) - 1
+            end = min(end_page, len(self.doc))
+            pages.update(page for page in range(start, end) if not self.cache.has(page))
+        return sorted(pages)
+
+    def extract(self, page_index: int) -> None:
+        text = PDFContentService.extract_page_texts(self.doc, page_index + 1, page_index + 1, self.cache)[0]
+        self.extracted_bytes += len(text)
+        self.unsaved_pages += 1
+        if self.unsaved_pages >= SAVE_EVERY_PAGES:
+            self.save()
+
+    def save(self) -> None:
+        self.cache.save()
+        self.unsaved_pages = 0
+
+    def close(self) -> None:
+        try:
+            self.save()
+        finally:
+            self.cache.close()
+            self.doc.close()
+
+
+class ChapterPrefetcher:
+    """Queue of documents whose chapters are extracted in the background, one at a time"""
+
+    def __init__(self, store: DocumentStore, max_memory_bytes: int, max_disk_bytes: int):
+        self.store = store
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pdf-prefetch", initializer=_lower_thread_priority
+        )
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Set[str] = set()
+
+    def schedule(self, document_id: str, ranges: Sequence[Tuple[int, Optional[int]]]) -> bool:
+        """
+        Queue the page ranges of a document for prefetching; call from the event
+        loop. Returns False when the document is already queued or the queue is full.
+        """
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(MAX_PENDING_JOBS)
+            self._pending.clear()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if document_id in self._pending:
+            return False
+        try:
+            self._queue.put_nowait((document_id, [(start, end or start) for start, end in ranges]))
+        except asyncio.QueueFull:
+            PDF_PREFETCH_JOBS.labels("dropped").inc()
+            return False
+        self._pending.add(document_id)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            document_id, ranges = await self._queue.get()
+            try:
+                outcome = await self._prefetch(document_id, ranges)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Prefetching %s failed", document_id)
+                outcome = "error"
+            finally:
+                self._pending.discard(document_id)
+            PDF_PREFETCH_JOBS.labels(outcome).inc()
+
+    async def _prefetch(self, document_id: str, ranges: List[Tuple[int, int]]) -> str:
+        loop = asyncio.get_running_loop()
+        await self._wait_until_idle()
+        disk_bytes = await loop.run_in_executor(self._executor, page_text_disk_bytes, self.store)
+        if disk_bytes >= self.max_disk_bytes:
+            return "budget"
+
+        job = await loop.run_in_executor(self._executor, PrefetchJob, self.store, document_id)
+        try:
+            pages = job.missing_pages(ranges)
+            logger.info("Prefetching %d pages of %s", len(pages), document_id)
+            for page_index in pages:
+                await self._wait_until_idle()
+                await loop.run_in_executor(self._executor, job.extract, page_index)
+                PDF_PREFETCH_PAGES.inc()
+                if (job.cache.text_bytes() >= self.max_memory_bytes
+                        or disk_bytes + job.extracted_bytes >= self.max_disk_bytes):
+                    logger.info("Prefetch of %s stopped at its budget", document_id)
+                    return "budget"
+            return "done"
+        finally:
+            # Runs even when cancelled, so a half-finished job still keeps its pages
+            await asyncio.shield(loop.run_in_executor(self._executor, job.close))
+
+    @staticmethod
+    async def _wait_until_idle() -> None:
+        while _pdf_requests_busy():
+            await asyncio.sleep(IDLE_POLL_SECONDS)
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_prefetcher: Optional[ChapterPrefetcher] = None
+
+
+def get_prefetcher() -> ChapterPrefetcher:
+    global _prefetcher
+    if _prefetcher is None:
+        settings = get_settings()
+        _prefetcher = ChapterPrefetcher(
+            get_document_store(),
+            settings.pdf_prefetch_max_memory_mb * 1024 * 1024,
+            settings.pdf_prefetch_max_disk_mb * 1024 * 1024,
+        )
+    return _prefetcher
+
+
+async def stop_prefetcher() -> None:
+    """Cancel background prefetching on shutdown; a no-op if it never started"""
+    global _prefetcher
+    if _prefetcher is not None:
+        await _prefetcher.stop()
+        _prefetcher = None
@@ -1,16 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
-from app.services.openai_service import OpenAIService
-from app.models.requests import ChatRequest
-from app.models.responses import BaseResponse, ChatResponse, ErrorResponse
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status
+from app.services.conversation_service import get_conversation_service
+from app.services.openai_service import get_openai_service
+from app.models.requests import ChatRequest, Message
+from app.models.responses import BaseResponse, ChatResponse, ConversationResponse, ErrorResponse
 
 router = APIRouter()
-openai_service = OpenAIService()
 
 @router.get("/test-openai", response_model=BaseResponse)
 def test_openai():
     """Test if OpenAI API is accessible"""
     try:
-        response = openai_service.test_connection()
+        response = get_openai_service().test_connection()
         return BaseResponse(status="success", message=response)
     except Exception as e:
         raise HTTPException(
@@ -24,15 +24,30 @@ def test_openai():
         )
 
 @router.post("/chat", response_model=ChatResponse)
-def create_chat_completion(request: ChatRequest):
-    """Create a chat completion"""
+def create_chat_completion(request: ChatRequest, background_tasks: BackgroundTasks):
+    """
+    Create a chat completion. With `store` or a `conversation_id` the history is
+    kept on the server and `messages` holds only the new messages.
+    """
     try:
-        response = openai_service.create_chat_completion(request)
+        openai_service = get_openai_service()
+        conversation_id = None
+        if request.store or request.conversation_id is not None:
+            conversations = get_conversation_service()
+            conversation_id, response = conversations.chat(request)
+            # Compaction runs after the response is sent, so the turn never waits for it
+            background_tasks.add_task(conversations.compact_if_needed, conversation_id)
+        else:
+            response = openai_service.create_chat_completion(request)
         return ChatResponse(
             status="success",
             message="Chat completion successful",
-            content=response.choices[0].message.content
+            conversation_id=conversation_id,
+            content=response.choices[0].message.content,
+            usage=openai_service.token_usage(response)
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -44,10 +59,29 @@ def create_chat_completion(request: ChatRequest):
             ).model_dump()
         )
 
+@router.get("/chat/conversations/{conversation_id}", response_model=ConversationResponse)
+def get_conversation(conversation_id: str):
+    """The stored state of a conversation: its running summary and the messages kept verbatim"""
+    conversation = get_conversation_service().load(conversation_id)
+    return ConversationResponse(
+        status="success",
+        message="Conversation retrieved",
+        conversation_id=conversation.id,
+        summary=conversation.summary,
+        messages=[Message(role=m.role, content=m.content) for m in conversation.messages]
+    )
+
+@router.delete("/chat/conversations/{conversation_id}", response_model=BaseResponse)
+def delete_conversation(conversation_id: str):
+    """Delete a stored conversation"""
+    if not get_conversation_service().store.delete(conversation_id):
+        raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+    return BaseResponse(status="success", message="Conversation deleted")
+
 @router.get("/validate-key", response_model=BaseResponse)
 def validate_api_key():
     """Validate if the OpenAI API key is working"""
-    is_valid = openai_service.validate_api_key()
+    is_valid = get_openai_service().validate_api_key()
     return BaseResponse(
         status="success" if is_valid else "error",
         message="API key is valid" if is_valid else "API key is invalid"
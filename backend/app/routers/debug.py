@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Query
+
+from app.core.memory import top_allocations
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+@router.get("/memory/top")
+def memory_top_allocations(
+    limit: int = Query(20, ge=1, le=500, description="Number of allocation sites to return"),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$", description="How to group allocations")
+):
+    """
+    Return the top allocation sites from a tracemalloc snapshot.
+    Requires MEMORY_TRACING_ENABLED so allocations are being traced.
+    """
+    return top_allocations(limit=limit, group_by=group_by)
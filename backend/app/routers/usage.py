@@ -0,0 +1,38 @@
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from app.core.admin import require_admin
+from app.core.config import get_settings
+from app.core.usage import budget_for, budget_window_start, get_usage_ledger
+from app.models.responses import ClientBudgetResponse, UsageReport, UsageRow
+
+router = APIRouter(prefix="/api/v1/usage", tags=["usage"], dependencies=[Depends(require_admin)])
+
+@router.get("", response_model=UsageReport)
+def usage_report(
+    group_by: List[Literal["route", "prompt_id", "client_key", "model", "day"]] = Query(
+        ["route"], description="Dimensions to total by; repeat the parameter for several"
+    ),
+    since: Optional[float] = Query(None, description="Only calls at or after this Unix time"),
+    until: Optional[float] = Query(None, description="Only calls before this Unix time"),
+    client_key: Optional[str] = Query(None, description="Only calls of this client"),
+):
+    """Token usage and latency of LLM calls, totalled by the requested dimensions, largest first"""
+    rows = get_usage_ledger().aggregate(list(dict.fromkeys(group_by)), since, until, client_key)
+    return UsageReport(status="success", message="Usage retrieved", rows=[UsageRow(**row) for row in rows])
+
+@router.get("/clients/{client_key}", response_model=ClientBudgetResponse)
+def client_budget(client_key: str):
+    """Tokens a client has used in the current budget window, and what is left of its budget"""
+    spent, _ = get_usage_ledger().spent(client_key, budget_window_start())
+    budget = budget_for(client_key)
+    return ClientBudgetResponse(
+        status="success",
+        message="Budget retrieved",
+        client_key=client_key,
+        window_hours=get_settings().usage_budget_window_hours,
+        spent_tokens=spent,
+        budget_tokens=budget,
+        remaining_tokens=max(0, budget - spent) if budget is not None else None,
+    )
@@ -0,0 +1,225 @@
+"""
+Multi-process server entry point.
+
+    python -m app.server --workers 4 --host 0.0.0.0 --port 8000
+
+The parent process imports the application once (and, unless --no-preload is
+given, PyMuPDF, the OpenAI SDK and httpx), binds the listening socket and forks
+the workers. Each worker runs its own uvicorn server and event loop on the
+inherited socket, and the kernel spreads connections across them. Everything
+loaded before the fork is shared copy-on-write; gc.freeze() keeps the
+collector from writing to, and so copying, those pages.
+
+Worker state that must agree across processes lives on disk: the SQLite stores
+serialise writes and take a file lock while they initialise, and the YouTube
+response cache and upstream health results go to a shared cache file
+(`SHARED_CACHE_PATH`, by default data/cache/shared.db when running more than
+one worker). Prometheus metrics remain per worker.
+
+Workers that die are replaced. SIGTERM or SIGINT shuts them down gracefully,
+waiting up to `SERVER_GRACEFUL_TIMEOUT_SECONDS` for in-flight requests.
+Requires fork(), so it runs on Linux and macOS; elsewhere use uvicorn directly.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import uvicorn
+from uvicorn.importer import import_from_string
+
+from app.core.config import get_settings
+from app.core.logs import configure_logging, stop_logging
+from app.core.startup import preload_modules
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_APP = "app.main:app"
+DEFAULT_SHARED_CACHE_PATH = Path(__file__).parent.parent / "data" / "cache" / "shared.db"
+# Workers exiting sooner than this after starting count as failing to start
+MIN_WORKER_UPTIME_SECONDS = 5.0
+MAX_FAILED_STARTS = 5
+
+
+def available_cpus() -> int:
+    """CPU cores this process may run on, honouring affinity masks and container cpusets"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Arbiter:
+    """Forks the workers, replaces the ones that die and stops them all on SIGTERM or SIGINT"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, graceful_timeout: float, log_level: str):
+        self.app = app
+        self.sock = sock
+        self.worker_count = workers
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.workers: Dict[int, float] = {}
+        self.stopping = False
+        self.failed_starts = 0
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        for _ in range(self.worker_count):
+            self._spawn()
+
+        while not self.stopping:
+            self._reap()
+            if self.failed_starts >= MAX_FAILED_STARTS:
+                logger.error("Workers keep failing on startup; shutting down")
+                self.stop()
+                return 1
+            while not self.stopping and len(self.workers) < self.worker_count:
+                self._spawn()
+            time.sleep(0.5)
+
+        self.stop()
+        return 0
+
+    def _handle_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def _run_worker(self) -> None:
+        """Body of a forked worker; never returns"""
+        # uvicorn installs its own handlers for a graceful shutdown
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            config = uvicorn.Config(
+                self.app,
+                log_level=self.log_level,
+                # Keep uvicorn's loggers unconfigured so they propagate to the root queue handler
+                log_config=None,
+                lifespan="on",
+                timeout_graceful_shutdown=self.graceful_timeout,
+                # Requests are logged by the application, with their request id
+                access_log=not get_settings().access_log_enabled,
+            )
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            exit_code = 1
+        finally:
+            # os._exit skips atexit hooks, so queued records are written out here
+            stop_logging()
+            logging.shutdown()
+            os._exit(exit_code)
+
+    def _reap(self) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            uptime = time.monotonic() - started
+            if self.stopping:
+                continue
+            logger.warning("Worker %d exited with status %d after %.1fs", pid, os.waitstatus_to_exitcode(status), uptime)
+            self.failed_starts = self.failed_starts + 1 if uptime < MIN_WORKER_UPTIME_SECONDS else 0
+
+    def stop(self) -> None:
+        """Ask every worker to finish its requests, then kill the ones that take too long"""
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            logger.warning("Killing worker %d after the graceful timeout", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.workers.clear()
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--app", default=DEFAULT_APP, help=f"ASGI application to serve (default {DEFAULT_APP})")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers,
+                        help="Worker processes (default: available CPU cores)")
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=True,
+                        help="Import PyMuPDF, the OpenAI SDK and httpx before forking")
+    parser.add_argument("--log-level", default=settings.log_level.lower())
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    if not hasattr(os, "fork"):
+        print("app.server needs fork(); run uvicorn app.main:app instead", file=sys.stderr)
+        return 2
+
+    args = _parse_args(argv)
+    configure_logging(level=args.log_level)
+    workers = max(1, args.workers or available_cpus())
+
+    if workers > 1 and not get_settings().shared_cache_path:
+        # Must be in place before the application reads its settings
+        os.environ["SHARED_CACHE_PATH"] = str(DEFAULT_SHARED_CACHE_PATH)
+        get_settings.cache_clear()
+
+    started = time.perf_counter()
+    app = import_from_string(args.app)
+    if args.preload:
+        preload_modules()
+    # Move everything loaded so far out of the collector's reach so workers do not copy it
+    gc.collect()
+    gc.freeze()
+    logger.info("Loaded %s in %.2fs", args.app, time.perf_counter() - started)
+
+    sock = bind_socket(args.host, args.port)
+    logger.info("Listening on %s:%d with %d workers", args.host, args.port, workers)
+    graceful_timeout = get_settings().server_graceful_timeout_seconds
+    try:
+        return Arbiter(app, sock, workers, graceful_timeout, args.log_level).run()
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+Server-side chat conversations.
+
+Clients start a conversation with `store: true` and afterwards send only their
+new messages with the returned `conversation_id`. The prompt of each turn is
+the conversation's system messages, a running summary of older turns and the
+recent messages verbatim, in that order, so consecutive turns share a prefix
+the provider can cache. A turn that sends system messages replaces the stored
+ones. After a turn, once the estimated size of the summary and the messages
+after it passes `chat_history_max_tokens`, the oldest messages are folded into the
+summary until about `chat_history_keep_tokens` of recent messages remain. Per
+turn prompt size therefore stays roughly constant however long the
+conversation gets.
+"""
+import logging
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import Settings, get_settings
+from app.core.metrics import CHAT_COMPACTIONS
+from app.models.requests import ChatRequest, Message
+from app.services.model_router import MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+from app.services.conversation_store import Conversation, ConversationStore, StoredMessage, get_conversation_store
+from app.services.openai_service import OpenAIService, get_openai_service
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+logger = logging.getLogger(__name__)
+
+# The latest exchange is always kept verbatim
+MIN_KEPT_MESSAGES = 2
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+COMPACTION_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the existing summary and the new messages into one updated summary. Keep the facts, "
+    "decisions, names, numbers and open questions the assistant needs to continue the conversation, "
+    "and drop pleasantries. Reply with the summary only."
+)
+
+
+class ConversationService:
+    def __init__(self, openai_service: OpenAIService = None, store: ConversationStore = None,
+                 settings: Settings = None):
+        self.settings = settings or get_settings()
+        self.openai_service = openai_service or get_openai_service()
+        self.store = store or get_conversation_store()
+
+    def load(self, conversation_id: str) -> Conversation:
+        conversation = self.store.get(conversation_id)
+        if conversation is None:
+            raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+        return conversation
+
+    @staticmethod
+    def history_messages(conversation: Conversation, system: Optional[List[Message]] = None) -> List[Message]:
+        """
+        The stored part of the prompt: system messages, then the summary, then
+        recent messages. `system` takes the place of the stored system messages.
+        """
+        if system is None:
+            system = [Message(role=m.role, content=m.content) for m in conversation.messages if m.role == "system"]
+        messages = list(system)
+        if conversation.summary:
+            messages.append(Message(role="system", content=SUMMARY_PREFIX + conversation.summary))
+        messages.extend(Message(role=m.role, content=m.content) for m in conversation.messages if m.role != "system")
+        return messages
+
+    def chat(self, request: ChatRequest) -> Tuple[str, "ChatCompletion"]:
+        """
+        Run one turn of a stored conversation, creating it when the request has no
+        `conversation_id`, and record the new messages and the reply. Returns the
+        conversation id and the completion.
+        """
+        if request.conversation_id is None:
+            conversation = Conversation(self.store.create(), "", 0, 0)
+        else:
+            conversation = self.load(request.conversation_id)
+
+        # Clients that resend their system prompt every turn replace it rather than pile up copies
+        system = [m for m in request.messages if m.role == "system"] or None
+        turn = [m for m in request.messages if m.role != "system"]
+        prompt = request.model_copy(update={"messages": self.history_messages(conversation, system) + turn})
+        response = self.openai_service.create_chat_completion(prompt, prompt_cache_key=f"chat-{conversation.id}")
+
+        reply = response.choices[0].message.content or ""
+        usage = self.openai_service.token_usage(response)
+        new_messages = [(m.role, m.content, estimate_tokens(m.content)) for m in request.messages]
+        new_messages.append((
+            "assistant", reply,
+            usage.completion_tokens + MESSAGE_OVERHEAD_TOKENS if usage is not None else estimate_tokens(reply)
+        ))
+        if not self.store.append(conversation.id, new_messages):
+            raise HTTPException(status_code=404, detail=f"Conversation {conversation.id} not found")
+        return conversation.id, response
+
+    def compact_if_needed(self, conversation_id: str) -> bool:
+        """
+        Fold the oldest messages into the summary when the history is over budget.
+        Runs after the response is sent; failures are logged and retried after
+        the next turn.
+        """
+        try:
+            conversation = self.store.get(conversation_id)
+            if conversation is None:
+                return False
+            # System messages are never folded, so they do not count against the budget
+            system_tokens = sum(m.tokens for m in conversation.messages if m.role == "system")
+            if conversation.history_tokens - system_tokens <= self.settings.chat_history_max_tokens:
+                return False
+
+            foldable = [m for m in conversation.messages if m.role != "system"]
+            cut, kept_tokens = len(foldable), 0
+            while cut > 0 and (len(foldable) - cut < MIN_KEPT_MESSAGES
+                               or kept_tokens + foldable[cut - 1].tokens <= self.settings.chat_history_keep_tokens):
+                cut -= 1
+                kept_tokens += foldable[cut].tokens
+            # Keep whole exchanges: the verbatim part starts with a user message
+            while 0 < cut < len(foldable) and foldable[cut].role != "user":
+                cut -= 1
+            folded = foldable[:cut]
+            if not folded:
+                return False
+
+            summary = self.summarize(conversation.summary, folded)
+            compacted = self.store.compact(
+                conversation_id, conversation.summarized_through, folded[-1].seq, summary, estimate_tokens(summary)
+            )
+        except Exception:
+            logger.exception("Compacting conversation %s failed", conversation_id)
+            CHAT_COMPACTIONS.labels("error").inc()
+            return False
+
+        CHAT_COMPACTIONS.labels("done" if compacted else "conflict").inc()
+        if compacted:
+            logger.info(
+                "Compacted %d messages of conversation %s; %d history tokens before",
+                len(folded), conversation_id, conversation.history_tokens
+            )
+        return compacted
+
+    def summarize(self, summary: str, messages: List[StoredMessage]) -> str:
+        transcript = "\n\n".join(f"{m.role}: {m.content}" for m in messages)
+        request = ChatRequest(
+            messages=[
+                Message(role="system", content=COMPACTION_PROMPT),
+                Message(role="user", content=f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}"),
+            ],
+            tier="fast",
+            max_tokens=self.settings.chat_summary_max_tokens,
+        )
+        response = self.openai_service.create_chat_completion(request)
+        return (response.choices[0].message.content or "").strip()
+
+
+@lru_cache()
+def get_conversation_service() -> ConversationService:
+    """Shared ConversationService instance"""
+    return ConversationService()
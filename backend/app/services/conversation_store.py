@@ -0,0 +1,186 @@
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from app.core.config import get_settings
+from app.core.file_lock import file_lock, lock_path_for
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL DEFAULT '',
+    summary_tokens INTEGER NOT NULL DEFAULT 0,
+    summarized_through INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+@dataclass
+class StoredMessage:
+    seq: int
+    role: str
+    content: str
+    tokens: int
+
+
+@dataclass
+class Conversation:
+    id: str
+    summary: str
+    summary_tokens: int
+    # Messages up to this sequence number are folded into the summary
+    summarized_through: int
+    messages: List[StoredMessage] = field(default_factory=list)
+
+    @property
+    def history_tokens(self) -> int:
+        return self.summary_tokens + sum(message.tokens for message in self.messages)
+
+
+class ConversationStore:
+    """
+    SQLite store of server-side chat conversations.
+
+    A conversation is a running summary plus the messages not folded into it
+    yet. Messages are numbered per conversation; compaction replaces the summary
+    and deletes the messages it now covers in one transaction, and only if no
+    other compaction got there first. System messages are never folded.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with file_lock(lock_path_for(self.db_path)):
+            self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def create(self) -> str:
+        conversation_id = uuid.uuid4().hex
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO conversations (id, created_at, updated_at) VALUES (?, ?, ?)",
+            (conversation_id, now, now)
+        )
+        return conversation_id
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT summary, summary_tokens, summarized_through FROM conversations WHERE id = ?",
+            (conversation_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        messages = [
+            StoredMessage(*message) for message in conn.execute(
+                "SELECT seq, role, content, tokens FROM conversation_messages "
+                "WHERE conversation_id = ? ORDER BY seq",
+                (conversation_id,)
+            )
+        ]
+        return Conversation(conversation_id, row[0], row[1], row[2], messages)
+
+    def append(self, conversation_id: str, messages: Sequence[Tuple[str, str, int]]) -> bool:
+        """
+        Add (role, content, tokens) messages after the existing ones; system messages
+        among them replace the stored ones. False if the conversation is gone.
+        """
+        def statements(conn: sqlite3.Connection) -> bool:
+            updated = conn.execute(
+                "UPDATE conversations SET updated_at = ? WHERE id = ?", (time.time(), conversation_id)
+            ).rowcount
+            if not updated:
+                return False
+            if any(role == "system" for role, _, _ in messages):
+                conn.execute(
+                    "DELETE FROM conversation_messages WHERE conversation_id = ? AND role = 'system'",
+                    (conversation_id,)
+                )
+            last_seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM conversation_messages WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()[0]
+            # Folded messages are deleted, so numbering continues after the summary too
+            (summarized_through,) = conn.execute(
+                "SELECT summarized_through FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            seq = max(last_seq, summarized_through)
+            conn.executemany(
+                "INSERT INTO conversation_messages (conversation_id, seq, role, content, tokens) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(conversation_id, seq + i, role, content, tokens)
+                 for i, (role, content, tokens) in enumerate(messages, 1)]
+            )
+            return True
+        return self._write(statements)
+
+    def compact(self, conversation_id: str, expected_through: int, through: int,
+                summary: str, summary_tokens: int) -> bool:
+        """
+        Replace the summary with one covering all non-system messages up to
+        `through`. Does nothing and returns False when the conversation was
+        compacted since it was read (its summary no longer ends at `expected_through`).
+        """
+        def statements(conn: sqlite3.Connection) -> bool:
+            updated = conn.execute(
+                "UPDATE conversations SET summary = ?, summary_tokens = ?, summarized_through = ?, updated_at = ? "
+                "WHERE id = ? AND summarized_through = ?",
+                (summary, summary_tokens, through, time.time(), conversation_id, expected_through)
+            ).rowcount
+            if not updated:
+                return False
+            conn.execute(
+                "DELETE FROM conversation_messages WHERE conversation_id = ? AND seq <= ? AND role != 'system'",
+                (conversation_id, through)
+            )
+            return True
+        return self._write(statements)
+
+    def delete(self, conversation_id: str) -> bool:
+        def statements(conn: sqlite3.Connection) -> bool:
+            conn.execute("DELETE FROM conversation_messages WHERE conversation_id = ?", (conversation_id,))
+            return conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,)).rowcount > 0
+        return self._write(statements)
+
+
+@lru_cache()
+def get_conversation_store() -> ConversationStore:
+    """Shared ConversationStore at the configured path, data/conversations/conversations.db by default"""
+    path = get_settings().conversation_store_path
+    db_path = Path(path) if path else Path(__file__).parent.parent.parent / "data" / "conversations" / "conversations.db"
+    return ConversationStore(db_path)
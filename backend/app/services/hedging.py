@@ -0,0 +1,217 @@
+"""
+Hedged OpenAI requests.
+
+A completion that has produced no token after the hedge delay is probably
+stuck behind a slow upstream replica. Sending the same request again usually
+finishes before it does. With hedging enabled, calls are streamed so the
+first token can be observed. If none has arrived within the delay, an
+identical second request is started. Whichever finishes first is returned,
+and the other one's stream is closed, which cancels it at the provider.
+
+The delay is `openai_hedge_delay_ms`. With a non-zero `openai_hedge_percentile`,
+it becomes that percentile of the model's recent time to first token, once
+`openai_hedge_min_samples` calls have been observed, but never less than the
+fixed delay. A hedge is only sent while the hedge budget allows it. The budget
+starts empty, every call adds `openai_hedge_max_ratio` to it, up to
+`HEDGE_BURST`, and every hedge takes one from it. Extra load therefore stays
+under that ratio even when the provider slows down as a whole.
+
+Tokens spent by cancelled requests are not reported by the provider, so they
+do not appear in the usage ledger.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import Settings
+from app.core.lazy import lazy_import
+from app.core.metrics import OPENAI_HEDGE_DELAY_SECONDS, OPENAI_HEDGES_TOTAL
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+openai = lazy_import("openai")
+
+logger = logging.getLogger(__name__)
+
+# Most hedges the budget can save up for sending in a row
+HEDGE_BURST = 5
+# Recent time-to-first-token samples kept per model for the adaptive delay
+LATENCY_WINDOW = 500
+# Threads shared by primary and hedge attempts
+MAX_ATTEMPT_THREADS = 64
+
+
+class HedgeCancelled(Exception):
+    pass
+
+
+class LatencyTracker:
+    """Recent time to first token per model"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, model: str, percentile: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        rank = max(1, min(len(samples), round(percentile / 100 * len(samples) + 0.5)))
+        return samples[rank - 1]
+
+
+class HedgeBudget:
+    """Token bucket limiting hedges to a fraction of all calls; it starts empty"""
+
+    def __init__(self, ratio: float, burst: int = HEDGE_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _Attempt:
+    """One streamed request; runs on an attempt thread and can be cancelled from another"""
+
+    def __init__(self, client: Any, model: str, kwargs: Dict[str, Any]):
+        self.client = client
+        self.model = model
+        self.kwargs = kwargs
+        # Set at the first chunk, or when the attempt ends without one
+        self.responded = threading.Event()
+        self.first_token_seconds: Optional[float] = None
+        self._cancelled = False
+        self._stream = None
+
+    def run(self) -> "ChatCompletion":
+        started = time.perf_counter()
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model, stream=True, stream_options={"include_usage": True}, **self.kwargs
+            )
+            self._stream = stream
+            with stream:
+                parts: List[str] = []
+                meta: Dict[str, Any] = {}
+                finish_reason, usage = None, None
+                for chunk in stream:
+                    if self._cancelled:
+                        raise HedgeCancelled()
+                    if self.first_token_seconds is None:
+                        self.first_token_seconds = time.perf_counter() - started
+                        self.responded.set()
+                    meta = {"id": chunk.id, "created": chunk.created, "model": chunk.model}
+                    for choice in chunk.choices:
+                        if choice.delta.content:
+                            parts.append(choice.delta.content)
+                        finish_reason = choice.finish_reason or finish_reason
+                    if chunk.usage is not None:
+                        usage = chunk.usage.model_dump()
+            if self._cancelled:
+                raise HedgeCancelled()
+            if not meta:
+                raise openai.APIError("The completion stream ended without any chunk", stream.response.request,
+                                      body=None)
+        finally:
+            self.responded.set()
+        return openai.types.chat.ChatCompletion.model_validate({
+            **meta,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "finish_reason": finish_reason or "stop",
+                "message": {"role": "assistant", "content": "".join(parts)},
+            }],
+            "usage": usage,
+        })
+
+    def cancel(self) -> None:
+        self._cancelled = True
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class Hedger:
+    def __init__(self, settings: Settings):
+        self.delay_seconds = settings.openai_hedge_delay_ms / 1000
+        self.percentile = settings.openai_hedge_percentile
+        self.min_samples = settings.openai_hedge_min_samples
+        self.latencies = LatencyTracker()
+        self.budget = HedgeBudget(settings.openai_hedge_max_ratio)
+        self._executor = ThreadPoolExecutor(max_workers=MAX_ATTEMPT_THREADS, thread_name_prefix="openai-hedge")
+
+    def delay(self, model: str) -> float:
+        delay = self.delay_seconds
+        if self.percentile:
+            observed = self.latencies.percentile(model, self.percentile, self.min_samples)
+            if observed is not None:
+                delay = max(delay, observed)
+        OPENAI_HEDGE_DELAY_SECONDS.labels(model).set(delay)
+        return delay
+
+    def complete(self, client: Any, model: str, kwargs: Dict[str, Any]) -> Tuple["ChatCompletion", Optional[float]]:
+        """Run a completion, hedging it if it is slow to start; returns it and its time to first token"""
+        self.budget.earn()
+        primary = _Attempt(client, model, kwargs)
+        primary_future = self._executor.submit(primary.run)
+        if primary.responded.wait(self.delay(model)):
+            return self._finish(primary, primary_future.result())
+        if not self.budget.try_spend():
+            OPENAI_HEDGES_TOTAL.labels(model, "throttled").inc()
+            return self._finish(primary, primary_future.result())
+
+        hedge = _Attempt(client, model, kwargs)
+        pending: Dict[Future, _Attempt] = {primary_future: primary, self._executor.submit(hedge.run): hedge}
+        errors: List[BaseException] = []
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    attempt = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    OPENAI_HEDGES_TOTAL.labels(model, "hedge_won" if attempt is hedge else "primary_won").inc()
+                    return self._finish(attempt, result)
+        finally:
+            # The loser is cancelled; so is everything when the caller goes away
+            for future, attempt in pending.items():
+                attempt.cancel()
+                future.cancel()
+        OPENAI_HEDGES_TOTAL.labels(model, "failed").inc()
+        raise errors[0]
+
+    def _finish(self, attempt: _Attempt, result: "ChatCompletion") -> Tuple["ChatCompletion", Optional[float]]:
+        if attempt.first_token_seconds is not None:
+            self.latencies.observe(attempt.model, attempt.first_token_seconds)
+        return result, attempt.first_token_seconds
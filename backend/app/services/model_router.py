@@ -0,0 +1,113 @@
+"""
+Choice of model and output budget for each LLM call.
+
+`Settings.model_routes` is an ordered list of rules. Each rule can restrict
+the request path, the quality tier the caller asks for, and the estimated
+input size. The first matching rule names a model, an output budget, an
+optional timeout and fallback models. Candidate models whose context window
+cannot hold the prompt plus the output budget are dropped up front, so an
+oversized prompt goes straight to a model that can take it instead of
+failing first. During the call, a timeout or a context overflow reported by
+the provider moves on to the next candidate.
+
+Callers that name a model explicitly get that model with no fallbacks.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+from app.core.config import ModelRoute, Settings, get_settings
+from app.core.lazy import lazy_import
+from app.core.usage import usage_context_var
+
+openai = lazy_import("openai")
+
+# Rough token estimate for English text
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def estimate_prompt_tokens(messages: Sequence[Dict[str, Any]]) -> int:
+    return sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+
+
+def fallback_reason(error: Exception) -> Optional[str]:
+    """Why a failed call may succeed on another model, or None if it would not"""
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.BadRequestError) and getattr(error, "code", None) == "context_length_exceeded":
+        return "context_overflow"
+    return None
+
+
+@dataclass
+class RoutePlan:
+    rule: str
+    # Candidate models in the order they are tried
+    models: List[str] = field(default_factory=list)
+    max_tokens: int = 0
+    timeout_seconds: Optional[float] = None
+    input_tokens: int = 0
+
+
+class ModelRouter:
+    def __init__(self, settings: Settings = None):
+        self.settings = settings or get_settings()
+
+    @staticmethod
+    def _request_path() -> str:
+        context = usage_context_var.get()
+        return context.scope.get("path", "") if context is not None else ""
+
+    def _matches(self, rule: ModelRoute, path: str, tier: str, input_tokens: int) -> bool:
+        if rule.paths is not None and not path.startswith(tuple(rule.paths)):
+            return False
+        if rule.tiers is not None and tier not in rule.tiers:
+            return False
+        if rule.min_input_tokens is not None and input_tokens < rule.min_input_tokens:
+            return False
+        if rule.max_input_tokens is not None and input_tokens > rule.max_input_tokens:
+            return False
+        return True
+
+    def fits(self, model: str, input_tokens: int, max_tokens: int) -> bool:
+        context = self.settings.model_context_tokens.get(model)
+        return context is None or input_tokens + max_tokens <= context
+
+    def plan(self, messages: Sequence[Dict[str, Any]], tier: str = "standard", model: Optional[str] = None,
+             max_tokens: Optional[int] = None) -> RoutePlan:
+        """
+        Pick the models to try for a prompt. An explicit `model` or `max_tokens`
+        from the caller overrides the rule's. Raises 413 when the prompt fits
+        no candidate's context window.
+        """
+        settings = self.settings
+        input_tokens = estimate_prompt_tokens(messages)
+        if model is not None:
+            plan = RoutePlan("explicit", [model], max_tokens or settings.max_tokens, input_tokens=input_tokens)
+        elif not settings.model_routing_enabled:
+            plan = RoutePlan("disabled", [settings.default_model], max_tokens or settings.max_tokens,
+                             input_tokens=input_tokens)
+        else:
+            path = self._request_path()
+            rule = next((rule for rule in settings.model_routes if self._matches(rule, path, tier, input_tokens)), None)
+            if rule is None:
+                rule = ModelRoute(name="none")
+            candidates = list(dict.fromkeys([rule.model or settings.default_model, *rule.fallbacks]))
+            plan = RoutePlan(rule.name, candidates, max_tokens or rule.max_tokens or settings.max_tokens,
+                             rule.timeout_seconds, input_tokens)
+
+        fitting = [candidate for candidate in plan.models if self.fits(candidate, input_tokens, plan.max_tokens)]
+        if not fitting:
+            raise HTTPException(
+                status_code=413,
+                detail=f"A prompt of about {input_tokens} tokens plus {plan.max_tokens} output tokens "
+                       f"does not fit the context window of {', '.join(plan.models)}"
+            )
+        plan.models = fitting
+        return plan
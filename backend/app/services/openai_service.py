@@ -1,47 +1,184 @@
-from typing import List
-from openai import OpenAI
-from openai.types.chat import ChatCompletion
+import logging
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from fastapi import HTTPException
+
 from app.core.config import get_settings
+from app.core.lazy import lazy_import
+from app.core.metrics import (
+    OPENAI_ERRORS_TOTAL,
+    OPENAI_FALLBACKS_TOTAL,
+    OPENAI_REQUEST_SECONDS,
+    OPENAI_REQUESTS_IN_FLIGHT,
+    OPENAI_ROUTE_DECISIONS_TOTAL,
+    OPENAI_TOKENS_TOTAL,
+    OPENAI_TTFT_SECONDS,
+)
+from app.core.usage import record_llm_call
 from app.models.requests import ChatRequest, Message
+from app.models.responses import TokenUsage
+from app.services.hedging import Hedger
+from app.services.model_router import ModelRouter, fallback_reason
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+# The SDK takes about half a second to import; it is loaded when the first client is built
+openai = lazy_import("openai")
+
+# Client class used by OpenAIService; benchmarks replace it with a stub. None means openai.OpenAI
+client_class = None
+
+logger = logging.getLogger(__name__)
 
 class OpenAIService:
     def __init__(self):
         settings = get_settings()
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.client = (client_class or openai.OpenAI)(
+            api_key=settings.openai_api_key, base_url=settings.openai_base_url
+        )
+        # Used for routed candidates that have a fallback, which is tried instead of a retry
+        self.failover_client = self.client.with_options(max_retries=0)
         self.default_model = settings.default_model
         self.max_tokens = settings.max_tokens
         self.temperature = settings.temperature
+        self.router = ModelRouter(settings)
+        self.hedger = Hedger(settings) if settings.openai_hedge_enabled else None
+        self.hedge_tiers = set(settings.openai_hedge_tiers)
+
+    def _create_completion(self, model: str, hedge: bool = False, client: Any = None, **kwargs) -> "ChatCompletion":
+        """Run a chat completion, hedged if asked and enabled, and record latency and token usage metrics"""
+        client = client or self.client
+        OPENAI_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        first_token = None
+        try:
+            if hedge and self.hedger is not None:
+                response, first_token = self.hedger.complete(client, model, kwargs)
+            else:
+                response = client.chat.completions.create(model=model, **kwargs)
+        except Exception:
+            OPENAI_ERRORS_TOTAL.labels(model).inc()
+            record_llm_call(model, 0, 0, 0, time.perf_counter() - started, ok=False)
+            raise
+        finally:
+            OPENAI_REQUESTS_IN_FLIGHT.dec()
+
+        elapsed = time.perf_counter() - started
+        # Non-streamed responses become visible to the caller all at once
+        OPENAI_TTFT_SECONDS.labels(model).observe(first_token if first_token is not None else elapsed)
+
+        usage = self.token_usage(response)
+        if usage is not None:
+            OPENAI_TOKENS_TOTAL.labels(model, "prompt").inc(usage.prompt_tokens)
+            OPENAI_TOKENS_TOTAL.labels(model, "completion").inc(usage.completion_tokens)
+            if usage.cached_tokens:
+                OPENAI_TOKENS_TOTAL.labels(model, "cached").inc(usage.cached_tokens)
+            logger.info(
+                "OpenAI %s completion: %d prompt tokens (%d cached), %d completion tokens in %.2fs",
+                model, usage.prompt_tokens, usage.cached_tokens, usage.completion_tokens, elapsed
+            )
+            record_llm_call(model, usage.prompt_tokens, usage.completion_tokens, usage.cached_tokens, elapsed)
+        else:
+            record_llm_call(model, 0, 0, 0, elapsed)
+        cache = "hit" if usage is not None and usage.cached_tokens else "miss"
+        OPENAI_REQUEST_SECONDS.labels(model, cache).observe(elapsed)
+        return response
+
+    @staticmethod
+    def token_usage(response: "ChatCompletion") -> Optional[TokenUsage]:
+        """Token counts of a completion, including prompt tokens served from the provider cache"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        return TokenUsage(
+            prompt_tokens=usage.prompt_tokens or 0,
+            completion_tokens=usage.completion_tokens or 0,
+            cached_tokens=(getattr(details, "cached_tokens", None) or 0) if details else 0,
+        )
+
+    def _create_routed_completion(self, messages: List[Dict[str, Any]], tier: str = "standard",
+                                  model: Optional[str] = None, max_tokens: Optional[int] = None,
+                                  **kwargs) -> "ChatCompletion":
+        """Run a completion on the model chosen by the routing rules, falling back to the next on timeout or overflow"""
+        plan = self.router.plan(messages, tier, model, max_tokens)
+        if plan.timeout_seconds is not None:
+            kwargs["timeout"] = plan.timeout_seconds
+        last = len(plan.models) - 1
+        for attempt, candidate in enumerate(plan.models):
+            OPENAI_ROUTE_DECISIONS_TOTAL.labels(plan.rule, candidate).inc()
+            # The SDK would retry a timed-out call before we see the timeout; a candidate with a
+            # fallback fails over at once instead, and only the last one keeps the retries
+            client = self.failover_client if attempt < last else self.client
+            try:
+                return self._create_completion(
+                    model=candidate, hedge=tier in self.hedge_tiers, client=client, messages=messages,
+                    max_tokens=plan.max_tokens, **kwargs
+                )
+            except Exception as e:
+                reason = fallback_reason(e)
+                if reason is None or attempt == last:
+                    raise
+                OPENAI_FALLBACKS_TOTAL.labels(candidate, reason).inc()
+                logger.warning(
+                    "OpenAI %s failed (%s) for a prompt of about %d tokens; falling back to %s",
+                    candidate, reason, plan.input_tokens, plan.models[attempt + 1]
+                )
 
     def test_connection(self) -> str:
         """Test the connection to OpenAI API"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.default_model,
+            response = self._create_routed_completion(
                 messages=[
                     {"role": "user", "content": "Say 'OpenAI connection is working!'"}
-                ]
+                ],
+                tier="fast",
             )
             return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"OpenAI connection failed: {str(e)}")
 
-    def create_chat_completion(self, request: ChatRequest) -> ChatCompletion:
-        """Create a chat completion using OpenAI API"""
+    def create_chat_completion(self, request: ChatRequest, prompt_cache_key: Optional[str] = None) -> "ChatCompletion":
+        """
+        Create a chat completion using OpenAI API.
+
+        The model and output budget come from the routing rules for the request's
+        tier unless the request sets them. `prompt_cache_key` groups requests that
+        share a long prefix so the provider routes them to the same prompt cache.
+        """
+        extra = {"extra_body": {"prompt_cache_key": prompt_cache_key}} if prompt_cache_key else {}
         try:
-            response = self.client.chat.completions.create(
-                model=request.model or self.default_model,
+            return self._create_routed_completion(
                 messages=[msg.model_dump() for msg in request.messages],
+                tier=request.tier,
+                model=request.model,
+                max_tokens=request.max_tokens,
                 temperature=request.temperature or self.temperature,
-                max_tokens=request.max_tokens or self.max_tokens,
+                **extra,
             )
-            return response
+        except HTTPException:
+            raise
         except Exception as e:
             raise Exception(f"Chat completion failed: {str(e)}")
 
+    def check_connectivity(self) -> int:
+        """
+        Cheap reachability and credential check that lists the available models
+        instead of running a billed completion. Returns the number of models.
+        """
+        return len(self.client.models.list().data)
+
     def validate_api_key(self) -> bool:
         """Validate if the API key is working"""
         try:
-            self.test_connection()
+            self.check_connectivity()
             return True
         except:
             return False
+
+@lru_cache()
+def get_openai_service() -> OpenAIService:
+    """Shared OpenAIService instance"""
+    return OpenAIService()
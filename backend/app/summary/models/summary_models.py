@@ -1,8 +1,37 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.models.responses import TokenUsage
 
 class SummaryRequest(BaseModel):
-    text: str
-    prompt: str
+    """
+    Either send the text and prompt inline, or refer to a stored document page
+    range (`document_id` from /pdf/analyze) or the stored comments of a YouTube
+    video (`video_id`) and a stored prompt (`prompt_id`), in which case the
+    server composes the text and looks up the prompt itself.
+    """
+    text: Optional[str] = None
+    prompt: Optional[str] = None
+    document_id: Optional[str] = None
+    start_page: Optional[int] = Field(None, gt=0, description="Start page number (1-based)")
+    end_page: Optional[int] = Field(None, gt=0, description="End page number (inclusive); defaults to start_page")
+    prompt_id: Optional[str] = None
+    video_id: Optional[str] = None
+    max_comment_chars: int = Field(20000, gt=0, description="Size limit of the comment text; most liked comments first")
+
+    @model_validator(mode="after")
+    def check_sources(self) -> "SummaryRequest":
+        if sum(source is not None for source in (self.text, self.document_id, self.video_id)) != 1:
+            raise ValueError("Provide exactly one of 'text', 'document_id' or 'video_id'")
+        if (self.prompt is None) == (self.prompt_id is None):
+            raise ValueError("Provide exactly one of 'prompt' or 'prompt_id'")
+        if self.document_id is not None and self.start_page is None:
+            raise ValueError("'start_page' is required with 'document_id'")
+        return self
 
 class SummaryResponse(BaseModel):
     summary: str
+    usage: Optional[TokenUsage] = None
+    # True when reused from an earlier summary of the same pages, prompt and model settings
+    cached: bool = False
@@ -8,9 +8,14 @@ router = APIRouter(prefix="/api/v1", tags=["summary"])
 async def generate_summary(request: SummaryRequest):
     """
     Generate a summary for the provided text using the given prompt.
+
+    Instead of sending the text and prompt, the request can reference a stored
+    document page range (`document_id`, `start_page`, `end_page`) and a stored
+    prompt (`prompt_id`); the server then extracts the text itself.
     
     Args:
-        request: SummaryRequest containing the text to summarize and the prompt with instructions
+        request: SummaryRequest containing the text (or document page range) to summarize
+            and the prompt (or prompt id) with instructions
         
     Returns:
         SummaryResponse containing the generated summary
@@ -18,5 +23,7 @@ async def generate_summary(request: SummaryRequest):
     try:
         summary_service = SummaryService()
         return await summary_service.generate_summary(request)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
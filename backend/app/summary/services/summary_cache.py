@@ -0,0 +1,70 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional
+
+from app.core.config import get_settings
+from app.core.file_lock import file_lock, lock_path_for
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def summary_key(fingerprints: List[str], prompt: str, **parameters: Any) -> str:
+    """
+    Cache key of a summary of document pages: their fingerprints rather than the
+    document id, so a revision whose pages in the range are unchanged hits the
+    entry made for the earlier one
+    """
+    payload = json.dumps({"pages": fingerprints, "prompt": prompt, **parameters}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SummaryCache:
+    """SQLite store of generated summaries keyed by `summary_key`"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with file_lock(lock_path_for(self.db_path)):
+            self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connection().execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, summary: str) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO summaries (key, summary, created_at) VALUES (?, ?, ?)",
+            (key, summary, time.time())
+        )
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+
+@lru_cache()
+def get_summary_cache() -> SummaryCache:
+    """Shared SummaryCache at the configured path, data/summaries/summaries.db by default"""
+    path = get_settings().summary_cache_path
+    db_path = Path(path) if path else Path(__file__).parent.parent.parent.parent / "data" / "summaries" / "summaries.db"
+    return SummaryCache(db_path)
@@ -1,37 +1,136 @@
-from app.services.openai_service import OpenAIService
+import hashlib
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from app.services.openai_service import OpenAIService, get_openai_service
 from app.summary.models.summary_models import SummaryRequest, SummaryResponse
+from app.configuration.services.prompt_service import PromptService, get_prompt_service
+from app.pdf_processor.services.document_store import DocumentStore, get_document_store
+from app.pdf_processor.services.pdf_content_service import PDFContentService
+from app.summary.services.summary_cache import SummaryCache, get_summary_cache, summary_key
+from app.youtubeAPI.comment_store import get_comment_store
 from app.models.requests import ChatRequest, Message
 from app.core.config import Settings, get_settings
+from app.core.usage import set_usage_prompt_id
+
+# Kept byte-for-byte identical across calls so it forms a cacheable prompt prefix
+SCRIPTWRITER_SYSTEM_PROMPT = (
+    "You are a seasoned podcast scriptwriter creating fun, emotional, structured podcast scripts for 'Two mics, One Vibe' in HEnglish. Follow all formatting, tone, and structural cues strictly\n"
+    "I want you to act as a dialogue writter for the podcast. This podcast has conversation between A guy and his girlfriend who read something and had a discussion on that topic\n"
+    "One of the voice is an exciting voice (Name: Celine(Girlfriend))\n"
+    "Another voice brings depth and intrigue. (Name: Jesse(Boyfriend))\n"
+    "Strictly follow this: Each person will speak for at least for 15-20seconds and then other person will start speaking, which means in a 5minutes script switching of speaker should happen 8 times maximum. For expressions use these tags [laughs], [laughs harder], [starts laughing], [wheezing], [whispers], [sighs], [exhales], [sarcastic], [curious], [excited], [crying], [snorts], [mischievously]\n"
+)
+
+SCRIPT_CACHE_KEY = "summary-script-" + hashlib.sha256(SCRIPTWRITER_SYSTEM_PROMPT.encode()).hexdigest()[:16]
 
 class SummaryService:
-    def __init__(self, openai_service: OpenAIService = None, settings: Settings = None):
+    def __init__(self, openai_service: OpenAIService = None, settings: Settings = None,
+                 prompt_service: PromptService = None, document_store: DocumentStore = None,
+                 summary_cache: SummaryCache = None):
         self.settings = settings or get_settings()
-        self.openai_service = openai_service or OpenAIService()
+        self.openai_service = openai_service or get_openai_service()
+        self.prompt_service = prompt_service or get_prompt_service()
+        self.document_store = document_store or get_document_store()
+        self.summary_cache = summary_cache
+        if summary_cache is None and self.settings.summary_cache_enabled:
+            self.summary_cache = get_summary_cache()
+
+    def resolve_prompt(self, request: SummaryRequest) -> str:
+        if request.prompt_id is not None:
+            set_usage_prompt_id(request.prompt_id)
+            return self.prompt_service.get_prompt(prompt_id=request.prompt_id).prompt
+        return request.prompt
+
+    async def resolve_inputs(self, request: SummaryRequest) -> Tuple[str, str]:
+        """Return the (text, prompt) pair, extracting and looking them up when referenced by id"""
+        prompt = self.resolve_prompt(request)
+
+        text = request.text
+        if request.document_id is not None:
+            self.document_store.require_source(request.document_id)
+            end_page = request.end_page if request.end_page is not None else request.start_page
+            text = await run_in_threadpool(
+                PDFContentService.extract_document_text, request.document_id, request.start_page, end_page
+            )
+        elif request.video_id is not None:
+            text = await run_in_threadpool(
+                get_comment_store().comments_text, request.video_id, request.max_comment_chars
+            )
+            if not text:
+                raise HTTPException(status_code=404, detail=f"No stored comments for video {request.video_id}")
+        return text, prompt
+
+    def build_chat_request(self, text: str, prompt: str) -> ChatRequest:
+        # Stable parts first so the provider can reuse its cached prefix:
+        # the fixed system prompt, then the content (the same for every script
+        # of a chapter), and the per-request instructions last
+        messages = [
+            Message(role="system", content=SCRIPTWRITER_SYSTEM_PROMPT),
+            Message(role="user", content=f"Content for generating script:\n{text}"),
+            Message(role="user", content=f"Instructions for scriptwriter:\n{prompt}")
+        ]
+        return ChatRequest(
+            messages=messages,
+            tier="quality",
+            temperature=self.settings.temperature,
+        )
+
+    async def cache_key(self, request: SummaryRequest, prompt: str, chat_request: ChatRequest) -> Optional[str]:
+        """
+        Summary cache key for document page ranges, built from the page
+        fingerprints so unchanged pages of a new revision reuse earlier summaries,
+        and from the routing plan the call will run with, so a change of rule,
+        models or output budget does not serve summaries made under the old one
+        """
+        if self.summary_cache is None or request.document_id is None:
+            return None
+        self.document_store.require_source(request.document_id)
+        end_page = request.end_page if request.end_page is not None else request.start_page
+        fingerprints = await run_in_threadpool(
+            PDFContentService.document_fingerprints, request.document_id, request.start_page, end_page
+        )
+        plan = self.openai_service.router.plan(
+            [msg.model_dump() for msg in chat_request.messages], chat_request.tier,
+            chat_request.model, chat_request.max_tokens
+        )
+        return summary_key(
+            fingerprints, prompt, system=SCRIPT_CACHE_KEY, rule=plan.rule, models=plan.models,
+            max_tokens=plan.max_tokens, temperature=chat_request.temperature or self.openai_service.temperature
+        )
 
     async def generate_summary(self, request: SummaryRequest) -> SummaryResponse:
         """Generate a summary for the given text using the provided prompt"""
+        text, prompt = await self.resolve_inputs(request)
+        chat_request = self.build_chat_request(text, prompt)
+        key = await self.cache_key(request, prompt, chat_request)
+        if key is not None:
+            cached = await run_in_threadpool(self.summary_cache.get, key)
+            if cached is not None:
+                return SummaryResponse(summary=cached, cached=True)
+
         try:
-            # Create a chat request with the text and prompt
-            messages = [
-                Message(role="system", content="You are a seasoned podcast scriptwriter creating fun, emotional, structured podcast scripts for 'Two mics, One Vibe' in HEnglish. Follow all formatting, tone, and structural cues strictly\nI want you to act as a dialogue writter for the podcast. This podcast has conversation between A guy and his girlfriend who read something and had a discussion on that topic\nOne of the voice is an exciting voice (Name: Celine(Girlfriend))\nAnother voice brings depth and intrigue. (Name: Jesse(Boyfriend))\nStrictly follow this: Each person will speak for at least for 15-20seconds and then other person will start speaking, which means in a 5minutes script switching of speaker should happen 8 times maximum. For expressions use these tags [laughs], [laughs harder], [starts laughing], [wheezing], [whispers], [sighs], [exhales], [sarcastic], [curious], [excited], [crying], [snorts], [mischievously]\n"),
-                Message(role="user", content=f"Instructions for scriptwriter:\n{request.prompt}\nContent for generating script:\n{request.text}")
-            ]
-            chat_request = ChatRequest(
-                messages=messages,
-                model=self.settings.default_model,  # Use the configured model
-                temperature=self.settings.temperature,
-                max_tokens=self.settings.max_tokens
+            # The OpenAI client is synchronous; keep it off the event loop
+            chat_response = await run_in_threadpool(
+                self.openai_service.create_chat_completion, chat_request, prompt_cache_key=SCRIPT_CACHE_KEY
             )
             
-            chat_response = self.openai_service.create_chat_completion(chat_request)
-            
             # Extract the summary and append model information
             summary = chat_response.choices[0].message.content
             model_used = chat_response.model  # Get the actual model used from the response
             
             # Append model information to the summary
             summary_with_model = f"{summary}\n\nModel used: {model_used}"
+            if key is not None:
+                await run_in_threadpool(self.summary_cache.set, key, summary_with_model)
             
-            return SummaryResponse(summary=summary_with_model)
+            return SummaryResponse(
+                summary=summary_with_model,
+                usage=self.openai_service.token_usage(chat_response)
+            )
+        except HTTPException:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate summary: {str(e)}")
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Union
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_import
+from app.core.metrics import YOUTUBE_ERRORS_TOTAL, YOUTUBE_REQUEST_SECONDS
+from app.core.shared_cache import SharedCache, get_shared_cache, shared_cache_enabled
+from app.youtubeAPI.quota import charge
+
+httpx = lazy_import("httpx")
+
+
+class YouTubeClient:
+    """
+    Application-scoped HTTP client for the YouTube Data API.
+
+    One keep-alive connection pool is shared by every request, so only the first
+    call pays for the TLS handshake. The underlying `httpx.AsyncClient` is
+    created on first use and closed on application shutdown.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10.0, max_connections: int = 20):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _http(self) -> "httpx.AsyncClient":
+        loop = asyncio.get_running_loop()
+        # Pooled connections belong to the loop that opened them
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._loop = loop
+        return self._client
+
+    async def get(self, endpoint: str, params: Dict[str, Any], etag: Optional[str] = None,
+                  timeout: Optional[float] = None) -> "httpx.Response":
+        """
+        GET `endpoint`, recording latency, errors and quota. With `etag`, the request
+        is conditional and a 304 response is returned as-is rather than raised.
+
+        Raises:
+            httpx.HTTPError: If the request fails or returns an error status
+        """
+        headers = {"If-None-Match": etag} if etag else None
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        # Every call that reaches the API is charged, whatever its outcome
+        charge(endpoint)
+        try:
+            with YOUTUBE_REQUEST_SECONDS.labels(endpoint).time():
+                response = await self._http().get(f"/{endpoint}", params=params, headers=headers, **kwargs)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except httpx.HTTPError:
+            YOUTUBE_ERRORS_TOTAL.labels(endpoint).inc()
+            raise
+        return response
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class CacheEntry:
+    __slots__ = ("value", "etag", "fetched_as", "expires_at")
+
+    def __init__(self, value: Any, etag: Optional[str], fetched_as: str, expires_at: float):
+        self.value = value
+        self.etag = etag
+        # The `part` parameter of the request that produced this entry; its ETag
+        # is only valid for revalidating a request with the same parts
+        self.fetched_as = fetched_as
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+class ResponseCache:
+    """
+    Bounded in-memory LRU cache. Expired entries are kept (until evicted) so
+    their ETag can still be used to revalidate them.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, value: Any, ttl: float, etag: Optional[str] = None, fetched_as: str = "") -> None:
+        self._entries[key] = CacheEntry(value, etag, fetched_as, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def touch(self, key: Hashable, ttl: float) -> None:
+        """Extend an entry's lifetime after the upstream confirmed it is unchanged"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.expires_at = time.monotonic() + ttl
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_client: Optional[YouTubeClient] = None
+_cache: Optional[Union[ResponseCache, SharedCache]] = None
+
+
+def get_youtube_client() -> YouTubeClient:
+    """Shared YouTubeClient built from settings"""
+    global _client
+    if _client is None:
+        settings = get_settings()
+        _client = YouTubeClient(
+            settings.youtube_api_base_url,
+            timeout=settings.youtube_timeout_seconds,
+            max_connections=settings.youtube_max_connections,
+        )
+    return _client
+
+
+def get_youtube_cache() -> Union[ResponseCache, SharedCache]:
+    """Cache of YouTube resource parts, shared across workers when a shared cache file is configured"""
+    global _cache
+    if _cache is None:
+        max_entries = get_settings().youtube_cache_max_entries
+        _cache = get_shared_cache("youtube", max_entries) if shared_cache_enabled() else ResponseCache(max_entries)
+    return _cache
+
+
+async def close_youtube_client() -> None:
+    if _client is not None:
+        await _client.aclose()
@@ -0,0 +1,270 @@
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import get_settings
+from app.core.file_lock import file_lock, lock_path_for
+
+# Comment texts at least this long are stored zlib-compressed
+COMPRESS_MIN_CHARS = 160
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comment_videos (
+    video_key INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL UNIQUE,
+    watermark INTEGER,
+    backfill_token TEXT,
+    backfill_done INTEGER NOT NULL DEFAULT 0,
+    head_token TEXT,
+    head_watermark INTEGER,
+    status TEXT,
+    comment_count INTEGER NOT NULL DEFAULT 0,
+    last_synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS comment_authors (
+    author_key INTEGER PRIMARY KEY,
+    channel_id TEXT NOT NULL UNIQUE,
+    display_name TEXT
+);
+CREATE TABLE IF NOT EXISTS comments (
+    video_key INTEGER NOT NULL,
+    published_at INTEGER NOT NULL,
+    comment_id TEXT NOT NULL,
+    author_key INTEGER,
+    like_count INTEGER NOT NULL DEFAULT 0,
+    reply_count INTEGER NOT NULL DEFAULT 0,
+    body,
+    PRIMARY KEY (video_key, published_at, comment_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS comments_likes ON comments (video_key, like_count);
+"""
+
+# Columns added after the store was first released
+STATE_COLUMNS = {
+    "head_token": "ALTER TABLE comment_videos ADD COLUMN head_token TEXT",
+    "head_watermark": "ALTER TABLE comment_videos ADD COLUMN head_watermark INTEGER",
+}
+
+COMMENT_ORDERS = {
+    "newest": "c.published_at DESC, c.comment_id DESC",
+    "oldest": "c.published_at ASC, c.comment_id ASC",
+    "likes": "c.like_count DESC, c.published_at DESC",
+}
+
+
+def to_epoch(timestamp: str) -> int:
+    """Parse an RFC 3339 timestamp as returned by the API into epoch seconds"""
+    return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp())
+
+
+def from_epoch(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _pack_text(text: str):
+    if len(text) < COMPRESS_MIN_CHARS:
+        return text
+    packed = zlib.compress(text.encode(), 6)
+    return packed if len(packed) < len(text.encode()) else text
+
+
+def _unpack_text(body) -> str:
+    return zlib.decompress(body).decode() if isinstance(body, bytes) else (body or "")
+
+
+class CommentStore:
+    """
+    Compact SQLite storage for top-level YouTube comments.
+
+    Comments are clustered by (video, publish time) in a WITHOUT ROWID table, so
+    a video's comments are read back in order from one contiguous range. Video
+    and author ids are interned to integers, timestamps are stored as epoch
+    seconds and long texts are compressed. Per video, the table also keeps the
+    sync state: the publish time of the newest stored comment (the watermark),
+    the page token of an unfinished backfill and, while a gap of new comments
+    is only partly fetched, the page token to resume it from and the watermark
+    to set once it is closed.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with file_lock(lock_path_for(self.db_path)):
+            conn = self._connection()
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(comment_videos)")}
+            for column, statement in STATE_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _video_key(self, conn: sqlite3.Connection, video_id: str) -> int:
+        conn.execute("INSERT OR IGNORE INTO comment_videos (video_id) VALUES (?)", (video_id,))
+        return conn.execute("SELECT video_key FROM comment_videos WHERE video_id = ?", (video_id,)).fetchone()[0]
+
+    def sync_state(self, video_id: str) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT watermark, backfill_token, backfill_done, head_token, head_watermark, status, last_synced_at "
+            "FROM comment_videos WHERE video_id = ?",
+            (video_id,)
+        ).fetchone()
+        if row is None:
+            return {"watermark": None, "backfill_token": None, "backfill_done": False, "head_token": None,
+                    "head_watermark": None, "status": None, "last_synced_at": None}
+        return {"watermark": row[0], "backfill_token": row[1], "backfill_done": bool(row[2]),
+                "head_token": row[3], "head_watermark": row[4], "status": row[5], "last_synced_at": row[6]}
+
+    def save_page(self, video_id: str, comments: List[Dict[str, Any]], **state: Any) -> int:
+        """
+        Store one page of comments and update the sync state in the same
+        transaction, so a crash never leaves a saved page token ahead of the
+        stored comments. Returns the number of comments not stored before.
+        """
+        def statements(conn: sqlite3.Connection) -> int:
+            video_key = self._video_key(conn, video_id)
+            inserted = 0
+            for comment in comments:
+                author_key = None
+                if comment.get("author_channel_id"):
+                    conn.execute(
+                        "INSERT INTO comment_authors (channel_id, display_name) VALUES (?, ?) "
+                        "ON CONFLICT (channel_id) DO UPDATE SET display_name = excluded.display_name",
+                        (comment["author_channel_id"], comment.get("author"))
+                    )
+                    author_key = conn.execute(
+                        "SELECT author_key FROM comment_authors WHERE channel_id = ?", (comment["author_channel_id"],)
+                    ).fetchone()[0]
+                row = (video_key, comment["published_at"], comment["comment_id"])
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO comments "
+                    "(video_key, published_at, comment_id, author_key, like_count, reply_count, body) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (*row, author_key, comment.get("like_count", 0), comment.get("reply_count", 0),
+                     _pack_text(comment.get("text", "")))
+                )
+                if cursor.rowcount:
+                    inserted += 1
+                else:
+                    # Seen before; only the counters change
+                    conn.execute(
+                        "UPDATE comments SET like_count = ?, reply_count = ? "
+                        "WHERE video_key = ? AND published_at = ? AND comment_id = ?",
+                        (comment.get("like_count", 0), comment.get("reply_count", 0), *row)
+                    )
+            conn.execute(
+                "UPDATE comment_videos SET comment_count = comment_count + ? WHERE video_key = ?", (inserted, video_key)
+            )
+            self._update_state(conn, video_key, state)
+            return inserted
+
+        return self._write(statements)
+
+    def save_state(self, video_id: str, **state: Any) -> None:
+        self._write(lambda conn: self._update_state(conn, self._video_key(conn, video_id), state))
+
+    @staticmethod
+    def _update_state(conn: sqlite3.Connection, video_key: int, state: Dict[str, Any]) -> None:
+        allowed = ("watermark", "backfill_token", "backfill_done", "head_token", "head_watermark", "status")
+        assignments = [(column, state[column]) for column in allowed if column in state]
+        assignments.append(("last_synced_at", time.time()))
+        conn.execute(
+            f"UPDATE comment_videos SET {', '.join(f'{column} = ?' for column, _ in assignments)} WHERE video_key = ?",
+            (*[value for _, value in assignments], video_key)
+        )
+
+    def count(self, video_id: str) -> int:
+        row = self._connection().execute(
+            "SELECT comment_count FROM comment_videos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def iter_comments(self, video_id: str, order: str = "newest", since: Optional[int] = None,
+                      until: Optional[int] = None, min_likes: int = 0, limit: Optional[int] = None,
+                      batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield stored comments lazily, `batch_size` rows at a time"""
+        clauses = ["v.video_id = ?"]
+        params: List[Any] = [video_id]
+        if since is not None:
+            clauses.append("c.published_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("c.published_at < ?")
+            params.append(until)
+        if min_likes:
+            clauses.append("c.like_count >= ?")
+            params.append(min_likes)
+        sql = (
+            "SELECT c.comment_id, c.published_at, a.display_name, c.like_count, c.reply_count, c.body "
+            "FROM comments c JOIN comment_videos v ON v.video_key = c.video_key "
+            "LEFT JOIN comment_authors a ON a.author_key = c.author_key "
+            f"WHERE {' AND '.join(clauses)} ORDER BY {COMMENT_ORDERS[order]}"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        # A dedicated connection so a slow consumer never holds the thread's shared one
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    return
+                for comment_id, published_at, author, like_count, reply_count, body in rows:
+                    yield {
+                        "comment_id": comment_id,
+                        "published_at": from_epoch(published_at),
+                        "author": author,
+                        "like_count": like_count,
+                        "reply_count": reply_count,
+                        "text": _unpack_text(body),
+                    }
+        finally:
+            conn.close()
+
+    def comments_text(self, video_id: str, max_chars: int, order: str = "likes") -> str:
+        """Compose stored comments into one text block of at most `max_chars` characters"""
+        lines: List[str] = []
+        used = 0
+        for comment in self.iter_comments(video_id, order=order):
+            line = f"{comment['author'] or 'Anonymous'}: {' '.join(comment['text'].split())}"
+            if used + len(line) + 1 > max_chars:
+                break
+            lines.append(line)
+            used += len(line) + 1
+        return "\n".join(lines)
+
+
+@lru_cache()
+def get_comment_store() -> CommentStore:
+    """Shared CommentStore at the configured path (default data/youtube/comments.db)"""
+    store_path = get_settings().youtube_comments_path
+    return CommentStore(
+        Path(store_path) if store_path else Path(__file__).parent.parent.parent / "data" / "youtube" / "comments.db"
+    )
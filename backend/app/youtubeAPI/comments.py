@@ -0,0 +1,231 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_import
+from app.youtubeAPI.client import get_youtube_client
+from app.youtubeAPI.comment_store import CommentStore, get_comment_store, to_epoch
+from app.youtubeAPI.models import CommentSyncReport, CommentSyncResponse
+from app.youtubeAPI.quota import QuotaUsage, quota_usage_var
+from app.youtubeAPI.store import YouTubeStore, get_youtube_store
+
+httpx = lazy_import("httpx")
+
+COMMENTS_PAGE_SIZE = 100
+
+
+class _StopSync(Exception):
+    """Raised inside a video sync when the quota or page budget is used up"""
+
+    def __init__(self, status: str):
+        self.status = status
+
+
+def _error_reason(response: "httpx.Response") -> Optional[str]:
+    try:
+        return response.json()["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+class CommentIngestor:
+    """
+    Incremental ingestion of commentThreads into the CommentStore.
+
+    Comments are requested newest first. The first sync of a video records the
+    publish time of its newest comment as a watermark and then walks back
+    through older pages (the backfill), saving the next page token with every
+    stored page. Later syncs first fetch pages down to the watermark, which only
+    downloads new comments, and then resume an unfinished backfill from its
+    saved token. A gap of new comments too large for one sync's page or quota
+    budget is resumed the same way: each head page saves the next page token,
+    and the watermark moves to the newest comment of the gap once the walk
+    reaches the old watermark. Only one page is held in memory at a time, so videos with
+    hundreds of thousands of comments are ingested in constant memory over as
+    many syncs as the page and quota budgets require.
+    """
+
+    def __init__(self, store: Optional[CommentStore] = None, youtube_store: Optional[YouTubeStore] = None):
+        self.store = store or get_comment_store()
+        self.youtube_store = youtube_store or get_youtube_store()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def sync_videos(self, video_ids: List[str], api_key: str,
+                          max_pages: Optional[int] = None) -> CommentSyncResponse:
+        """Sync several videos concurrently, `youtube_comment_concurrency` at a time"""
+        settings = get_settings()
+        if sum(self.youtube_store.quota_used().values()) >= settings.youtube_daily_quota:
+            raise HTTPException(status_code=429, detail="Daily YouTube API quota exhausted")
+
+        usage = QuotaUsage(limit=settings.youtube_sync_quota_limit)
+        max_pages = max_pages or settings.youtube_comment_max_pages
+        semaphore = asyncio.Semaphore(settings.youtube_comment_concurrency)
+
+        async def sync_one(video_id: str) -> CommentSyncReport:
+            async with semaphore:
+                return await self.sync_video(video_id, api_key, usage, max_pages)
+
+        token = quota_usage_var.set(usage)
+        try:
+            results = await asyncio.gather(*(sync_one(video_id) for video_id in dict.fromkeys(video_ids)))
+        finally:
+            quota_usage_var.reset(token)
+            await asyncio.to_thread(self.youtube_store.record_quota, usage.as_dict())
+        return CommentSyncResponse(results=list(results), quota_used=usage.as_dict(), quota_total=usage.total)
+
+    async def sync_video(self, video_id: str, api_key: str, usage: QuotaUsage, max_pages: int) -> CommentSyncReport:
+        lock = self._locks.setdefault(video_id, asyncio.Lock())
+        async with lock:
+            report = CommentSyncReport(video_id=video_id)
+            state = await asyncio.to_thread(self.store.sync_state, video_id)
+            try:
+                if state["watermark"] is not None:
+                    await self._sync_head(video_id, api_key, state, usage, max_pages, report)
+                if not state["backfill_done"]:
+                    await self._backfill(video_id, api_key, state["backfill_token"], state["watermark"] is None,
+                                         usage, max_pages, report)
+            except _StopSync as stop:
+                report.status = stop.status
+            except httpx.HTTPStatusError as e:
+                reason = _error_reason(e.response)
+                if reason == "commentsDisabled":
+                    report.status = "comments_disabled"
+                elif e.response.status_code == 404:
+                    report.status = "not_found"
+                else:
+                    report.status = "error"
+                    report.error = f"YouTube API error {e.response.status_code}: {reason or e.response.text}"
+                await asyncio.to_thread(self.store.save_state, video_id, status=report.status)
+            except httpx.HTTPError as e:
+                report.status = "error"
+                report.error = str(e)
+
+            final_state = await asyncio.to_thread(self.store.sync_state, video_id)
+            report.backfill_complete = final_state["backfill_done"]
+            report.stored_comments = await asyncio.to_thread(self.store.count, video_id)
+            return report
+
+    def _check_budget(self, usage: QuotaUsage, max_pages: int, report: CommentSyncReport) -> None:
+        if usage.exhausted():
+            raise _StopSync("quota")
+        if report.pages_fetched >= max_pages:
+            raise _StopSync("page_limit")
+
+    async def _fetch_page(self, video_id: str, api_key: str, page_token: Optional[str],
+                          report: CommentSyncReport) -> Dict[str, Any]:
+        params = {
+            "videoId": video_id,
+            "part": "snippet",
+            "order": "time",
+            "textFormat": "plainText",
+            "maxResults": COMMENTS_PAGE_SIZE,
+            "key": api_key,
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        response = await get_youtube_client().get("commentThreads", params)
+        report.pages_fetched += 1
+        data = response.json()
+        return {
+            "comments": [self._parse_thread(item) for item in data.get("items", [])],
+            "next_page_token": data.get("nextPageToken"),
+        }
+
+    @staticmethod
+    def _parse_thread(item: Dict[str, Any]) -> Dict[str, Any]:
+        thread = item.get("snippet", {})
+        comment = thread.get("topLevelComment", {})
+        snippet = comment.get("snippet", {})
+        return {
+            "comment_id": comment.get("id") or item.get("id"),
+            "published_at": to_epoch(snippet["publishedAt"]),
+            "author": snippet.get("authorDisplayName"),
+            "author_channel_id": (snippet.get("authorChannelId") or {}).get("value"),
+            "like_count": snippet.get("likeCount", 0),
+            "reply_count": thread.get("totalReplyCount", 0),
+            "text": snippet.get("textOriginal") or snippet.get("textDisplay") or "",
+        }
+
+    async def _sync_head(self, video_id: str, api_key: str, state: Dict[str, Any], usage: QuotaUsage,
+                         max_pages: int, report: CommentSyncReport) -> None:
+        """
+        Fetch comments newer than the watermark, resuming an unfinished walk from
+        its saved token; the watermark only moves once the gap is closed
+        """
+        watermark = state["watermark"]
+        page_token = state["head_token"]
+        # Newer comments posted since an interrupted walk began are fetched after the gap closes
+        newest = state["head_watermark"] if page_token else None
+        while True:
+            self._check_budget(usage, max_pages, report)
+            try:
+                page = await self._fetch_page(video_id, api_key, page_token, report)
+            except httpx.HTTPStatusError as e:
+                if page_token and e.response.status_code == 400:
+                    # Saved tokens can expire; walk the gap again from the top, stored comments are skipped
+                    await asyncio.to_thread(self.store.save_state, video_id, head_token=None, head_watermark=None)
+                    raise _StopSync("head_restarted")
+                raise
+            comments = page["comments"]
+            if newest is None and comments:
+                newest = comments[0]["published_at"]
+
+            # Comments published in the watermark second may or may not be stored; duplicates are ignored
+            fresh = [comment for comment in comments if comment["published_at"] >= watermark]
+            reached = len(fresh) < len(comments) or not page["next_page_token"]
+            if reached:
+                progress = {"head_token": None, "head_watermark": None}
+                if newest is not None:
+                    progress["watermark"] = max(newest, watermark)
+            else:
+                progress = {"head_token": page["next_page_token"], "head_watermark": newest}
+            report.new_comments += await asyncio.to_thread(self.store.save_page, video_id, fresh, **progress)
+            if reached:
+                return
+            page_token = page["next_page_token"]
+
+    async def _backfill(self, video_id: str, api_key: str, page_token: Optional[str], initial: bool,
+                        usage: QuotaUsage, max_pages: int, report: CommentSyncReport) -> None:
+        """Walk back through older pages, saving the next page token after each one"""
+        while True:
+            self._check_budget(usage, max_pages, report)
+            try:
+                page = await self._fetch_page(video_id, api_key, page_token, report)
+            except httpx.HTTPStatusError as e:
+                if page_token and e.response.status_code == 400:
+                    # Saved tokens can expire; start the backfill again, stored comments are skipped
+                    await asyncio.to_thread(self.store.save_state, video_id, backfill_token=None)
+                    raise _StopSync("backfill_restarted")
+                raise
+            comments = page["comments"]
+            next_page_token = page["next_page_token"]
+
+            state: Dict[str, Any] = {
+                "backfill_token": next_page_token,
+                "backfill_done": int(next_page_token is None),
+                "status": "ok",
+            }
+            if initial:
+                # The newest comment of the first page becomes the watermark for later syncs
+                state["watermark"] = comments[0]["published_at"] if comments else 0
+                initial = False
+            report.new_comments += await asyncio.to_thread(self.store.save_page, video_id, comments, **state)
+            if next_page_token is None:
+                return
+            page_token = next_page_token
+
+    def tracked_video_ids(self, playlist_id: str) -> List[str]:
+        """Videos of a playlist synced by the channel crawler"""
+        return self.youtube_store.playlist_video_ids(playlist_id)
+
+
+_ingestor: Optional[CommentIngestor] = None
+
+
+def get_comment_ingestor() -> CommentIngestor:
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = CommentIngestor()
+    return _ingestor
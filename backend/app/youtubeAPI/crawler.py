@@ -0,0 +1,232 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.core.config import get_settings
+from app.core.lazy import lazy_import
+from app.youtubeAPI.client import get_youtube_client
+from app.youtubeAPI.models import SyncReport
+from app.youtubeAPI.quota import QuotaUsage, quota_usage_var
+from app.youtubeAPI.service import VIDEOS_PER_REQUEST, YouTubeAPIService
+from app.youtubeAPI.store import YouTubeStore, get_youtube_store
+
+httpx = lazy_import("httpx")
+
+PLAYLIST_PAGE_SIZE = 50
+UPLOADS_PLAYLIST_PREFIX = "UU"
+
+
+def _upstream_error(e: "httpx.HTTPStatusError") -> HTTPException:
+    return HTTPException(status_code=e.response.status_code, detail=f"YouTube API error: {e.response.text}")
+
+
+class ChannelCrawler:
+    """
+    Syncs channel uploads and playlists into the local YouTubeStore.
+
+    A sync pages through playlistItems. Uploads playlists list the newest videos
+    first, so unless a full sync is requested their sync stops at the first page
+    containing only videos it already knows. Other playlists can gain or reorder
+    videos anywhere and are always walked to the end. Statistics are then fetched, 50 ids per call with
+    bounded concurrency, for new videos and for videos whose statistics are older
+    than `youtube_stats_stale_seconds`. Quota spent by each sync is tallied,
+    capped by `youtube_sync_quota_limit` and added to the daily ledger.
+    """
+
+    def __init__(self, store: Optional[YouTubeStore] = None):
+        self.store = store or get_youtube_store()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def quota_status(self) -> Dict[str, Any]:
+        units = self.store.quota_used()
+        return {
+            "units": units,
+            "total": sum(units.values()),
+            "daily_limit": get_settings().youtube_daily_quota,
+        }
+
+    async def resolve_uploads_playlist(self, channel_id: str, api_key: str) -> str:
+        channel = await asyncio.to_thread(self.store.get_channel, channel_id)
+        if channel is not None:
+            return channel["uploads_playlist_id"]
+
+        try:
+            response = await get_youtube_client().get(
+                "channels", {"id": channel_id, "part": "snippet,contentDetails", "key": api_key}
+            )
+        except httpx.HTTPStatusError as e:
+            raise _upstream_error(e)
+        items = response.json().get("items") or []
+        if not items:
+            raise HTTPException(status_code=404, detail=f"Channel with ID {channel_id} not found")
+
+        uploads_playlist_id = items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+        title = items[0].get("snippet", {}).get("title")
+        await asyncio.to_thread(self.store.save_channel, channel_id, title, uploads_playlist_id)
+        return uploads_playlist_id
+
+    async def sync_channel(self, channel_id: str, api_key: str, full: bool = False) -> SyncReport:
+        """Sync the uploads playlist of a channel"""
+        usage = self._start_quota()
+        token = quota_usage_var.set(usage)
+        try:
+            playlist_id = await self.resolve_uploads_playlist(channel_id, api_key)
+            return await self._sync_playlist(playlist_id, channel_id, api_key, full, usage)
+        finally:
+            quota_usage_var.reset(token)
+            await asyncio.to_thread(self.store.record_quota, usage.as_dict())
+
+    async def sync_playlist(self, playlist_id: str, api_key: str, full: bool = False) -> SyncReport:
+        usage = self._start_quota()
+        token = quota_usage_var.set(usage)
+        try:
+            return await self._sync_playlist(playlist_id, None, api_key, full, usage)
+        finally:
+            quota_usage_var.reset(token)
+            await asyncio.to_thread(self.store.record_quota, usage.as_dict())
+
+    def _start_quota(self) -> QuotaUsage:
+        settings = get_settings()
+        if sum(self.store.quota_used().values()) >= settings.youtube_daily_quota:
+            raise HTTPException(status_code=429, detail="Daily YouTube API quota exhausted")
+        return QuotaUsage(limit=settings.youtube_sync_quota_limit)
+
+    async def _sync_playlist(self, playlist_id: str, channel_id: Optional[str], api_key: str,
+                             full: bool, usage: QuotaUsage) -> SyncReport:
+        # One sync per playlist at a time; a concurrent request waits and then finds little to do
+        lock = self._locks.setdefault(playlist_id, asyncio.Lock())
+        async with lock:
+            started = time.perf_counter()
+            stale_before = time.time() - get_settings().youtube_stats_stale_seconds
+            pages, new_videos, removed_videos, stopped_early = await self._crawl_items(
+                playlist_id, channel_id, api_key, full, usage
+            )
+
+            refreshed, unavailable = 0, 0
+            if stopped_early is None:
+                stale_ids = await asyncio.to_thread(self.store.stale_video_ids, playlist_id, stale_before)
+                remaining = usage.remaining()
+                if remaining is not None and len(stale_ids) > remaining * VIDEOS_PER_REQUEST:
+                    stale_ids = stale_ids[:remaining * VIDEOS_PER_REQUEST]
+                    stopped_early = "quota"
+                refreshed, unavailable = await self._refresh_statistics(stale_ids, api_key)
+                if stopped_early is None:
+                    await asyncio.to_thread(self.store.mark_synced, playlist_id)
+
+            summary = await asyncio.to_thread(self.store.playlist_summary, playlist_id)
+            return SyncReport(
+                playlist_id=playlist_id,
+                channel_id=channel_id,
+                full=full,
+                pages_fetched=pages,
+                new_videos=new_videos,
+                removed_videos=removed_videos,
+                refreshed_statistics=refreshed,
+                unavailable_videos=unavailable,
+                total_videos=summary["video_count"],
+                stopped_early=stopped_early,
+                quota_used=usage.as_dict(),
+                quota_total=usage.total,
+                duration_ms=(time.perf_counter() - started) * 1000,
+            )
+
+    async def _crawl_items(self, playlist_id: str, channel_id: Optional[str], api_key: str,
+                           full: bool, usage: QuotaUsage):
+        """
+        Page through playlistItems; returns (pages fetched, new videos, videos removed,
+        reason for stopping early)
+        """
+        # Only an uploads playlist is sure to put new videos first; any other is walked to the end
+        walk_all = full or not self._newest_first(playlist_id, channel_id)
+        client = get_youtube_client()
+        page_token = None
+        pages = new_videos = 0
+        position = 0
+        seen: List[str] = []
+        while True:
+            if usage.exhausted():
+                return pages, new_videos, 0, "quota"
+
+            params = {
+                "playlistId": playlist_id,
+                "part": "snippet,contentDetails",
+                "maxResults": PLAYLIST_PAGE_SIZE,
+                "key": api_key,
+            }
+            if page_token:
+                params["pageToken"] = page_token
+            try:
+                response = await client.get("playlistItems", params)
+            except httpx.HTTPStatusError as e:
+                raise _upstream_error(e)
+            data = response.json()
+            pages += 1
+
+            items = [self._parse_playlist_item(item, position + i) for i, item in enumerate(data.get("items", []))]
+            position += len(items)
+            seen.extend(item["video_id"] for item in items)
+            known = await asyncio.to_thread(
+                self.store.known_video_ids, playlist_id, [item["video_id"] for item in items]
+            )
+            await asyncio.to_thread(self.store.add_playlist_items, playlist_id, channel_id, items)
+            unseen = len(items) - len(known)
+            new_videos += unseen
+
+            page_token = data.get("nextPageToken")
+            if not page_token:
+                if walk_all:
+                    # Every current item was seen, so anything else has left the playlist
+                    removed = await asyncio.to_thread(self.store.remove_playlist_items_except, playlist_id, seen)
+                    return pages, new_videos, removed, None
+                await asyncio.to_thread(self.store.shift_playlist_positions, playlist_id, seen, new_videos)
+                return pages, new_videos, 0, None
+            if not walk_all and items and unseen == 0:
+                # Everything past here was stored by an earlier sync, one position per new video earlier
+                await asyncio.to_thread(self.store.shift_playlist_positions, playlist_id, seen, new_videos)
+                return pages, new_videos, 0, None
+
+    @staticmethod
+    def _newest_first(playlist_id: str, channel_id: Optional[str]) -> bool:
+        """Whether the playlist is a channel's uploads, which lists the newest videos first"""
+        return channel_id is not None or playlist_id.startswith(UPLOADS_PLAYLIST_PREFIX)
+
+    @staticmethod
+    def _parse_playlist_item(item: Dict[str, Any], position: int) -> Dict[str, Any]:
+        snippet = item.get("snippet", {})
+        content_details = item.get("contentDetails", {})
+        return {
+            "video_id": content_details.get("videoId") or snippet.get("resourceId", {}).get("videoId"),
+            "title": snippet.get("title"),
+            "published_at": content_details.get("videoPublishedAt") or snippet.get("publishedAt"),
+            "channel_id": snippet.get("videoOwnerChannelId"),
+            "position": snippet.get("position", position),
+        }
+
+    async def _refresh_statistics(self, video_ids: List[str], api_key: str):
+        """Fetch statistics in 50-id batches; returns (refreshed, unavailable) counts"""
+        if not video_ids:
+            return 0, 0
+
+        statistics: Dict[str, Dict[str, Any]] = {}
+        unavailable = 0
+        async for result in YouTubeAPIService.iter_videos_batch(video_ids, api_key):
+            if result.status == "ok":
+                statistics[result.video_id] = result.video.statistics.model_dump()
+            elif result.status == "not_found":
+                # Deleted or private; record the attempt so it is not retried every sync
+                unavailable += 1
+                statistics[result.video_id] = {"view_count": None, "like_count": None, "comment_count": None}
+        await asyncio.to_thread(self.store.save_statistics, statistics)
+        return len(statistics) - unavailable, unavailable
+
+
+_crawler: Optional[ChannelCrawler] = None
+
+
+def get_channel_crawler() -> ChannelCrawler:
+    global _crawler
+    if _crawler is None:
+        _crawler = ChannelCrawler()
+    return _crawler
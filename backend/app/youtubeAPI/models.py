@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional, List, Dict, Any
 
 
@@ -6,6 +6,7 @@ class VideoStatisticsRequest(BaseModel):
     """Request model for fetching YouTube video statistics."""
     video_id: str = Field(..., description="YouTube video ID")
     api_key: Optional[str] = Field(None, description="YouTube API key (optional if set in environment)")
+    include_raw: bool = Field(False, description="Include the raw API resource parts in the response")
 
 
 class VideoStatistics(BaseModel):
@@ -31,7 +32,107 @@ class VideoResponse(BaseModel):
     video_id: str = Field(..., description="YouTube video ID")
     statistics: VideoStatistics = Field(..., description="Video statistics")
     snippet: VideoSnippet = Field(..., description="Video snippet information")
-    raw_data: Optional[Dict[str, Any]] = Field(None, description="Raw API response data")
+    raw_data: Optional[Dict[str, Any]] = Field(None, description="Raw API resource parts (only when include_raw is set)")
+    cache: str = Field("miss", description="hit (served from cache), revalidated (upstream returned 304) or miss")
+
+
+class BatchVideoStatisticsRequest(BaseModel):
+    """Request model for fetching statistics of many videos at once."""
+    video_ids: List[str] = Field(..., min_length=1, max_length=1000, description="YouTube video IDs; duplicates are ignored")
+    api_key: Optional[str] = Field(None, description="YouTube API key (optional if set in environment)")
+    include_raw: bool = Field(False, description="Include the raw API resource parts in the response")
+
+
+class VideoResult(BaseModel):
+    """Outcome for one video of a batch request."""
+    video_id: str = Field(..., description="YouTube video ID")
+    status: str = Field(..., description="ok, not_found, invalid or error")
+    video: Optional[VideoResponse] = Field(None, description="Video information when status is ok")
+    error: Optional[str] = Field(None, description="Why the video could not be returned")
+
+
+class BatchVideoResponse(BaseModel):
+    """Response model for a batch of YouTube videos."""
+    results: List[VideoResult] = Field(..., description="One result per distinct requested id, in request order")
+    missing: List[str] = Field(default_factory=list, description="Ids YouTube returned no video for")
+
+
+class SyncReport(BaseModel):
+    """Outcome of syncing a playlist (or a channel's uploads) into the local store."""
+    playlist_id: str = Field(..., description="Playlist that was synced")
+    channel_id: Optional[str] = Field(None, description="Channel whose uploads were synced")
+    full: bool = Field(False, description="Whether every page was crawled")
+    pages_fetched: int = Field(0, description="playlistItems pages requested")
+    new_videos: int = Field(0, description="Videos stored for the first time")
+    removed_videos: int = Field(0, description="Videos no longer in the playlist, dropped by a full sync")
+    refreshed_statistics: int = Field(0, description="Videos whose statistics were fetched")
+    unavailable_videos: int = Field(0, description="Videos YouTube no longer returns (deleted or private)")
+    total_videos: int = Field(0, description="Videos stored for the playlist")
+    stopped_early: Optional[str] = Field(None, description="Why the sync stopped before finishing (quota)")
+    quota_used: Dict[str, int] = Field(default_factory=dict, description="Quota units spent per endpoint")
+    quota_total: int = Field(0, description="Quota units spent by this sync")
+    duration_ms: float = Field(0.0, description="Time taken by the sync")
+
+
+class StoredVideo(BaseModel):
+    """A video as recorded by the crawler."""
+    video_id: str
+    title: Optional[str] = None
+    published_at: Optional[str] = None
+    position: Optional[int] = None
+    view_count: Optional[int] = None
+    like_count: Optional[int] = None
+    comment_count: Optional[int] = None
+    stats_fetched_at: Optional[float] = None
+
+
+class QuotaStatus(BaseModel):
+    """YouTube Data API quota spent today by this application."""
+    units: Dict[str, int] = Field(default_factory=dict, description="Units spent per endpoint")
+    total: int = Field(0, description="Units spent today")
+    daily_limit: int = Field(..., description="Configured daily quota")
+
+
+class CommentSyncRequest(BaseModel):
+    """Request model for syncing comments of several videos."""
+    video_ids: List[str] = Field(default_factory=list, max_length=500, description="YouTube video IDs")
+    playlist_id: Optional[str] = Field(None, description="Also sync every stored video of this synced playlist")
+    api_key: Optional[str] = Field(None, description="YouTube API key (optional if set in environment)")
+    max_pages: Optional[int] = Field(None, ge=1, description="Page budget per video for this sync")
+
+    @model_validator(mode="after")
+    def check_targets(self) -> "CommentSyncRequest":
+        if not self.video_ids and not self.playlist_id:
+            raise ValueError("Provide 'video_ids' or 'playlist_id'")
+        return self
+
+
+class CommentSyncReport(BaseModel):
+    """Outcome of syncing the comments of one video."""
+    video_id: str = Field(..., description="YouTube video ID")
+    status: str = Field("ok", description="ok, quota, page_limit, head_restarted, backfill_restarted, comments_disabled, not_found or error")
+    pages_fetched: int = Field(0, description="commentThreads pages requested")
+    new_comments: int = Field(0, description="Comments stored for the first time")
+    stored_comments: int = Field(0, description="Comments stored for the video")
+    backfill_complete: bool = Field(False, description="Whether every older comment has been stored")
+    error: Optional[str] = Field(None, description="Error details when status is error")
+
+
+class CommentSyncResponse(BaseModel):
+    """Response model for a comment sync."""
+    results: List[CommentSyncReport]
+    quota_used: Dict[str, int] = Field(default_factory=dict, description="Quota units spent per endpoint")
+    quota_total: int = Field(0, description="Quota units spent by this sync")
+
+
+class StoredComment(BaseModel):
+    """A top-level comment from the local store."""
+    comment_id: str
+    published_at: str
+    author: Optional[str] = None
+    like_count: int = 0
+    reply_count: int = 0
+    text: str
 
 
 class ErrorResponse(BaseModel):
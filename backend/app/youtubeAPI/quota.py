@@ -0,0 +1,52 @@
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.core.metrics import YOUTUBE_QUOTA_UNITS_TOTAL
+
+# Quota units charged per call by the YouTube Data API; list calls cost 1 regardless of parts
+QUOTA_COSTS: Dict[str, int] = {
+    "videos": 1,
+    "channels": 1,
+    "playlists": 1,
+    "playlistItems": 1,
+    "commentThreads": 1,
+    "comments": 1,
+    "i18nLanguages": 1,
+    "search": 100,
+}
+
+
+class QuotaUsage:
+    """Quota units spent by one unit of work, such as a channel sync"""
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.units: Counter = Counter()
+
+    @property
+    def total(self) -> int:
+        return sum(self.units.values())
+
+    def remaining(self) -> Optional[int]:
+        return None if self.limit is None else max(0, self.limit - self.total)
+
+    def exhausted(self) -> bool:
+        return self.limit is not None and self.total >= self.limit
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(self.units)
+
+
+# Set by callers that want the calls made on their behalf (including from child tasks) tallied
+quota_usage_var: ContextVar[Optional[QuotaUsage]] = ContextVar("youtube_quota_usage", default=None)
+
+
+def charge(endpoint: str) -> int:
+    """Account for one call to `endpoint` and return its cost"""
+    cost = QUOTA_COSTS.get(endpoint, 1)
+    YOUTUBE_QUOTA_UNITS_TOTAL.labels(endpoint).inc(cost)
+    usage = quota_usage_var.get()
+    if usage is not None:
+        usage.units[endpoint] += cost
+    return cost
@@ -1,7 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+from typing import List, Literal, Optional, Union
 
-from app.youtubeAPI.models import VideoStatisticsRequest, VideoResponse, ErrorResponse
+from app.youtubeAPI.models import (
+    BatchVideoResponse,
+    BatchVideoStatisticsRequest,
+    CommentSyncRequest,
+    CommentSyncResponse,
+    ErrorResponse,
+    QuotaStatus,
+    StoredComment,
+    StoredVideo,
+    SyncReport,
+    VideoResponse,
+    VideoStatisticsRequest,
+)
+from app.youtubeAPI.comment_store import get_comment_store, to_epoch
+from app.youtubeAPI.comments import get_comment_ingestor
+from app.youtubeAPI.crawler import get_channel_crawler
 from app.youtubeAPI.service import YouTubeAPIService
 
 # Create router
@@ -24,17 +41,19 @@ router = APIRouter(
 )
 async def get_video_statistics(
     video_id: str,
-    api_key: Optional[str] = Query(None, description="YouTube API key (optional if set in environment)")
+    api_key: Optional[str] = Query(None, description="YouTube API key (optional if set in environment)"),
+    include_raw: bool = Query(False, description="Include the raw API resource parts in the response")
 ) -> VideoResponse:
     """
     Get statistics for a YouTube video by its ID.
     
     - **video_id**: The YouTube video ID
     - **api_key**: Optional YouTube API key (can be set in environment variable)
+    - **include_raw**: Include the raw API resource parts in the response
     
     Returns video statistics including view count, like count, and basic video information.
     """
-    return await YouTubeAPIService.get_video_statistics(video_id, api_key)
+    return await YouTubeAPIService.get_video_statistics(video_id, api_key, include_raw)
 
 
 @router.post(
@@ -51,4 +70,186 @@ async def post_video_statistics(request: VideoStatisticsRequest) -> VideoRespons
     
     Returns video statistics including view count, like count, and basic video information.
     """
-    return await YouTubeAPIService.get_video_statistics(request.video_id, request.api_key)
+    return await YouTubeAPIService.get_video_statistics(request.video_id, request.api_key, request.include_raw)
+
+
+@router.post(
+    "/videos/statistics",
+    response_model=BatchVideoResponse,
+    summary="Get statistics for many YouTube videos",
+    description="Fetch statistics for up to 1000 videos, packed into 50-id YouTube API calls"
+)
+async def post_videos_statistics(
+    request: BatchVideoStatisticsRequest,
+    stream: bool = Query(False, description="Stream one JSON result per line as soon as it is available")
+) -> Union[BatchVideoResponse, StreamingResponse]:
+    """
+    Get statistics for many YouTube videos in one request.
+    
+    - **request**: Request body containing video_ids, optional api_key and include_raw
+    - **stream**: Return newline-delimited JSON results as they arrive instead of one response
+    
+    Duplicate ids are ignored. Each id gets its own result, so a missing video does not fail
+    the whole batch; missing ids are also listed in `missing`.
+    """
+    if not stream:
+        return await YouTubeAPIService.get_videos_batch(request.video_ids, request.api_key, request.include_raw)
+
+    # Resolve the key before streaming starts so a missing key is still a 400
+    api_key = YouTubeAPIService.resolve_api_key(request.api_key)
+
+    async def lines():
+        async for result in YouTubeAPIService.iter_videos_batch(request.video_ids, api_key, request.include_raw):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post(
+    "/channels/{channel_id}/sync",
+    response_model=SyncReport,
+    summary="Sync a channel's uploads",
+    description="Crawl new uploads of a channel and refresh stale statistics in the local store"
+)
+async def sync_channel(
+    channel_id: str,
+    full: bool = Query(False, description="Crawl every page instead of stopping at already stored videos"),
+    api_key: Optional[str] = Query(None, description="YouTube API key (optional if set in environment)")
+) -> SyncReport:
+    """
+    Sync the uploads playlist of a channel into the local store.
+    
+    - **channel_id**: The YouTube channel ID
+    - **full**: Crawl every page instead of stopping at the first page of known videos
+    - **api_key**: Optional YouTube API key (can be set in environment variable)
+    """
+    youtube_api_key = YouTubeAPIService.resolve_api_key(api_key)
+    return await get_channel_crawler().sync_channel(channel_id, youtube_api_key, full)
+
+
+@router.post(
+    "/playlists/{playlist_id}/sync",
+    response_model=SyncReport,
+    summary="Sync a playlist",
+    description="Crawl new items of a playlist and refresh stale statistics in the local store"
+)
+async def sync_playlist(
+    playlist_id: str,
+    full: bool = Query(False, description="Crawl every page instead of stopping at already stored videos"),
+    api_key: Optional[str] = Query(None, description="YouTube API key (optional if set in environment)")
+) -> SyncReport:
+    """
+    Sync a playlist into the local store.
+    
+    - **playlist_id**: The YouTube playlist ID
+    - **full**: Crawl every page instead of stopping at the first page of known videos.
+      Only uploads playlists (ids starting with UU) stop early; other playlists are always crawled in full
+    - **api_key**: Optional YouTube API key (can be set in environment variable)
+    """
+    youtube_api_key = YouTubeAPIService.resolve_api_key(api_key)
+    return await get_channel_crawler().sync_playlist(playlist_id, youtube_api_key, full)
+
+
+@router.get(
+    "/playlists/{playlist_id}/videos",
+    response_model=List[StoredVideo],
+    summary="List stored videos of a playlist",
+    description="Read synced videos and their statistics from the local store"
+)
+def list_playlist_videos(
+    playlist_id: str,
+    order: Literal["position", "published", "views"] = Query("position", description="Sort order"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+) -> List[StoredVideo]:
+    """List videos of a synced playlist without calling the YouTube API."""
+    rows = get_channel_crawler().store.list_videos(playlist_id, order, limit, offset)
+    return [StoredVideo(**row) for row in rows]
+
+
+@router.get(
+    "/channels/{channel_id}/videos",
+    response_model=List[StoredVideo],
+    summary="List stored uploads of a channel",
+    description="Read synced uploads and their statistics from the local store"
+)
+def list_channel_videos(
+    channel_id: str,
+    order: Literal["position", "published", "views"] = Query("position", description="Sort order"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0)
+) -> List[StoredVideo]:
+    """List uploads of a synced channel without calling the YouTube API."""
+    store = get_channel_crawler().store
+    channel = store.get_channel(channel_id)
+    if channel is None:
+        raise HTTPException(status_code=404, detail=f"Channel {channel_id} has not been synced")
+    rows = store.list_videos(channel["uploads_playlist_id"], order, limit, offset)
+    return [StoredVideo(**row) for row in rows]
+
+
+@router.get(
+    "/quota",
+    response_model=QuotaStatus,
+    summary="YouTube API quota used today"
+)
+def get_quota_status() -> QuotaStatus:
+    """Quota units spent today by crawler syncs, per endpoint."""
+    return QuotaStatus(**get_channel_crawler().quota_status())
+
+
+@router.post(
+    "/comments/sync",
+    response_model=CommentSyncResponse,
+    summary="Sync comments of videos",
+    description="Fetch new comments and continue unfinished backfills for the given or tracked videos"
+)
+async def sync_comments(request: CommentSyncRequest) -> CommentSyncResponse:
+    """
+    Ingest top-level comments into the local comment store.
+    
+    - **video_ids**: Videos to sync
+    - **playlist_id**: Also sync every video stored for this synced playlist
+    - **max_pages**: Page budget per video; unfinished backfills continue on the next sync
+    """
+    youtube_api_key = YouTubeAPIService.resolve_api_key(request.api_key)
+    ingestor = get_comment_ingestor()
+    video_ids = list(request.video_ids)
+    if request.playlist_id:
+        video_ids.extend(ingestor.tracked_video_ids(request.playlist_id))
+    return await ingestor.sync_videos(video_ids, youtube_api_key, request.max_pages)
+
+
+@router.get(
+    "/videos/{video_id}/comments",
+    response_model=List[StoredComment],
+    summary="Read stored comments of a video",
+    description="Query comments from the local store; use format=ndjson to stream any number of them"
+)
+def list_video_comments(
+    video_id: str,
+    order: Literal["newest", "oldest", "likes"] = Query("newest", description="Sort order"),
+    since: Optional[str] = Query(None, description="Only comments published at or after this RFC 3339 time"),
+    until: Optional[str] = Query(None, description="Only comments published before this RFC 3339 time"),
+    min_likes: int = Query(0, ge=0),
+    limit: Optional[int] = Query(100, ge=1, description="Maximum comments; at most 1000 unless streaming"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams results without buffering")
+):
+    """Read stored comments without calling the YouTube API."""
+    try:
+        since_epoch = to_epoch(since) if since else None
+        until_epoch = to_epoch(until) if until else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since and until must be RFC 3339 timestamps")
+
+    store = get_comment_store()
+    if format == "json":
+        comments = store.iter_comments(video_id, order, since_epoch, until_epoch, min_likes, min(limit, 1000))
+        return [StoredComment(**comment) for comment in comments]
+
+    def lines():
+        for comment in store.iter_comments(video_id, order, since_epoch, until_epoch, min_likes, limit):
+            yield StoredComment(**comment).model_dump_json() + "\n"
+
+    # The store is read in a worker thread, a batch at a time, while the response streams
+    return StreamingResponse(iterate_in_threadpool(lines()), media_type="application/x-ndjson")
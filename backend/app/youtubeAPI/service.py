@@ -1,24 +1,140 @@
-import httpx
+import asyncio
 import os
-from typing import Dict, Any, Optional
+import re
+from typing import AsyncIterator, Dict, Any, List, Optional
 from fastapi import HTTPException
 
-from app.youtubeAPI.models import VideoResponse, VideoStatistics, VideoSnippet
+from app.core.config import get_settings
+from app.core.lazy import lazy_import
+from app.core.metrics import YOUTUBE_CACHE_TOTAL
+from app.youtubeAPI.client import CacheEntry, get_youtube_cache, get_youtube_client
+from app.youtubeAPI.models import BatchVideoResponse, VideoResponse, VideoResult, VideoStatistics, VideoSnippet
+
+httpx = lazy_import("httpx")
+
+
+# Parts requested from videos.list; cached separately because they change at different rates
+VIDEO_PARTS = ("snippet", "statistics")
+# videos.list accepts at most 50 comma-separated ids per call
+VIDEOS_PER_REQUEST = 50
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
 
 
 class YouTubeAPIService:
     """Service for interacting with the YouTube API."""
-    
-    BASE_URL = "https://www.googleapis.com/youtube/v3"
-    
+
+    @staticmethod
+    def resolve_api_key(api_key: Optional[str] = None) -> str:
+        """Use the provided API key or fall back to the environment variable"""
+        youtube_api_key = api_key or os.environ.get("YOUTUBE_API_KEY")
+        if not youtube_api_key:
+            raise HTTPException(
+                status_code=400,
+                detail="YouTube API key is required. Either provide it in the request or set the YOUTUBE_API_KEY environment variable."
+            )
+        return youtube_api_key
+
+    @staticmethod
+    def part_ttls() -> Dict[str, float]:
+        settings = get_settings()
+        return {
+            "snippet": settings.youtube_snippet_ttl_seconds,
+            "statistics": settings.youtube_statistics_ttl_seconds,
+        }
+
     @staticmethod
-    async def get_video_statistics(video_id: str, api_key: Optional[str] = None) -> VideoResponse:
+    def parse_statistics(stats_data: Dict[str, Any]) -> VideoStatistics:
+        return VideoStatistics(
+            view_count=int(stats_data.get("viewCount", 0)),
+            like_count=int(stats_data.get("likeCount", 0)),
+            comment_count=int(stats_data.get("commentCount", 0)),
+            favorite_count=int(stats_data.get("favoriteCount", 0))
+        )
+
+    @staticmethod
+    def parse_snippet(snippet_data: Dict[str, Any]) -> VideoSnippet:
+        thumbnails = snippet_data.get("thumbnails", {})
+        default_thumbnail = thumbnails.get("default", {}).get("url") if thumbnails else None
+        return VideoSnippet(
+            title=snippet_data.get("title", ""),
+            description=snippet_data.get("description", ""),
+            published_at=snippet_data.get("publishedAt", ""),
+            channel_title=snippet_data.get("channelTitle", ""),
+            tags=snippet_data.get("tags"),
+            thumbnail_url=default_thumbnail
+        )
+
+    @staticmethod
+    def build_video_response(video_id: str, entries: Dict[str, CacheEntry], include_raw: bool,
+                             cache_result: str) -> VideoResponse:
+        stats_data = entries["statistics"].value
+        snippet_data = entries["snippet"].value
+        raw_data = None
+        if include_raw:
+            raw_data = {"kind": "youtube#video", "id": video_id, "snippet": snippet_data, "statistics": stats_data}
+        return VideoResponse(
+            video_id=video_id,
+            statistics=YouTubeAPIService.parse_statistics(stats_data),
+            snippet=YouTubeAPIService.parse_snippet(snippet_data),
+            raw_data=raw_data,
+            cache=cache_result
+        )
+
+    @staticmethod
+    async def _refresh_parts(video_id: str, parts: List[str], entries: Dict[str, Optional[CacheEntry]],
+                             api_key: str) -> str:
+        """
+        Fetch the given parts of a video into the cache, revalidating with the ETag
+        of the previous response when it covered exactly these parts. Returns
+        "revalidated" if the upstream answered 304 Not Modified, otherwise "miss".
+        """
+        cache = get_youtube_cache()
+        ttls = YouTubeAPIService.part_ttls()
+        part_param = ",".join(parts)
+
+        etags = {
+            entries[part].etag for part in parts
+            if entries[part] is not None and entries[part].fetched_as == part_param
+        }
+        etag = etags.pop() if len(etags) == 1 and all(entries[part] is not None for part in parts) else None
+
+        response = await get_youtube_client().get(
+            "videos", {"id": video_id, "key": api_key, "part": part_param}, etag=etag
+        )
+        if response.status_code == 304:
+            for part in parts:
+                cache.touch((part, video_id), ttls[part])
+            return "revalidated"
+
+        data = response.json()
+        # Check if video exists
+        if not data.get("items"):
+            raise HTTPException(
+                status_code=404,
+                detail=f"Video with ID {video_id} not found"
+            )
+
+        video_data = data["items"][0]
+        response_etag = response.headers.get("ETag") or data.get("etag")
+        for part in parts:
+            cache.set((part, video_id), video_data.get(part, {}), ttls[part], etag=response_etag, fetched_as=part_param)
+            entries[part] = cache.get((part, video_id))
+        return "miss"
+
+    @staticmethod
+    async def get_video_statistics(video_id: str, api_key: Optional[str] = None,
+                                   include_raw: bool = False) -> VideoResponse:
         """
         Fetch statistics for a YouTube video by its ID.
+
+        Snippet and statistics are cached separately with their own TTLs; only the
+        expired parts are requested, and expired parts are revalidated with
+        If-None-Match so unchanged data costs no response body.
         
         Args:
             video_id: The YouTube video ID
             api_key: YouTube API key (optional if set in environment)
+            include_raw: Include the raw API resource parts in the response
             
         Returns:
             VideoResponse object containing video statistics and information
@@ -26,72 +142,23 @@ class YouTubeAPIService:
         Raises:
             HTTPException: If the API request fails or returns an error
         """
-        # Use provided API key or fall back to environment variable
-        youtube_api_key = api_key or os.environ.get("YOUTUBE_API_KEY")
-        
-        if not youtube_api_key:
-            raise HTTPException(
-                status_code=400,
-                detail="YouTube API key is required. Either provide it in the request or set the YOUTUBE_API_KEY environment variable."
-            )
-        
-        # Construct the API URL
-        url = f"{YouTubeAPIService.BASE_URL}/videos"
-        
-        # Set up the query parameters
-        params = {
-            "id": video_id,
-            "key": youtube_api_key,
-            "part": "statistics,snippet",
-        }
-        
+        youtube_api_key = YouTubeAPIService.resolve_api_key(api_key)
+
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                # Check if video exists
-                if not data.get("items"):
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Video with ID {video_id} not found"
-                    )
-                
-                # Extract the video data
-                video_data = data["items"][0]
-                
-                # Extract statistics
-                stats_data = video_data.get("statistics", {})
-                statistics = VideoStatistics(
-                    view_count=int(stats_data.get("viewCount", 0)),
-                    like_count=int(stats_data.get("likeCount", 0)),
-                    comment_count=int(stats_data.get("commentCount", 0)),
-                    favorite_count=int(stats_data.get("favoriteCount", 0))
-                )
-                
-                # Extract snippet information
-                snippet_data = video_data.get("snippet", {})
-                thumbnails = snippet_data.get("thumbnails", {})
-                default_thumbnail = thumbnails.get("default", {}).get("url") if thumbnails else None
-                
-                snippet = VideoSnippet(
-                    title=snippet_data.get("title", ""),
-                    description=snippet_data.get("description", ""),
-                    published_at=snippet_data.get("publishedAt", ""),
-                    channel_title=snippet_data.get("channelTitle", ""),
-                    tags=snippet_data.get("tags"),
-                    thumbnail_url=default_thumbnail
-                )
-                
-                # Create and return the response
-                return VideoResponse(
-                    video_id=video_id,
-                    statistics=statistics,
-                    snippet=snippet,
-                    raw_data=video_data
-                )
-                
+            cache = get_youtube_cache()
+            entries = {part: cache.get((part, video_id)) for part in VIDEO_PARTS}
+            stale = [part for part in VIDEO_PARTS if entries[part] is None or not entries[part].fresh]
+
+            result = "hit"
+            if stale:
+                result = await YouTubeAPIService._refresh_parts(video_id, stale, entries, youtube_api_key)
+            for part in VIDEO_PARTS:
+                YOUTUBE_CACHE_TOTAL.labels(part, result if part in stale else "hit").inc()
+
+            return YouTubeAPIService.build_video_response(video_id, entries, include_raw, result)
+
+        except HTTPException:
+            raise
         except httpx.HTTPStatusError as e:
             # Handle HTTP errors
             error_detail = f"YouTube API error: {e.response.text}" if hasattr(e, 'response') else str(e)
@@ -105,3 +172,126 @@ class YouTubeAPIService:
                 status_code=500,
                 detail=f"Error fetching video statistics: {str(e)}"
             )
+
+    @staticmethod
+    async def _fetch_video_chunk(video_ids: List[str], part_param: str, api_key: str,
+                                 include_raw: bool) -> List[VideoResult]:
+        """Fetch up to 50 videos in one videos.list call and cache the returned parts"""
+        parts = part_param.split(",")
+        try:
+            response = await get_youtube_client().get(
+                "videos",
+                {"id": ",".join(video_ids), "key": api_key, "part": part_param, "maxResults": VIDEOS_PER_REQUEST}
+            )
+        except httpx.HTTPStatusError as e:
+            error = f"YouTube API error {e.response.status_code}: {e.response.text}"
+            return [VideoResult(video_id=video_id, status="error", error=error) for video_id in video_ids]
+        except httpx.HTTPError as e:
+            error = f"Error fetching video statistics: {str(e)}"
+            return [VideoResult(video_id=video_id, status="error", error=error) for video_id in video_ids]
+
+        cache = get_youtube_cache()
+        ttls = YouTubeAPIService.part_ttls()
+        items = {item.get("id"): item for item in response.json().get("items", [])}
+        results = []
+        for video_id in video_ids:
+            item = items.get(video_id)
+            if item is None:
+                results.append(VideoResult(video_id=video_id, status="not_found", error="Video not found"))
+                continue
+            # Item ETags differ from the list ETag a single-video request would return,
+            # so batch-fetched entries are not used for revalidation
+            for part in parts:
+                cache.set((part, video_id), item.get(part, {}), ttls[part], fetched_as=part_param)
+                YOUTUBE_CACHE_TOTAL.labels(part, "miss").inc()
+            entries = {part: cache.get((part, video_id)) for part in VIDEO_PARTS}
+            video = YouTubeAPIService.build_video_response(video_id, entries, include_raw, "miss")
+            results.append(VideoResult(video_id=video_id, status="ok", video=video))
+        return results
+
+    @staticmethod
+    async def iter_videos_batch(video_ids: List[str], api_key: str,
+                                include_raw: bool = False) -> AsyncIterator[VideoResult]:
+        """
+        Yield a result for every distinct id in `video_ids`: cached videos first,
+        then the rest as their upstream calls complete.
+
+        Ids whose cached parts are stale are grouped by the parts they need and
+        packed 50 to a videos.list call; at most `youtube_batch_concurrency`
+        calls run at once. A failed call reports an error for each of its ids
+        without affecting the others.
+        """
+        cache = get_youtube_cache()
+        pending: Dict[str, List[str]] = {}
+
+        for video_id in dict.fromkeys(video_ids):
+            if not VIDEO_ID_PATTERN.match(video_id):
+                yield VideoResult(video_id=video_id, status="invalid", error="Invalid video id")
+                continue
+            entries = {part: cache.get((part, video_id)) for part in VIDEO_PARTS}
+            stale = [part for part in VIDEO_PARTS if entries[part] is None or not entries[part].fresh]
+            for part in VIDEO_PARTS:
+                if part not in stale:
+                    YOUTUBE_CACHE_TOTAL.labels(part, "hit").inc()
+            if stale:
+                pending.setdefault(",".join(stale), []).append(video_id)
+            else:
+                video = YouTubeAPIService.build_video_response(video_id, entries, include_raw, "hit")
+                yield VideoResult(video_id=video_id, status="ok", video=video)
+
+        semaphore = asyncio.Semaphore(get_settings().youtube_batch_concurrency)
+
+        async def fetch(chunk: List[str], part_param: str) -> List[VideoResult]:
+            async with semaphore:
+                return await YouTubeAPIService._fetch_video_chunk(chunk, part_param, api_key, include_raw)
+
+        tasks = [
+            asyncio.ensure_future(fetch(ids[i:i + VIDEOS_PER_REQUEST], part_param))
+            for part_param, ids in pending.items()
+            for i in range(0, len(ids), VIDEOS_PER_REQUEST)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for result in await next_done:
+                    yield result
+        finally:
+            # The client may disconnect from a streamed response mid-way
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    async def get_videos_batch(video_ids: List[str], api_key: Optional[str] = None,
+                               include_raw: bool = False) -> BatchVideoResponse:
+        """
+        Fetch statistics for many videos, returning one result per distinct id in
+        request order and listing the ids YouTube did not return.
+        """
+        youtube_api_key = YouTubeAPIService.resolve_api_key(api_key)
+        by_id = {}
+        async for result in YouTubeAPIService.iter_videos_batch(video_ids, youtube_api_key, include_raw):
+            by_id[result.video_id] = result
+
+        results = [by_id[video_id] for video_id in dict.fromkeys(video_ids)]
+        return BatchVideoResponse(
+            results=results,
+            missing=[result.video_id for result in results if result.status == "not_found"]
+        )
+
+    @staticmethod
+    async def check_connectivity(api_key: Optional[str] = None, timeout: float = 5.0) -> int:
+        """
+        Lightweight reachability and key check using the small i18nLanguages listing
+        (1 quota unit). Returns the number of languages reported.
+
+        Raises:
+            ValueError: If no API key is configured
+            httpx.HTTPError: If the request fails
+        """
+        youtube_api_key = api_key or os.environ.get("YOUTUBE_API_KEY")
+        if not youtube_api_key:
+            raise ValueError("YOUTUBE_API_KEY is not configured")
+
+        response = await get_youtube_client().get(
+            "i18nLanguages", {"part": "id", "hl": "en", "key": youtube_api_key}, timeout=timeout
+        )
+        return len(response.json().get("items", []))
@@ -0,0 +1,236 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core.config import get_settings
+from app.core.file_lock import file_lock, lock_path_for
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    playlist_id TEXT PRIMARY KEY,
+    channel_id TEXT,
+    title TEXT,
+    last_synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    title TEXT,
+    uploads_playlist_id TEXT
+);
+CREATE TABLE IF NOT EXISTS playlist_videos (
+    playlist_id TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    position INTEGER,
+    PRIMARY KEY (playlist_id, video_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT,
+    title TEXT,
+    published_at TEXT,
+    view_count INTEGER,
+    like_count INTEGER,
+    comment_count INTEGER,
+    first_seen_at REAL NOT NULL,
+    stats_fetched_at REAL
+);
+CREATE INDEX IF NOT EXISTS videos_stats_fetched_at ON videos (stats_fetched_at);
+CREATE TABLE IF NOT EXISTS quota_usage (
+    day TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    PRIMARY KEY (day, endpoint)
+) WITHOUT ROWID;
+"""
+
+VIDEO_ORDERS = {
+    "published": "v.published_at DESC",
+    "views": "v.view_count DESC",
+    "position": "pv.position ASC",
+}
+
+
+def quota_day(timestamp: Optional[float] = None) -> str:
+    """YouTube quotas reset at midnight Pacific time; UTC days are close enough for accounting"""
+    return datetime.fromtimestamp(timestamp or time.time(), tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class YouTubeStore:
+    """
+    SQLite store for crawled channels, playlists and video statistics, plus the
+    daily quota ledger. Connections are per thread; writes are short transactions.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with file_lock(lock_path_for(self.db_path)):
+            self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_channel(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT channel_id, title, uploads_playlist_id FROM channels WHERE channel_id = ?", (channel_id,)
+        ).fetchone()
+        return dict(zip(("channel_id", "title", "uploads_playlist_id"), row)) if row else None
+
+    def save_channel(self, channel_id: str, title: str, uploads_playlist_id: str) -> None:
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO channels (channel_id, title, uploads_playlist_id) VALUES (?, ?, ?) "
+            "ON CONFLICT (channel_id) DO UPDATE SET title = excluded.title, "
+            "uploads_playlist_id = excluded.uploads_playlist_id",
+            (channel_id, title, uploads_playlist_id)
+        ))
+
+    def known_video_ids(self, playlist_id: str, video_ids: Iterable[str]) -> Set[str]:
+        video_ids = list(video_ids)
+        if not video_ids:
+            return set()
+        placeholders = ",".join("?" * len(video_ids))
+        rows = self._connection().execute(
+            f"SELECT video_id FROM playlist_videos WHERE playlist_id = ? AND video_id IN ({placeholders})",
+            (playlist_id, *video_ids)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def add_playlist_items(self, playlist_id: str, channel_id: Optional[str], items: List[Dict[str, Any]]) -> None:
+        """Record playlist membership and basic video details from playlistItems"""
+        now = time.time()
+
+        def statements(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "INSERT OR IGNORE INTO playlists (playlist_id, channel_id) VALUES (?, ?)", (playlist_id, channel_id)
+            )
+            conn.executemany(
+                "INSERT INTO playlist_videos (playlist_id, video_id, position) VALUES (?, ?, ?) "
+                "ON CONFLICT (playlist_id, video_id) DO UPDATE SET position = excluded.position",
+                [(playlist_id, item["video_id"], item.get("position")) for item in items]
+            )
+            conn.executemany(
+                "INSERT INTO videos (video_id, channel_id, title, published_at, first_seen_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (video_id) DO UPDATE SET title = excluded.title, "
+                "channel_id = COALESCE(excluded.channel_id, videos.channel_id)",
+                [(item["video_id"], item.get("channel_id") or channel_id, item.get("title"),
+                  item.get("published_at"), now) for item in items]
+            )
+
+        self._write(statements)
+
+    def remove_playlist_items_except(self, playlist_id: str, keep_ids: Iterable[str]) -> int:
+        """Drop playlist membership of every video not in `keep_ids`; returns the rows removed"""
+        return self._write(lambda conn: conn.execute(
+            "DELETE FROM playlist_videos WHERE playlist_id = ? "
+            "AND video_id NOT IN (SELECT value FROM json_each(?))",
+            (playlist_id, json.dumps(list(keep_ids)))
+        ).rowcount)
+
+    def shift_playlist_positions(self, playlist_id: str, skip_ids: Iterable[str], offset: int) -> None:
+        """Move every video not in `skip_ids` down by `offset` positions"""
+        if offset:
+            self._write(lambda conn: conn.execute(
+                "UPDATE playlist_videos SET position = position + ? WHERE playlist_id = ? "
+                "AND video_id NOT IN (SELECT value FROM json_each(?))",
+                (offset, playlist_id, json.dumps(list(skip_ids)))
+            ))
+
+    def playlist_video_ids(self, playlist_id: str) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT video_id FROM playlist_videos WHERE playlist_id = ? ORDER BY position", (playlist_id,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def stale_video_ids(self, playlist_id: str, older_than: float) -> List[str]:
+        """Videos of a playlist whose statistics were never fetched or are older than `older_than`"""
+        rows = self._connection().execute(
+            "SELECT v.video_id FROM playlist_videos pv JOIN videos v ON v.video_id = pv.video_id "
+            "WHERE pv.playlist_id = ? AND (v.stats_fetched_at IS NULL OR v.stats_fetched_at < ?) "
+            "ORDER BY pv.position",
+            (playlist_id, older_than)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def save_statistics(self, statistics: Dict[str, Dict[str, int]]) -> None:
+        """Store view, like and comment counts keyed by video id"""
+        now = time.time()
+        self._write(lambda conn: conn.executemany(
+            "UPDATE videos SET view_count = ?, like_count = ?, comment_count = ?, stats_fetched_at = ? "
+            "WHERE video_id = ?",
+            [(stats["view_count"], stats["like_count"], stats["comment_count"], now, video_id)
+             for video_id, stats in statistics.items()]
+        ))
+
+    def mark_synced(self, playlist_id: str) -> None:
+        self._write(lambda conn: conn.execute(
+            "UPDATE playlists SET last_synced_at = ? WHERE playlist_id = ?", (time.time(), playlist_id)
+        ))
+
+    def playlist_summary(self, playlist_id: str) -> Dict[str, Any]:
+        row = self._connection().execute(
+            "SELECT p.last_synced_at, COUNT(pv.video_id) FROM playlists p "
+            "LEFT JOIN playlist_videos pv ON pv.playlist_id = p.playlist_id WHERE p.playlist_id = ? "
+            "GROUP BY p.playlist_id",
+            (playlist_id,)
+        ).fetchone()
+        if row is None:
+            return {"last_synced_at": None, "video_count": 0}
+        return {"last_synced_at": row[0], "video_count": row[1]}
+
+    def list_videos(self, playlist_id: str, order: str = "position", limit: int = 50,
+                    offset: int = 0) -> List[Dict[str, Any]]:
+        columns = ("video_id", "title", "published_at", "position", "view_count", "like_count",
+                   "comment_count", "stats_fetched_at")
+        rows = self._connection().execute(
+            "SELECT v.video_id, v.title, v.published_at, pv.position, v.view_count, v.like_count, "
+            "v.comment_count, v.stats_fetched_at FROM playlist_videos pv JOIN videos v ON v.video_id = pv.video_id "
+            f"WHERE pv.playlist_id = ? ORDER BY {VIDEO_ORDERS[order]} LIMIT ? OFFSET ?",
+            (playlist_id, limit, offset)
+        ).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def record_quota(self, units: Dict[str, int], day: Optional[str] = None) -> None:
+        day = day or quota_day()
+        self._write(lambda conn: conn.executemany(
+            "INSERT INTO quota_usage (day, endpoint, units) VALUES (?, ?, ?) "
+            "ON CONFLICT (day, endpoint) DO UPDATE SET units = units + excluded.units",
+            [(day, endpoint, count) for endpoint, count in units.items()]
+        ))
+
+    def quota_used(self, day: Optional[str] = None) -> Dict[str, int]:
+        rows = self._connection().execute(
+            "SELECT endpoint, units FROM quota_usage WHERE day = ?", (day or quota_day(),)
+        ).fetchall()
+        return dict(rows)
+
+
+@lru_cache()
+def get_youtube_store() -> YouTubeStore:
+    """Shared YouTubeStore at the configured path (default data/youtube/youtube.db)"""
+    store_path = get_settings().youtube_store_path
+    return YouTubeStore(
+        Path(store_path) if store_path else Path(__file__).parent.parent.parent / "data" / "youtube" / "youtube.db"
+    )
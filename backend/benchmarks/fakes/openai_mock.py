@@ -0,0 +1,223 @@
+"""
+Local OpenAI-compatible chat completions server with injected latency.
+
+Unlike `openai_stub`, which replaces the client class in-process, this is a
+real HTTP server the unmodified SDK talks to, so connection handling, streaming
+and cancellation behave as they do against the provider. It serves
+`POST /v1/chat/completions` (streamed and not) and `GET /v1/models`.
+
+Latency is injected before the first token: every request waits `ttft_ms`, and
+a `slow_rate` fraction of requests wait `slow_ms` instead, which gives the
+long tail that request hedging targets. Streamed replies then send one chunk
+per word, `token_ms` apart; other replies arrive whole after the same time. A
+streamed request that the client abandons before
+the last chunk is counted as cancelled.
+
+Run it as a server and point the backend at it:
+
+    python -m benchmarks.fakes.openai_mock --port 8100 --ttft-ms 200 --slow-rate 0.05 --slow-ms 3000
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=test uvicorn app.main:app
+
+`GET /_mock/stats` reports request counts, cancellations and peak concurrency;
+`POST /_mock/config` changes the latency settings of a running server.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class MockOpenAI:
+    """Latency settings and usage counters of the fake provider"""
+
+    def __init__(self, ttft_ms: float = 0.0, token_ms: float = 0.0, slow_rate: float = 0.0,
+                 slow_ms: float = 0.0, error_rate: float = 0.0, reply_words: int = 20, seed: int = 1234):
+        self.ttft_ms = ttft_ms
+        self.token_ms = token_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.reply_words = reply_words
+        self.random = random.Random(seed)
+        self.reset_counters()
+
+    def reset_counters(self) -> None:
+        self.requests = 0
+        self.streamed = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.slow = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    def first_token_delay(self) -> float:
+        if self.slow_rate and self.random.random() < self.slow_rate:
+            self.slow += 1
+            return self.slow_ms / 1000
+        return self.ttft_ms / 1000
+
+    def reply(self, messages: List[Dict[str, Any]]) -> List[str]:
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+        words = f"Mock completion for {len(messages)} messages ({prompt_chars} characters).".split()
+        words += ["lorem"] * max(0, self.reply_words - len(words))
+        return [word + " " for word in words[:max(self.reply_words, 1)]]
+
+
+def _usage(messages: List[Dict[str, Any]], words: List[str]) -> Dict[str, Any]:
+    prompt_tokens = max(1, sum(len(str(message.get("content", ""))) for message in messages) // 4)
+    completion_tokens = len(words)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def create_app(state: Optional[MockOpenAI] = None) -> FastAPI:
+    mock = state or MockOpenAI()
+    app = FastAPI(title="Mock OpenAI API")
+    app.state.mock = mock
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "gpt-4o")
+        mock.requests += 1
+        mock._in_flight += 1
+        mock.max_in_flight = max(mock.max_in_flight, mock._in_flight)
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        words = mock.reply(messages)
+
+        try:
+            await asyncio.sleep(mock.first_token_delay())
+            if mock.error_rate and mock.random.random() < mock.error_rate:
+                mock._in_flight -= 1
+                return JSONResponse(status_code=500, content={
+                    "error": {"message": "Injected mock failure", "type": "server_error", "code": None}
+                })
+            if not body.get("stream") and mock.token_ms:
+                # Generation takes as long as it would when streamed
+                await asyncio.sleep(mock.token_ms * len(words) / 1000)
+        except asyncio.CancelledError:
+            mock._in_flight -= 1
+            mock.cancelled += 1
+            raise
+
+        if not body.get("stream"):
+            mock._in_flight -= 1
+            mock.completed += 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "".join(words)},
+                }],
+                "usage": _usage(messages, words),
+            }
+
+        mock.streamed += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, usage=None) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [] if usage is not None else [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            if usage is not None:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload)}\n\n".encode()
+
+        async def events():
+            finished = False
+            try:
+                yield chunk({"role": "assistant", "content": ""})
+                for word in words:
+                    if mock.token_ms:
+                        await asyncio.sleep(mock.token_ms / 1000)
+                    yield chunk({"content": word})
+                yield chunk({}, "stop")
+                if include_usage:
+                    yield chunk({}, usage=_usage(messages, words))
+                yield b"data: [DONE]\n\n"
+                finished = True
+                mock.completed += 1
+            finally:
+                mock._in_flight -= 1
+                if not finished:
+                    mock.cancelled += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [
+            {"id": model_id, "object": "model", "created": 0, "owned_by": "mock"}
+            for model_id in ("gpt-4o", "gpt-4o-mini", "gpt-4.1")
+        ]}
+
+    @app.get("/_mock/stats")
+    async def stats():
+        return {
+            "requests": mock.requests,
+            "streamed": mock.streamed,
+            "completed": mock.completed,
+            "cancelled": mock.cancelled,
+            "slow": mock.slow,
+            "max_in_flight": mock.max_in_flight,
+        }
+
+    @app.post("/_mock/config")
+    async def config(request: Request):
+        for name, value in (await request.json()).items():
+            if name in ("ttft_ms", "token_ms", "slow_rate", "slow_ms", "error_rate", "reply_words"):
+                setattr(mock, name, value)
+        return {"status": "ok"}
+
+    @app.post("/_mock/reset")
+    async def reset():
+        mock.reset_counters()
+        return {"status": "ok"}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a local OpenAI-compatible API with injected latency")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft-ms", type=float, default=200.0, help="Delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=10.0, help="Delay between streamed chunks")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of requests delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=3000.0, help="First-token delay of slow requests")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    args = parser.parse_args()
+
+    app = create_app(MockOpenAI(
+        ttft_ms=args.ttft_ms, token_ms=args.token_ms, slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms, error_rate=args.error_rate,
+    ))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
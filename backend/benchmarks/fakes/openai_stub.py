@@ -0,0 +1,104 @@
+"""
+In-process stand-in for the `openai.OpenAI` client.
+
+Only the surface used by `OpenAIService` is implemented. Calls block for a
+configurable latency, like the real synchronous SDK does, so handlers that call
+it from the event loop show up as stalls in load tests.
+
+Prompt caching is imitated: when every message but the last repeats an earlier
+request and is at least 1024 tokens long, those tokens are reported as cached,
+in 128-token increments like the real API.
+"""
+import random
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from openai.types.chat import ChatCompletion
+
+
+class _StubCompletions:
+    def __init__(self, owner: "StubOpenAI"):
+        self._owner = owner
+
+    def create(self, model: str, messages: List[Dict[str, Any]], **kwargs: Any) -> ChatCompletion:
+        owner = self._owner
+        owner.calls += 1
+
+        latency = owner.latency_s
+        if owner.jitter_s:
+            latency += random.uniform(0, owner.jitter_s)
+        if latency > 0:
+            time.sleep(latency)
+
+        if owner.error_rate and random.random() < owner.error_rate:
+            raise RuntimeError("Injected stub LLM failure")
+
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+        prefix = tuple((m.get("role"), str(m.get("content", ""))) for m in messages[:-1])
+        prefix_tokens = sum(len(content) for _, content in prefix) // 4
+        cached_tokens = 0
+        if prefix_tokens >= 1024:
+            if prefix in owner.seen_prefixes:
+                cached_tokens = prefix_tokens // 128 * 128
+            owner.seen_prefixes.add(prefix)
+        content = owner.reply or f"Stub completion for {len(messages)} messages ({prompt_chars} characters)."
+        prompt_tokens = max(1, prompt_chars // 4)
+        completion_tokens = max(1, len(content) // 4)
+
+        return ChatCompletion.model_validate({
+            "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        })
+
+
+class _StubChat:
+    def __init__(self, owner: "StubOpenAI"):
+        self.completions = _StubCompletions(owner)
+
+
+class _StubModels:
+    def list(self) -> SimpleNamespace:
+        return SimpleNamespace(data=[SimpleNamespace(id="gpt-4o"), SimpleNamespace(id="gpt-4o-mini")])
+
+
+class StubOpenAI:
+    """Drop-in replacement for `openai.OpenAI` with injected latency and failures"""
+
+    latency_s: float = 0.0
+    jitter_s: float = 0.0
+    error_rate: float = 0.0
+    reply: Optional[str] = None
+    # Shared by all instances, like the provider-side cache
+    seen_prefixes: Set[Tuple] = set()
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self.calls = 0
+        self.chat = _StubChat(self)
+        self.models = _StubModels()
+
+    def with_options(self, **options: Any) -> "StubOpenAI":
+        # The stub never retries, so per-call options change nothing
+        return self
+
+    @classmethod
+    def configure(cls, latency_s: float = 0.0, jitter_s: float = 0.0,
+                  error_rate: float = 0.0, reply: Optional[str] = None) -> None:
+        cls.latency_s = latency_s
+        cls.jitter_s = jitter_s
+        cls.error_rate = error_rate
+        cls.reply = reply
@@ -0,0 +1,305 @@
+"""
+Local stand-in for the YouTube Data API v3.
+
+Implements the subset of endpoints the backend calls, with deterministic data
+derived from the requested ids, ETag / If-None-Match support, quota accounting
+and injectable latency and failures. Any video, channel or playlist id exists
+except ids starting with "missing". Channels have 120 uploads by default; call
+`MockYouTube.add_uploads` to publish more. Videos have a few hundred comments
+unless set with `MockYouTube.set_comments` (any count works, they are generated
+page by page); ids starting with "nocomments" have comments disabled.
+
+Run it as a server and point the backend at it:
+
+    python -m benchmarks.fakes.youtube_mock --port 8090 --latency-ms 50
+    YOUTUBE_API_BASE_URL=http://127.0.0.1:8090/youtube/v3 YOUTUBE_API_KEY=test uvicorn app.main:app
+
+or mount `create_app()` in-process with `httpx.ASGITransport`.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+API_PREFIX = "/youtube/v3"
+MAX_IDS_PER_REQUEST = 50
+
+# Quota cost per call, as documented for the real API
+QUOTA_COSTS = {"videos": 1, "channels": 1, "playlistItems": 1, "commentThreads": 1, "i18nLanguages": 1}
+COMMENTS_EPOCH = 1704067200  # 2024-01-01T00:00:00Z
+DEFAULT_UPLOADS = 120
+DEFAULT_PLAYLIST_ITEMS = 75
+
+
+def _stable_int(value: str, modulo: int) -> int:
+    return int(hashlib.sha256(value.encode()).hexdigest()[:12], 16) % modulo
+
+
+def _etag(payload: Any) -> str:
+    return '"' + hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:27] + '"'
+
+
+class MockYouTube:
+    """State of the fake API: data overrides, latency, failures and usage counters"""
+
+    def __init__(self, latency_s: float = 0.0, error_rate: float = 0.0, seed: int = 1234):
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.view_offsets: Counter = Counter()
+        self.uploads: Dict[str, int] = {}
+        self.comment_counts: Dict[str, int] = {}
+        self.calls: Counter = Counter()
+        self.not_modified: Counter = Counter()
+        self.quota_used = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    def reset_counters(self) -> None:
+        self.calls.clear()
+        self.not_modified.clear()
+        self.quota_used = 0
+        self.max_in_flight = 0
+
+    def add_views(self, video_id: str, views: int = 1) -> None:
+        """Change a video's statistics so its ETag changes"""
+        self.view_offsets[video_id] += views
+
+    def add_uploads(self, channel_id: str, count: int = 1) -> None:
+        """Publish new videos on a channel; they appear first in its uploads playlist"""
+        self.uploads[channel_id] = self.uploads.get(channel_id, DEFAULT_UPLOADS) + count
+
+    def comment_count(self, video_id: str) -> int:
+        return self.comment_counts.get(video_id, _stable_int(video_id + "threads", 400))
+
+    def set_comments(self, video_id: str, count: int) -> None:
+        self.comment_counts[video_id] = count
+
+    def add_comments(self, video_id: str, count: int = 1) -> None:
+        """Post new comments; they appear first in time order"""
+        self.comment_counts[video_id] = self.comment_count(video_id) + count
+
+    @staticmethod
+    def comment_thread(video_id: str, number: int) -> Dict[str, Any]:
+        """Comment `number` of a video (1 is the oldest); publish times increase with the number"""
+        published_at = datetime.fromtimestamp(COMMENTS_EPOCH + number * 90, tz=timezone.utc)
+        author = _stable_int(f"{video_id}{number}", 50)
+        text = f"Comment {number} on {video_id}."
+        if number % 7 == 0:
+            text += " This one goes on for a while, repeating itself to look like a long review." * 4
+        comment_id = f"Ug{video_id}{number:08d}"
+        return {
+            "kind": "youtube#commentThread",
+            "id": comment_id,
+            "snippet": {
+                "videoId": video_id,
+                "totalReplyCount": number % 3,
+                "topLevelComment": {
+                    "kind": "youtube#comment",
+                    "id": comment_id,
+                    "snippet": {
+                        "authorDisplayName": f"@viewer{author}",
+                        "authorChannelId": {"value": f"UCviewer{author:04d}"},
+                        "textDisplay": text,
+                        "textOriginal": text,
+                        "likeCount": _stable_int(comment_id, 500),
+                        "publishedAt": published_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                        "updatedAt": published_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    },
+                },
+            },
+        }
+
+    @staticmethod
+    def uploads_playlist_id(channel_id: str) -> str:
+        return "UU" + (channel_id[2:] if channel_id.startswith("UC") else channel_id)
+
+    def playlist_video_ids(self, playlist_id: str) -> Optional[List[str]]:
+        """Video ids of a playlist, newest first"""
+        if playlist_id.startswith("missing"):
+            return None
+        if playlist_id.startswith("UU"):
+            channel_id = "UC" + playlist_id[2:]
+            count = self.uploads.get(channel_id, DEFAULT_UPLOADS)
+        else:
+            count = DEFAULT_PLAYLIST_ITEMS
+        return [f"{playlist_id[2:14]}-{number:05d}" for number in range(count, 0, -1)]
+
+    def video(self, video_id: str, parts: List[str]) -> Optional[Dict[str, Any]]:
+        if video_id.startswith("missing"):
+            return None
+        item: Dict[str, Any] = {"kind": "youtube#video", "id": video_id}
+        if "snippet" in parts:
+            item["snippet"] = {
+                "publishedAt": f"2024-01-{_stable_int(video_id, 28) + 1:02d}T12:00:00Z",
+                "channelId": "UCmock",
+                "title": f"Mock video {video_id}",
+                "description": f"Description of {video_id}",
+                "channelTitle": "Mock channel",
+                "tags": ["mock", video_id],
+                "thumbnails": {"default": {"url": f"https://i.ytimg.com/vi/{video_id}/default.jpg"}},
+            }
+        if "statistics" in parts:
+            item["statistics"] = {
+                "viewCount": str(_stable_int(video_id, 1_000_000) + self.view_offsets[video_id]),
+                "likeCount": str(_stable_int(video_id + "likes", 10_000)),
+                "favoriteCount": "0",
+                "commentCount": str(_stable_int(video_id + "comments", 1_000)),
+            }
+        item["etag"] = _etag(item)
+        return item
+
+
+def create_app(state: Optional[MockYouTube] = None) -> FastAPI:
+    mock = state or MockYouTube()
+    app = FastAPI(title="Mock YouTube Data API")
+    app.state.mock = mock
+
+    def error(status: int, reason: str, message: str) -> JSONResponse:
+        return JSONResponse(status_code=status, content={
+            "error": {"code": status, "message": message, "errors": [{"reason": reason, "message": message}]}
+        })
+
+    def listing(request: Request, kind: str, items: List[Dict[str, Any]], **extra: Any) -> Response:
+        payload = {"kind": kind, "items": items, **extra}
+        payload["etag"] = _etag(payload)
+        if request.headers.get("if-none-match") == payload["etag"]:
+            mock.not_modified[request.url.path.rsplit("/", 1)[-1]] += 1
+            return Response(status_code=304, headers={"ETag": payload["etag"]})
+        return JSONResponse(payload, headers={"ETag": payload["etag"]})
+
+    @app.middleware("http")
+    async def simulate_upstream(request: Request, call_next):
+        endpoint = request.url.path.rsplit("/", 1)[-1]
+        if not request.url.path.startswith(API_PREFIX):
+            return await call_next(request)
+
+        mock.calls[endpoint] += 1
+        mock.quota_used += QUOTA_COSTS.get(endpoint, 1)
+        mock._in_flight += 1
+        mock.max_in_flight = max(mock.max_in_flight, mock._in_flight)
+        try:
+            if mock.latency_s:
+                await asyncio.sleep(mock.latency_s)
+            if not request.query_params.get("key"):
+                return error(403, "forbidden", "The request is missing a valid API key.")
+            if mock.error_rate and mock.random.random() < mock.error_rate:
+                return error(500, "backendError", "Injected mock failure")
+            return await call_next(request)
+        finally:
+            mock._in_flight -= 1
+
+    @app.get(f"{API_PREFIX}/videos")
+    async def videos(request: Request, id: str, part: str):
+        ids = [video_id for video_id in id.split(",") if video_id]
+        if len(ids) > MAX_IDS_PER_REQUEST:
+            return error(400, "badRequest", f"At most {MAX_IDS_PER_REQUEST} ids may be requested at once")
+        parts = part.split(",")
+        items = [item for item in (mock.video(video_id, parts) for video_id in ids) if item is not None]
+        return listing(request, "youtube#videoListResponse", items,
+                       pageInfo={"totalResults": len(items), "resultsPerPage": len(items)})
+
+    @app.get(f"{API_PREFIX}/channels")
+    async def channels(request: Request, id: str, part: str):
+        items = []
+        for channel_id in (channel_id for channel_id in id.split(",") if channel_id):
+            if channel_id.startswith("missing"):
+                continue
+            items.append({
+                "kind": "youtube#channel",
+                "id": channel_id,
+                "snippet": {"title": f"Mock channel {channel_id}"},
+                "contentDetails": {"relatedPlaylists": {"uploads": mock.uploads_playlist_id(channel_id)}},
+            })
+        return listing(request, "youtube#channelListResponse", items)
+
+    @app.get(f"{API_PREFIX}/playlistItems")
+    async def playlist_items(request: Request, playlistId: str, part: str,
+                             maxResults: int = 5, pageToken: Optional[str] = None):
+        video_ids = mock.playlist_video_ids(playlistId)
+        if video_ids is None:
+            return error(404, "playlistNotFound", f"Playlist {playlistId} not found")
+        page_size = max(0, min(maxResults, 50))
+        offset = int(pageToken[1:]) if pageToken else 0
+        items = []
+        for position, video_id in enumerate(video_ids[offset:offset + page_size], start=offset):
+            published_at = f"2024-{position % 12 + 1:02d}-01T00:00:00Z"
+            items.append({
+                "kind": "youtube#playlistItem",
+                "id": f"{playlistId}.{video_id}",
+                "snippet": {
+                    "publishedAt": published_at,
+                    "title": f"Mock video {video_id}",
+                    "playlistId": playlistId,
+                    "position": position,
+                    "resourceId": {"kind": "youtube#video", "videoId": video_id},
+                },
+                "contentDetails": {"videoId": video_id, "videoPublishedAt": published_at},
+            })
+        extra: Dict[str, Any] = {"pageInfo": {"totalResults": len(video_ids), "resultsPerPage": page_size}}
+        if offset + page_size < len(video_ids):
+            extra["nextPageToken"] = f"p{offset + page_size}"
+        return listing(request, "youtube#playlistItemListResponse", items, **extra)
+
+    @app.get(f"{API_PREFIX}/commentThreads")
+    async def comment_threads(request: Request, videoId: str, part: str, maxResults: int = 20,
+                              order: str = "time", pageToken: Optional[str] = None):
+        if videoId.startswith("missing"):
+            return error(404, "videoNotFound", f"Video {videoId} not found")
+        if videoId.startswith("nocomments"):
+            return error(403, "commentsDisabled", f"Comments are disabled for video {videoId}")
+        page_size = max(1, min(maxResults, 100))
+        # Tokens point at the next (older) comment number, so new comments never shift later pages
+        start = int(pageToken[1:]) if pageToken else mock.comment_count(videoId)
+        numbers = range(start, max(0, start - page_size), -1)
+        items = [mock.comment_thread(videoId, number) for number in numbers]
+        extra: Dict[str, Any] = {"pageInfo": {"totalResults": len(items), "resultsPerPage": page_size}}
+        if start - page_size > 0:
+            extra["nextPageToken"] = f"c{start - page_size}"
+        return listing(request, "youtube#commentThreadListResponse", items, **extra)
+
+    @app.get(f"{API_PREFIX}/i18nLanguages")
+    async def i18n_languages(request: Request):
+        items = [{"kind": "youtube#i18nLanguage", "id": code} for code in ("en", "hi", "fr", "de")]
+        return listing(request, "youtube#i18nLanguageListResponse", items)
+
+    @app.get("/_mock/stats")
+    async def stats():
+        return {
+            "calls": dict(mock.calls),
+            "not_modified": dict(mock.not_modified),
+            "quota_used": mock.quota_used,
+            "max_in_flight": mock.max_in_flight,
+        }
+
+    @app.post("/_mock/reset")
+    async def reset():
+        mock.reset_counters()
+        return {"status": "ok"}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the YouTube Data API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every API call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API calls answered with 500")
+    args = parser.parse_args()
+
+    app = create_app(MockYouTube(latency_s=args.latency_ms / 1000, error_rate=args.error_rate))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
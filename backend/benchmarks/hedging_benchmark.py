@@ -0,0 +1,147 @@
+"""
+Tail latency of OpenAI calls with and without request hedging.
+
+Starts the fake OpenAI-compatible server (`benchmarks/fakes/openai_mock.py`)
+on a local port, with a fraction of requests delayed before their first token,
+and sends the same number of chat completions through `OpenAIService` with
+hedging off and then on. Reports p50/p95/p99 latency, hedges sent and won,
+and the extra requests the provider saw.
+
+Usage (from the backend directory):
+    python -m benchmarks.hedging_benchmark --requests 400 --concurrency 8 --slow-rate 0.05
+    python -m benchmarks.hedging_benchmark --hedge-delay-ms 400 --percentile 0 --output hedging.json
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fakes.openai_mock import MockOpenAI, create_app
+from benchmarks.load_test import percentile
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_provider(mock: MockOpenAI) -> str:
+    """Serve the fake provider on a daemon thread; returns its base URL"""
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(mock), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="fake-openai", daemon=True).start()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/_mock/stats", timeout=1)
+            return f"{base_url}/v1"
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    raise RuntimeError("Fake OpenAI server did not start")
+
+
+def _hedge_counts() -> Dict[str, float]:
+    from app.core.metrics import REGISTRY
+
+    counts: Dict[str, float] = {}
+    for line in REGISTRY.render().splitlines():
+        match = re.match(r'openai_hedges_total\{model="[^"]*",outcome="([^"]+)"\} (\S+)', line)
+        if match:
+            counts[match.group(1)] = counts.get(match.group(1), 0) + float(match.group(2))
+    return counts
+
+
+def run(base_url: str, mock: MockOpenAI, hedge: bool, requests: int, concurrency: int,
+        hedge_delay_ms: float, hedge_percentile: float, max_ratio: float) -> Dict[str, Any]:
+    os.environ.update(
+        OPENAI_BASE_URL=base_url,
+        OPENAI_HEDGE_ENABLED=str(hedge).lower(),
+        OPENAI_HEDGE_DELAY_MS=str(hedge_delay_ms),
+        OPENAI_HEDGE_PERCENTILE=str(hedge_percentile),
+        OPENAI_HEDGE_MAX_RATIO=str(max_ratio),
+    )
+    from app.core.config import get_settings
+    from app.models.requests import ChatRequest, Message
+    from app.services.openai_service import get_openai_service
+
+    get_settings.cache_clear()
+    get_openai_service.cache_clear()
+    service = get_openai_service()
+    mock.reset_counters()
+    hedges_before = _hedge_counts()
+
+    def one(index: int) -> float:
+        started = time.perf_counter()
+        service.create_chat_completion(ChatRequest(messages=[Message(role="user", content=f"Question {index}")]))
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one, range(requests)))
+    wall_time = time.perf_counter() - started
+    # Let cancelled streams be noticed by the server before reading its counters
+    time.sleep(0.2)
+
+    hedges = {outcome: count - hedges_before.get(outcome, 0) for outcome, count in _hedge_counts().items()}
+    return {
+        "hedging": hedge,
+        "requests": requests,
+        "throughput_rps": round(requests / wall_time, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+        "hedges": {outcome: int(count) for outcome, count in hedges.items() if count},
+        "provider_requests": mock.requests,
+        "provider_cancelled": mock.cancelled,
+        "extra_load": round(mock.requests / requests - 1, 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare OpenAI tail latency with and without hedging")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft-ms", type=float, default=100.0, help="Normal delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=2.0)
+    parser.add_argument("--slow-rate", type=float, default=0.03, help="Fraction of requests that are slow")
+    parser.add_argument("--slow-ms", type=float, default=2000.0, help="First-token delay of slow requests")
+    parser.add_argument("--hedge-delay-ms", type=float, default=300.0)
+    parser.add_argument("--percentile", type=float, default=95.0, help="Adaptive delay percentile, 0 for a fixed delay")
+    parser.add_argument("--max-ratio", type=float, default=0.05, help="Hedges allowed per call")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    # No ledger writes or routing-specific models in the measurement
+    os.environ.update(USAGE_LEDGER_ENABLED="false", MODEL_ROUTING_ENABLED="false")
+    mock = MockOpenAI(ttft_ms=args.ttft_ms, token_ms=args.token_ms, slow_rate=args.slow_rate, slow_ms=args.slow_ms)
+    base_url = start_fake_provider(mock)
+
+    report = []
+    for hedge in (False, True):
+        mock.random.seed(1234)
+        result = run(base_url, mock, hedge, args.requests, args.concurrency,
+                     args.hedge_delay_ms, args.percentile, args.max_ratio)
+        report.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""
+In-process load test harness for the FastAPI app.
+
+Drives the real `app.main:app` through httpx's ASGI transport with a configurable
+number of concurrent clients and a weighted mix of prompt CRUD, PDF analysis,
+summary and chat requests. The OpenAI client is replaced by a stub with injected
+latency, prompt storage and temporary files are redirected to a scratch
+directory, and an event-loop lag probe reports how long the loop was blocked.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --concurrency 16 --duration 20
+    python -m benchmarks.load_test --mix prompt_list=5,pdf_content_raw=2 --output report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fakes.openai_stub import StubOpenAI
+from benchmarks.synthetic_pdfs import SyntheticPDFSpec, build_pdf
+
+DEFAULT_MIX = {
+    "prompt_list": 4,
+    "prompt_get": 4,
+    "prompt_create": 2,
+    "prompt_update": 1,
+    "prompt_delete": 1,
+    "pdf_analyze": 2,
+    "pdf_structure": 2,
+    "pdf_content_raw": 2,
+    "summary": 1,
+    "chat": 1,
+}
+
+
+# Route labels the metrics must show for operations in the mix; they carry the router prefixes
+EXPECTED_ROUTE_LABELS = {
+    "chat": "/api/v1/chat",
+    "summary": "/api/v1/summary",
+    "pdf_content_raw": "/pdf/content-raw",
+}
+_ROUTE_LABEL = re.compile(r'^http_requests_total\{[^}]*route="([^"]*)"')
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    status_codes: Dict[int, int] = field(default_factory=dict)
+
+    def record(self, latency: float, status_code: Optional[int]) -> None:
+        self.latencies.append(latency)
+        if status_code is not None:
+            self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+        if status_code is None or status_code >= 400:
+            self.errors += 1
+
+    def report(self, wall_time: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        count = len(ordered)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "throughput_rps": count / wall_time if wall_time else 0.0,
+            "latency_ms": {
+                "p50": _ms(percentile(ordered, 50)),
+                "p95": _ms(percentile(ordered, 95)),
+                "p99": _ms(percentile(ordered, 99)),
+                "max": _ms(ordered[-1] if ordered else None),
+            },
+            "status_codes": {str(code): n for code, n in sorted(self.status_codes.items())},
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else seconds * 1000
+
+
+class LoadHarness:
+    """Holds the app, the HTTP client and shared workload state for one run"""
+
+    def __init__(self, app: Any, pdf_bytes: bytes, pdf_pages: int, seed: int):
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+            base_url="http://loadtest",
+            timeout=None,
+        )
+        self.pdf_bytes = pdf_bytes
+        self.pdf_pages = pdf_pages
+        self.rng = random.Random(seed)
+        self.prompt_ids: List[str] = []
+        self.stats: Dict[str, RouteStats] = {}
+
+    def _pdf_files(self) -> Dict[str, Any]:
+        return {"file": ("loadtest.pdf", self.pdf_bytes, "application/pdf")}
+
+    async def prompt_list(self) -> httpx.Response:
+        return await self.client.get("/api/v1/prompts")
+
+    async def prompt_get(self) -> httpx.Response:
+        if not self.prompt_ids:
+            return await self.prompt_create()
+        return await self.client.get(f"/api/v1/prompts/{self.rng.choice(self.prompt_ids)}")
+
+    async def prompt_create(self) -> httpx.Response:
+        prompt_id = str(uuid.uuid4())
+        response = await self.client.post("/api/v1/prompts", json={
+            "id": prompt_id,
+            "name": f"load-{prompt_id[:8]}",
+            "prompt": "Summarise the chapter as a two-voice podcast script.",
+        })
+        if response.status_code < 400:
+            self.prompt_ids.append(prompt_id)
+        return response
+
+    async def prompt_update(self) -> httpx.Response:
+        if not self.prompt_ids:
+            return await self.prompt_create()
+        prompt_id = self.rng.choice(self.prompt_ids)
+        return await self.client.put(f"/api/v1/prompts/{prompt_id}", json={
+            "name": f"load-{prompt_id[:8]}",
+            "prompt": f"Updated at {time.time()}",
+        })
+
+    async def prompt_delete(self) -> httpx.Response:
+        if not self.prompt_ids:
+            return await self.prompt_create()
+        prompt_id = self.prompt_ids.pop(self.rng.randrange(len(self.prompt_ids)))
+        return await self.client.delete(f"/api/v1/prompts/{prompt_id}")
+
+    async def pdf_analyze(self) -> httpx.Response:
+        return await self.client.post("/pdf/analyze", files=self._pdf_files())
+
+    async def pdf_structure(self) -> httpx.Response:
+        return await self.client.post("/pdf/analyze/structure", files=self._pdf_files())
+
+    async def pdf_content_raw(self) -> httpx.Response:
+        end_page = min(self.pdf_pages, 20)
+        return await self.client.post(
+            f"/pdf/content-raw?start_page=1&end_page={end_page}", files=self._pdf_files()
+        )
+
+    async def summary(self) -> httpx.Response:
+        return await self.client.post("/api/v1/summary", json={
+            "text": "Lorem ipsum dolor sit amet. " * 200,
+            "prompt": "Turn this into a short script.",
+        })
+
+    async def chat(self) -> httpx.Response:
+        return await self.client.post("/api/v1/chat", json={
+            "messages": [{"role": "user", "content": "Hello there"}],
+        })
+
+    def operations(self) -> Dict[str, Callable[[], Any]]:
+        return {name: getattr(self, name) for name in DEFAULT_MIX}
+
+
+async def _loop_lag_probe(samples: List[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    """Record how late the event loop wakes up compared to the requested interval"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+async def run_load(
+    harness: LoadHarness,
+    mix: Dict[str, int],
+    concurrency: int,
+    duration: Optional[float],
+    total_requests: Optional[int],
+) -> Dict[str, Any]:
+    operations = harness.operations()
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_operation() -> Optional[str]:
+        nonlocal issued
+        if total_requests is not None and issued >= total_requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        issued += 1
+        return harness.rng.choices(names, weights)[0]
+
+    async def worker() -> None:
+        while (name := next_operation()) is not None:
+            started = time.perf_counter()
+            status_code = None
+            try:
+                response = await operations[name]()
+                status_code = response.status_code
+            except Exception:
+                pass
+            harness.stats.setdefault(name, RouteStats()).record(time.perf_counter() - started, status_code)
+
+    lag_samples: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_loop_lag_probe(lag_samples, stop))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    metrics = await harness.client.get("/metrics")
+    await harness.client.aclose()
+    route_labels = sorted({
+        match.group(1) for line in metrics.text.splitlines() if (match := _ROUTE_LABEL.match(line))
+    }) if metrics.status_code == 200 else []
+
+    overall = RouteStats()
+    for stats in harness.stats.values():
+        overall.latencies.extend(stats.latencies)
+        overall.errors += stats.errors
+        for code, n in stats.status_codes.items():
+            overall.status_codes[code] = overall.status_codes.get(code, 0) + n
+
+    lag = sorted(lag_samples)
+    return {
+        "concurrency": concurrency,
+        "wall_time_s": wall_time,
+        "overall": overall.report(wall_time),
+        "routes": {name: stats.report(wall_time) for name, stats in sorted(harness.stats.items())},
+        "event_loop_lag_ms": {
+            "p50": _ms(percentile(lag, 50)),
+            "p99": _ms(percentile(lag, 99)),
+            "max": _ms(lag[-1] if lag else None),
+        },
+        "metric_routes": route_labels,
+    }
+
+
+def load_app(scratch_dir: Path, llm_latency: float, llm_jitter: float, llm_error_rate: float) -> Any:
+    """Import `app.main:app` with the LLM stubbed and state redirected to `scratch_dir`"""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-load-test")
+    os.environ["PROMPT_STORE_PATH"] = str(scratch_dir / "prompts" / "prompts.db")
+    os.environ["DOCUMENTS_DIR"] = str(scratch_dir / "documents")
+    os.environ["SUMMARY_CACHE_PATH"] = str(scratch_dir / "summaries" / "summaries.db")
+    os.environ["USAGE_LEDGER_PATH"] = str(scratch_dir / "usage" / "usage.db")
+    os.environ["CONVERSATION_STORE_PATH"] = str(scratch_dir / "conversations" / "conversations.db")
+    os.environ["IMAGES_DIR"] = str(scratch_dir / "images")
+    StubOpenAI.configure(latency_s=llm_latency, jitter_s=llm_jitter, error_rate=llm_error_rate)
+
+    import app.services.openai_service as openai_service_module
+    openai_service_module.client_class = StubOpenAI
+
+    from app.main import app
+
+    # The PDF services write temporary files to the working directory
+    os.chdir(scratch_dir)
+    return app
+
+
+def _parse_mix(value: Optional[str]) -> Dict[str, int]:
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {name: 0 for name in DEFAULT_MIX}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in mix:
+            raise SystemExit(f"Unknown operation '{name}'. Choose from: {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    header = f"{'route':<18} {'reqs':>7} {'err%':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["routes"].items()) + [("ALL", report["overall"])]
+    for name, r in rows:
+        lat = r["latency_ms"]
+        print(
+            f"{name:<18} {r['requests']:>7} {r['error_rate'] * 100:>6.1f}% {r['throughput_rps']:>8.1f} "
+            f"{lat['p50'] or 0:>9.1f} {lat['p95'] or 0:>9.1f} {lat['p99'] or 0:>9.1f}"
+        )
+    lag = report["event_loop_lag_ms"]
+    print(f"\nEvent loop lag: p50 {lag['p50'] or 0:.1f} ms, p99 {lag['p99'] or 0:.1f} ms, max {lag['max'] or 0:.1f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="In-process load test for the PersonalLM API")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run (ignored with --requests)")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests instead of a duration")
+    parser.add_argument("--mix", help=f"Comma-separated name=weight pairs from: {', '.join(DEFAULT_MIX)}")
+    parser.add_argument("--pdf-pages", type=int, default=50, help="Pages in the synthetic PDF used for uploads")
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0, help="Blocking latency of the stub LLM")
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    mix = _parse_mix(args.mix)
+    pdf_bytes = build_pdf(SyntheticPDFSpec(pages=args.pdf_pages, with_toc=True, kind="text"))
+    scratch_dir = Path(tempfile.mkdtemp(prefix="load-test-"))
+    app = load_app(
+        scratch_dir,
+        llm_latency=args.llm_latency_ms / 1000,
+        llm_jitter=args.llm_jitter_ms / 1000,
+        llm_error_rate=args.llm_error_rate,
+    )
+
+    harness = LoadHarness(app, pdf_bytes, args.pdf_pages, args.seed)
+    report = asyncio.run(run_load(
+        harness,
+        mix=mix,
+        concurrency=args.concurrency,
+        duration=None if args.requests else args.duration,
+        total_requests=args.requests,
+    ))
+    report["settings"] = {
+        "mix": mix,
+        "pdf_pages": args.pdf_pages,
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_jitter_ms": args.llm_jitter_ms,
+        "llm_error_rate": args.llm_error_rate,
+    }
+
+    _print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Report written to {args.output}", file=sys.stderr)
+
+    missing = [
+        label for name, label in EXPECTED_ROUTE_LABELS.items()
+        if name in report["routes"] and report["metric_routes"] and label not in report["metric_routes"]
+    ]
+    if missing:
+        print(f"Route labels missing from /metrics: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+"""
+Benchmark suite for the PDF processing path.
+
+Generates synthetic PDFs (cached between runs) and measures latency, throughput
+and peak memory of the info, structure, content and content-raw operations.
+Each case runs in a fresh subprocess so the reported peak RSS belongs to that
+case alone. Every timed run starts from an empty document store, so extraction
+is measured rather than the page-text cache; content and content-raw are then
+timed again against the filled cache and reported as `cached_latency_ms`.
+
+Usage (from the backend directory):
+    python -m benchmarks.pdf_benchmark --output results.json
+    python -m benchmarks.pdf_benchmark --quick --compare results.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.synthetic_pdfs import SyntheticPDFSpec, get_or_build_pdf
+
+OPERATIONS = ["info", "structure", "structure-analyzer", "content", "content-raw"]
+# Operations served from the page-text cache once a document's pages were extracted
+CACHED_OPERATIONS = {"content", "content-raw"}
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+QUICK_SIZES = [10, 100]
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".cache"
+RESULT_FORMAT_VERSION = 2
+
+# Absolute changes below these floors are treated as noise when comparing
+MIN_LATENCY_DELTA_MS = 1.0
+MIN_MEMORY_DELTA_BYTES = 1024 * 1024
+
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this process (Linux), 0 when unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _peak_rss_bytes() -> int:
+    """Peak resident set size of this process, 0 when unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def _run_operation(operation: str, data: bytes, filename: str, total_pages: int) -> None:
+    from fastapi import UploadFile
+
+    upload = UploadFile(file=io.BytesIO(data), filename=filename)
+
+    if operation == "info":
+        from app.pdf_processor.services.pdf_info_service import PDFInfoService
+        await PDFInfoService.get_pdf_info(upload)
+    elif operation == "structure":
+        from app.pdf_processor.services.pdf_structure_service import PDFStructureService
+        await PDFStructureService.analyze_structure(upload)
+    elif operation == "structure-analyzer":
+        import fitz
+        from app.pdf_processor.core.structure_analyzer import PDFStructureAnalyzer
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            PDFStructureAnalyzer.analyze_from_content(doc, filename)
+    elif operation == "content":
+        from app.pdf_processor.services.pdf_content_service import PDFContentService
+        await PDFContentService.extract_content(upload, 1, total_pages)
+    elif operation == "content-raw":
+        from app.pdf_processor.services.pdf_content_service import PDFContentService
+        await PDFContentService.extract_raw_content(upload, 1, total_pages)
+    else:
+        raise ValueError(f"Unknown operation: {operation}")
+
+
+def _use_fresh_document_store(scratch_dir: str) -> None:
+    """Point the document store at an empty directory so no earlier extraction is reused"""
+    from app.core.config import get_settings
+    from app.pdf_processor.services.document_store import get_document_store
+
+    os.environ["DOCUMENTS_DIR"] = tempfile.mkdtemp(prefix="documents-", dir=scratch_dir)
+    get_settings.cache_clear()
+    get_document_store.cache_clear()
+
+
+def _run_case(pdf_path: str, operation: str, total_pages: int, repeats: int, warmup: int) -> Dict[str, Any]:
+    """Run one benchmark case; executed inside a fresh subprocess"""
+    import logging
+    import warnings
+
+    logging.disable(logging.CRITICAL)
+    warnings.simplefilter("ignore")
+
+    data = Path(pdf_path).read_bytes()
+    filename = Path(pdf_path).name
+
+    # The services write temporary files to the working directory and store uploads
+    # in the document store; keep both out of the repository
+    scratch_dir = tempfile.mkdtemp(prefix="pdf-bench-")
+    os.chdir(scratch_dir)
+    # Settings are loaded to locate the document store; no OpenAI call is made
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+
+    # Import the services up front so their import cost is not measured
+    import app.pdf_processor.services.pdf_content_service  # noqa: F401
+    import app.pdf_processor.services.pdf_info_service  # noqa: F401
+    import app.pdf_processor.services.pdf_structure_service  # noqa: F401
+    import app.pdf_processor.core.structure_analyzer  # noqa: F401
+
+    async def timed() -> float:
+        started = time.perf_counter()
+        await _run_operation(operation, data, filename, total_pages)
+        return time.perf_counter() - started
+
+    async def run():
+        for _ in range(warmup):
+            _use_fresh_document_store(scratch_dir)
+            await _run_operation(operation, data, filename, total_pages)
+
+        rss_before = _current_rss_bytes()
+        tracemalloc.start()
+        timings = []
+        for _ in range(repeats):
+            _use_fresh_document_store(scratch_dir)
+            timings.append(await timed())
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # The last uncached run left the document's pages in the cache
+        cached_timings = [await timed() for _ in range(repeats)] if operation in CACHED_OPERATIONS else []
+        return timings, cached_timings, peak_traced, rss_before
+
+    timings, cached_timings, peak_traced, rss_before = asyncio.run(run())
+    return {
+        "timings": timings,
+        "cached_timings": cached_timings,
+        "peak_traced_bytes": peak_traced,
+        "peak_rss_delta_bytes": max(0, _peak_rss_bytes() - rss_before),
+        "file_bytes": len(data),
+    }
+
+
+def _latency_ms(timings: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(timings) * 1000,
+        "median": statistics.median(timings) * 1000,
+        "mean": statistics.fmean(timings) * 1000,
+        "max": max(timings) * 1000,
+    }
+
+
+def _summarise(spec: SyntheticPDFSpec, operation: str, raw: Dict[str, Any]) -> Dict[str, Any]:
+    timings = raw["timings"]
+    median = statistics.median(timings)
+    pages_processed = spec.pages if operation != "info" else 1
+    return {
+        "case": f"{spec.name}/{operation}",
+        "document": spec.name,
+        "operation": operation,
+        "pages": spec.pages,
+        "kind": spec.kind,
+        "with_toc": spec.with_toc,
+        "file_bytes": raw["file_bytes"],
+        "repeats": len(timings),
+        "latency_ms": _latency_ms(timings),
+        "cached_latency_ms": _latency_ms(raw["cached_timings"]) if raw["cached_timings"] else None,
+        "pages_per_second": pages_processed / median if median > 0 else None,
+        "peak_traced_bytes": raw["peak_traced_bytes"],
+        "peak_rss_delta_bytes": raw["peak_rss_delta_bytes"],
+    }
+
+
+def run_benchmarks(
+    sizes: List[int],
+    kinds: List[str],
+    toc_modes: List[bool],
+    operations: List[str],
+    repeats: int,
+    warmup: int,
+    cache_dir: Path,
+) -> Dict[str, Any]:
+    """Generate the document matrix and run every operation against it"""
+    context = multiprocessing.get_context("spawn")
+    results = []
+
+    for pages in sizes:
+        for kind in kinds:
+            for with_toc in toc_modes:
+                spec = SyntheticPDFSpec(pages=pages, with_toc=with_toc, kind=kind)
+                print(f"Preparing {spec.name}...", file=sys.stderr)
+                pdf_path = get_or_build_pdf(spec, cache_dir)
+
+                for operation in operations:
+                    with context.Pool(processes=1) as pool:
+                        raw = pool.apply(_run_case, (str(pdf_path), operation, pages, repeats, warmup))
+                    result = _summarise(spec, operation, raw)
+                    results.append(result)
+                    cached = result["cached_latency_ms"]
+                    print(
+                        f"  {result['case']:<40} median {result['latency_ms']['median']:>10.2f} ms"
+                        + (f" (cached {cached['median']:.2f} ms)" if cached else "") +
+                        f"  peak traced {result['peak_traced_bytes'] / 1e6:>8.2f} MB"
+                        f"  peak rss +{result['peak_rss_delta_bytes'] / 1e6:>8.2f} MB",
+                        file=sys.stderr
+                    )
+
+    import fitz
+
+    return {
+        "format_version": RESULT_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pymupdf": fitz.VersionBind,
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {"repeats": repeats, "warmup": warmup},
+        "results": results,
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compare two result sets case by case.
+
+    A case regresses when its median latency or peak memory grows by more than
+    `threshold` (a fraction, e.g. 0.1 for 10%) relative to the baseline and by
+    more than the absolute noise floor for that metric.
+    """
+    baseline_cases = {r["case"]: r for r in baseline.get("results", [])}
+    rows = []
+
+    for result in current["results"]:
+        base = baseline_cases.get(result["case"])
+        if base is None:
+            continue
+
+        row = {"case": result["case"], "regressions": []}
+        metrics = [
+            ("latency_ms.median", result["latency_ms"]["median"], base["latency_ms"]["median"], MIN_LATENCY_DELTA_MS),
+            ("peak_traced_bytes", result["peak_traced_bytes"], base["peak_traced_bytes"], MIN_MEMORY_DELTA_BYTES),
+            ("peak_rss_delta_bytes", result["peak_rss_delta_bytes"], base["peak_rss_delta_bytes"], MIN_MEMORY_DELTA_BYTES),
+        ]
+        if result.get("cached_latency_ms") and base.get("cached_latency_ms"):
+            metrics.append((
+                "cached_latency_ms.median", result["cached_latency_ms"]["median"],
+                base["cached_latency_ms"]["median"], MIN_LATENCY_DELTA_MS
+            ))
+        for metric, current_value, base_value, noise_floor in metrics:
+            ratio = current_value / base_value if base_value else None
+            row[metric] = {"baseline": base_value, "current": current_value, "ratio": ratio}
+            if ratio is not None and ratio > 1 + threshold and current_value - base_value > noise_floor:
+                row["regressions"].append(metric)
+        rows.append(row)
+
+    return rows
+
+
+def _print_comparison(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'case':<40} {'latency':>10} {'cached':>10} {'traced':>10} {'rss':>10}")
+    for row in rows:
+        def fmt(metric: str) -> str:
+            ratio = row[metric]["ratio"] if metric in row else None
+            return "n/a" if ratio is None else f"{ratio:.2f}x"
+
+        marker = "  REGRESSED: " + ", ".join(row["regressions"]) if row["regressions"] else ""
+        print(
+            f"{row['case']:<40} {fmt('latency_ms.median'):>10} {fmt('cached_latency_ms.median'):>10} "
+            f"{fmt('peak_traced_bytes'):>10} {fmt('peak_rss_delta_bytes'):>10}{marker}"
+        )
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the PDF processing services")
+    parser.add_argument("--sizes", type=int, nargs="+", help=f"Page counts to generate (default {DEFAULT_SIZES})")
+    parser.add_argument("--quick", action="store_true", help=f"Only use page counts {QUICK_SIZES}")
+    parser.add_argument("--kinds", nargs="+", choices=["text", "image"], default=["text", "image"])
+    parser.add_argument("--toc", choices=["both", "with", "without"], default="both")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="Where generated PDFs are kept")
+    parser.add_argument("--output", type=Path, help="Write machine-readable results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression as a fraction (default 0.10)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    toc_modes = {"both": [True, False], "with": [True], "without": [False]}[args.toc]
+
+    results = run_benchmarks(
+        sizes=sizes,
+        kinds=args.kinds,
+        toc_modes=toc_modes,
+        operations=args.operations,
+        repeats=args.repeats,
+        warmup=args.warmup,
+        cache_dir=args.cache_dir,
+    )
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        rows = compare_results(results, baseline, args.threshold)
+        _print_comparison(rows)
+        if any(row["regressions"] for row in rows):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
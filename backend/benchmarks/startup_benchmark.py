@@ -0,0 +1,203 @@
+"""
+Cold-start benchmark for the API process.
+
+Each run starts a fresh interpreter and measures how long `import app.main`
+takes, how long the first request (a prompt listing) takes after that, and
+which heavy dependencies got loaded along the way. PyMuPDF, the OpenAI SDK and
+httpx are imported lazily, so none of them may be loaded by the import or by a
+request that does not need them; the benchmark fails if one is.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup_benchmark --output startup.json
+    python -m benchmarks.startup_benchmark --compare startup.json --threshold 0.2
+    python -m benchmarks.startup_benchmark --max-import-ms 800
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).parent.parent
+RESULT_FORMAT_VERSION = 1
+# Modules that must not be executed by importing the app or by serving prompts
+DEFERRED_MODULES = ("fitz", "pymupdf", "openai", "httpx")
+DEFAULT_MAX_IMPORT_MS = 1000.0
+# Absolute changes below this floor are treated as noise when comparing
+MIN_DELTA_MS = 25.0
+
+# Runs in a fresh interpreter and prints one JSON object
+PROBE = """
+import asyncio, json, time
+
+started = time.perf_counter()
+import app.main
+import_ms = (time.perf_counter() - started) * 1000
+
+from app.core.lazy import is_loaded
+from app.core.startup import prewarm
+
+deferred = {deferred!r}
+loaded_by_import = [name for name in deferred if is_loaded(name)]
+
+
+async def first_request():
+    messages = []
+
+    async def receive():
+        return {{"type": "http.request", "body": b"", "more_body": False}}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {{
+        "type": "http", "asgi": {{"version": "3.0"}}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/v1/prompts", "raw_path": b"/api/v1/prompts", "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"localhost")], "client": ("127.0.0.1", 1),
+        "server": ("localhost", 80),
+    }}
+    await app.main.app(scope, receive, send)
+    return messages[0]["status"]
+
+
+started = time.perf_counter()
+status = asyncio.run(first_request())
+first_request_ms = (time.perf_counter() - started) * 1000
+loaded_by_request = [name for name in deferred if is_loaded(name) and name not in loaded_by_import]
+
+prewarm_ms = None
+if {prewarm!r}:
+    started = time.perf_counter()
+    prewarm()
+    prewarm_ms = (time.perf_counter() - started) * 1000
+
+print(json.dumps({{
+    "import_ms": import_ms,
+    "first_request_ms": first_request_ms,
+    "first_request_status": status,
+    "prewarm_ms": prewarm_ms,
+    "loaded_by_import": loaded_by_import,
+    "loaded_by_request": loaded_by_request,
+}}))
+"""
+
+
+def _run_probe(scratch_dir: Path, prewarm: bool) -> Dict[str, Any]:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-startup-benchmark")
+    env["PROMPT_STORE_PATH"] = str(scratch_dir / "prompts.db")
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE.format(deferred=DEFERRED_MODULES, prewarm=prewarm)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=False
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _summarise(values: List[float]) -> Dict[str, float]:
+    return {"median": statistics.median(values), "min": min(values), "max": max(values)}
+
+
+def run_benchmark(runs: int, warmup: int, prewarm: bool) -> Dict[str, Any]:
+    """Run the probe `warmup + runs` times; warmup runs fill the bytecode and OS file caches"""
+    samples = []
+    with tempfile.TemporaryDirectory(prefix="startup-bench-") as scratch:
+        for i in range(warmup + runs):
+            sample = _run_probe(Path(scratch), prewarm)
+            if i >= warmup:
+                samples.append(sample)
+                print(
+                    f"  run {len(samples)}: import {sample['import_ms']:.0f} ms, "
+                    f"first request {sample['first_request_ms']:.0f} ms",
+                    file=sys.stderr
+                )
+
+    result = {
+        "import_ms": _summarise([s["import_ms"] for s in samples]),
+        "first_request_ms": _summarise([s["first_request_ms"] for s in samples]),
+        "first_request_status": samples[-1]["first_request_status"],
+        "loaded_by_import": sorted({name for s in samples for name in s["loaded_by_import"]}),
+        "loaded_by_request": sorted({name for s in samples for name in s["loaded_by_request"]}),
+    }
+    if prewarm:
+        result["prewarm_ms"] = _summarise([s["prewarm_ms"] for s in samples])
+
+    return {
+        "format_version": RESULT_FORMAT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {"runs": runs, "warmup": warmup},
+        "result": result,
+    }
+
+
+def check_results(current: Dict[str, Any], baseline: Optional[Dict[str, Any]], max_import_ms: float,
+                  threshold: float) -> List[str]:
+    """Reasons the run fails: eagerly loaded modules, the import budget, or a regression against a baseline"""
+    result = current["result"]
+    failures = []
+    if result["first_request_status"] != 200:
+        failures.append(f"first request returned {result['first_request_status']}")
+    for key, when in (("loaded_by_import", "importing app.main"), ("loaded_by_request", "a prompt listing")):
+        if result[key]:
+            failures.append(f"{', '.join(result[key])} loaded by {when}")
+
+    import_ms = result["import_ms"]["median"]
+    if import_ms > max_import_ms:
+        failures.append(f"import took {import_ms:.0f} ms, budget is {max_import_ms:.0f} ms")
+
+    if baseline is not None:
+        for metric in ("import_ms", "first_request_ms"):
+            base_value = baseline["result"][metric]["median"]
+            value = result[metric]["median"]
+            if base_value and value / base_value > 1 + threshold and value - base_value > MIN_DELTA_MS:
+                failures.append(f"{metric} regressed from {base_value:.0f} to {value:.0f} ms")
+    return failures
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure API cold-start time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--prewarm", action="store_true", help="Also time the optional prewarm step")
+    parser.add_argument("--max-import-ms", type=float, default=DEFAULT_MAX_IMPORT_MS,
+                        help=f"Fail when the median import of app.main exceeds this (default {DEFAULT_MAX_IMPORT_MS:.0f})")
+    parser.add_argument("--output", type=Path, help="Write machine-readable results to this JSON file")
+    parser.add_argument("--compare", type=Path, help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Allowed regression as a fraction (default 0.20)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parse_args(argv)
+    results = run_benchmark(args.runs, args.warmup, args.prewarm)
+    result = results["result"]
+    print(f"import app.main   median {result['import_ms']['median']:>8.1f} ms")
+    print(f"first request     median {result['first_request_ms']['median']:>8.1f} ms")
+    if args.prewarm:
+        print(f"prewarm           median {result['prewarm_ms']['median']:>8.1f} ms")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    failures = check_results(results, baseline, args.max_import_ms, args.threshold)
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
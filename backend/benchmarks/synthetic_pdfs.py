@@ -0,0 +1,111 @@
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+import fitz
+
+WORDS = (
+    "the of and to in is that for it as with was on be by this are from at or an have not which "
+    "podcast chapter voice story reader memory signal context model page section structure analysis "
+    "learning attention network language summary script conversation system design latency cache"
+).split()
+
+
+@dataclass(frozen=True)
+class SyntheticPDFSpec:
+    """Parameters describing one generated benchmark document"""
+    pages: int
+    with_toc: bool
+    kind: str  # "text" or "image"
+    chapter_every: int = 25
+    seed: int = 1234
+
+    @property
+    def name(self) -> str:
+        toc = "toc" if self.with_toc else "notoc"
+        return f"{self.kind}-{self.pages}p-{toc}"
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}-s{self.seed}.pdf"
+
+
+def _paragraph(rng: random.Random, lines: int, words_per_line: int = 12) -> str:
+    return "\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(words_per_line))
+        for _ in range(lines)
+    )
+
+
+def _image_pool(rng: random.Random, count: int = 8, size: int = 256) -> List[bytes]:
+    """Create a small pool of distinct PNG images built from coloured blocks"""
+    pool = []
+    for _ in range(count):
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, size, size), False)
+        pix.set_rect(pix.irect, (255, 255, 255))
+        for _ in range(24):
+            x0, y0 = rng.randrange(0, size - 16), rng.randrange(0, size - 16)
+            w, h = rng.randrange(8, size // 2), rng.randrange(8, size // 2)
+            colour = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            pix.set_rect(fitz.IRect(x0, y0, min(size, x0 + w), min(size, y0 + h)), colour)
+        pool.append(pix.tobytes("png"))
+    return pool
+
+
+def build_pdf(spec: SyntheticPDFSpec) -> bytes:
+    """Generate a PDF matching the spec and return its bytes"""
+    rng = random.Random(f"{spec.seed}-{spec.kind}-{spec.pages}")
+    images = _image_pool(rng) if spec.kind == "image" else []
+    image_xrefs: List[int] = []
+    toc = []
+
+    doc = fitz.open()
+    doc.set_metadata({"title": f"Synthetic {spec.name}", "author": "PersonalLM benchmarks"})
+
+    for page_index in range(spec.pages):
+        page = doc.new_page(width=595, height=842)
+        y = 72
+
+        if page_index % spec.chapter_every == 0:
+            chapter_number = page_index // spec.chapter_every + 1
+            title = f"Chapter {chapter_number} {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}"
+            page.insert_text((72, y), title, fontsize=18, fontname="hebo")
+            toc.append([1, title, page_index + 1])
+            y += 36
+        elif page_index % spec.chapter_every in (spec.chapter_every // 3, 2 * spec.chapter_every // 3):
+            section_number = len(toc)
+            title = f"{section_number}.{page_index % spec.chapter_every} {rng.choice(WORDS).title()}"
+            page.insert_text((72, y), title, fontsize=13, fontname="hebo")
+            toc.append([2, title, page_index + 1])
+            y += 26
+
+        if spec.kind == "text":
+            page.insert_text((72, y), _paragraph(rng, 52), fontsize=9, fontname="helv")
+        else:
+            page.insert_text((72, y), _paragraph(rng, 4), fontsize=9, fontname="helv")
+            for slot in range(2):
+                rect = fitz.Rect(72, y + 60 + slot * 320, 72 + 300, y + 60 + slot * 320 + 300)
+                pool_index = (page_index * 2 + slot) % len(images)
+                if len(image_xrefs) < len(images):
+                    image_xrefs.append(page.insert_image(rect, stream=images[pool_index]))
+                else:
+                    page.insert_image(rect, xref=image_xrefs[pool_index])
+
+    if spec.with_toc and toc:
+        doc.set_toc(toc)
+
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+def get_or_build_pdf(spec: SyntheticPDFSpec, cache_dir: Path) -> Path:
+    """Return a cached synthetic PDF path, generating the file on first use"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / spec.filename
+    if not path.exists():
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(build_pdf(spec))
+        tmp_path.replace(path)
+    return path